@@ -6,6 +6,10 @@ from decimal import Decimal
 from pear_admin import create_app
 from pear_admin.extensions import db
 from pear_admin.orms import OrderORM, SupplierORM
+from pear_admin.orms.pay import refresh_order_totals
+from pear_admin.utils.rollup import rebuild_rollup
+from pear_admin.utils.search import rebuild_indexes
+from pear_admin.utils.unit_of_work import unit_of_work
 
 app = create_app()
 
@@ -198,42 +202,44 @@ test_orders = [
 
 def add_test_data(force=False):
     with app.app_context():
-        if force:
-            print("强制模式：正在清空现有订单数据...")
-            try:
-                num_deleted = db.session.query(OrderORM).delete()
-                db.session.commit()
-                print(f"已清空 {num_deleted} 条现有订单数据。")
-            except Exception as e:
-                db.session.rollback()
-                print(f"清空数据失败: {e}")
-                return
-
         try:
-            # 检查是否已有数据
-            if OrderORM.query.count() > 0 and not force:
-                print("数据库中已有订单数据，跳过添加。如需强制添加，请使用 --force 参数。")
-                return
+            # 清空和插入在同一个工作单元中提交一次，插入失败时不会留下被清空的表
+            with unit_of_work():
+                if force:
+                    print("强制模式：正在清空现有订单数据...")
+                    num_deleted = db.session.query(OrderORM).delete()
+                    print(f"已清空 {num_deleted} 条现有订单数据。")
+
+                # 检查是否已有数据
+                if OrderORM.query.count() > 0 and not force:
+                    print("数据库中已有订单数据，跳过添加。如需强制添加，请使用 --force 参数。")
+                    return
 
-            # 获取供应商列表，随机分配给订单
-            suppliers = SupplierORM.query.all()
-            supplier_ids = [s.id for s in suppliers] if suppliers else [None]
+                # 获取供应商列表，随机分配给订单
+                suppliers = SupplierORM.query.all()
+                supplier_ids = [s.id for s in suppliers] if suppliers else [None]
             
-            # 如果没有供应商，使用 None
-            if not supplier_ids:
-                supplier_ids = [None]
+                # 如果没有供应商，使用 None
+                if not supplier_ids:
+                    supplier_ids = [None]
 
-            for i, order_data in enumerate(test_orders):
-                # 随机分配供应商（如果有的话）
-                if supplier_ids and supplier_ids[0] is not None:
-                    order_data["supplier_id"] = supplier_ids[i % len(supplier_ids)]
-                else:
-                    order_data["supplier_id"] = None
+                for i, order_data in enumerate(test_orders):
+                    # 随机分配供应商（如果有的话）
+                    if supplier_ids and supplier_ids[0] is not None:
+                        order_data["supplier_id"] = supplier_ids[i % len(supplier_ids)]
+                    else:
+                        order_data["supplier_id"] = None
                 
-                order = OrderORM(**order_data)
-                db.session.add(order)
+                    order = OrderORM(**order_data)
+                    db.session.add(order)
+
+            if force:
+                # 批量删除绕过了 ORM 事件，月度汇总和全文索引中仍有已删除的行，按表重新生成；
+                # 原有付款单可能关联到新订单（自增 id 被复用），一并重算订单付款合计
+                refresh_order_totals(db.session.connection())
+                rebuild_rollup()
+                rebuild_indexes()
 
-            db.session.commit()
             print(f"成功添加 {len(test_orders)} 条订单测试数据！")
 
             # 统计信息
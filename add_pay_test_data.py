@@ -6,6 +6,10 @@ from decimal import Decimal
 from pear_admin import create_app
 from pear_admin.extensions import db
 from pear_admin.orms import PayORM, OrderORM, SupplierORM
+from pear_admin.orms.pay import refresh_order_totals
+from pear_admin.utils.rollup import rebuild_rollup
+from pear_admin.utils.search import rebuild_indexes
+from pear_admin.utils.unit_of_work import unit_of_work
 
 app = create_app()
 
@@ -34,104 +38,107 @@ handlers = ["张三", "李四", "王五", "赵六", "孙七", "周八", "吴九"
 
 def add_test_data(force=False):
     with app.app_context():
-        if force:
-            print("强制模式：正在清空现有付款单数据...")
-            try:
-                num_deleted = db.session.query(PayORM).delete()
-                db.session.commit()
-                print(f"已清空 {num_deleted} 条现有付款单数据。")
-            except Exception as e:
-                db.session.rollback()
-                print(f"清空数据失败: {e}")
-                return
-
         try:
-            # 检查是否已有数据
-            if PayORM.query.count() > 0 and not force:
-                print("数据库中已有付款单数据，跳过添加。如需强制添加，请使用 --force 参数。")
-                return
-
-            # 获取订单列表
-            orders = OrderORM.query.all()
-            if not orders:
-                print("错误：数据库中没有订单数据，请先添加订单数据。")
-                return
-
-            # 获取供应商列表
-            suppliers = SupplierORM.query.all()
-            if not suppliers:
-                print("错误：数据库中没有供应商数据，请先添加供应商数据。")
-                return
-
-            supplier_ids = [s.id for s in suppliers]
+            # 清空和插入在同一个工作单元中提交一次，插入失败时不会留下被清空的表
+            with unit_of_work():
+                # 先检查前置数据，缺少时直接返回，不清空已有付款单
+                # 获取订单列表
+                orders = OrderORM.query.all()
+                if not orders:
+                    print("错误：数据库中没有订单数据，请先添加订单数据。")
+                    return
+
+                # 获取供应商列表
+                suppliers = SupplierORM.query.all()
+                if not suppliers:
+                    print("错误：数据库中没有供应商数据，请先添加供应商数据。")
+                    return
+
+                if force:
+                    print("强制模式：正在清空现有付款单数据...")
+                    num_deleted = db.session.query(PayORM).delete()
+                    # 批量删除不触发 PayORM 事件，重算全部订单的已付款金额和余额
+                    refresh_order_totals(db.session.connection())
+                    print(f"已清空 {num_deleted} 条现有付款单数据。")
+
+                # 检查是否已有数据
+                if PayORM.query.count() > 0 and not force:
+                    print("数据库中已有付款单数据，跳过添加。如需强制添加，请使用 --force 参数。")
+                    return
+
+                supplier_ids = [s.id for s in suppliers]
             
-            # 生成付款单数据
-            pay_records = []
-            pay_number_counter = 1
+                # 生成付款单数据
+                pay_records = []
+                pay_number_counter = 1
             
-            # 为每个订单创建1-3个付款单
-            for order in orders:
-                # 随机决定为这个订单创建几个付款单（1-3个）
-                import random
-                num_pays = random.randint(1, 3)
+                # 为每个订单创建1-3个付款单
+                for order in orders:
+                    # 随机决定为这个订单创建几个付款单（1-3个）
+                    import random
+                    num_pays = random.randint(1, 3)
                 
-                # 获取订单金额
-                order_amount = float(order.order_amount) if order.order_amount else 0
+                    # 获取订单金额
+                    order_amount = float(order.order_amount) if order.order_amount else 0
                 
-                # 为每个付款单分配金额
-                remaining_amount = order_amount
+                    # 为每个付款单分配金额
+                    remaining_amount = order_amount
                 
-                for i in range(num_pays):
-                    # 生成付款单编号
-                    pay_number = f"P{datetime.now().strftime('%Y%m%d')}{str(pay_number_counter).zfill(4)}"
-                    pay_number_counter += 1
+                    for i in range(num_pays):
+                        # 生成付款单编号
+                        pay_number = f"P{datetime.now().strftime('%Y%m%d')}{str(pay_number_counter).zfill(4)}"
+                        pay_number_counter += 1
                     
-                    # 如果是最后一个付款单，使用剩余金额
-                    if i == num_pays - 1:
-                        current_amount = remaining_amount
-                    else:
-                        # 随机分配金额（不超过剩余金额的70%）
-                        max_amount = remaining_amount * 0.7
-                        current_amount = random.uniform(order_amount * 0.1, max_amount)
-                        remaining_amount -= current_amount
+                        # 如果是最后一个付款单，使用剩余金额
+                        if i == num_pays - 1:
+                            current_amount = remaining_amount
+                        else:
+                            # 随机分配金额（不超过剩余金额的70%）
+                            max_amount = remaining_amount * 0.7
+                            current_amount = random.uniform(order_amount * 0.1, max_amount)
+                            remaining_amount -= current_amount
                     
-                    # 开票金额通常是付款金额的1.0-1.1倍（含税）
-                    invoice_amount = current_amount * random.uniform(1.0, 1.1)
+                        # 开票金额通常是付款金额的1.0-1.1倍（含税）
+                        invoice_amount = current_amount * random.uniform(1.0, 1.1)
                     
-                    # 随机选择付款单位和收款单位（不能相同）
-                    payer_id = random.choice(supplier_ids)
-                    payee_id = random.choice([sid for sid in supplier_ids if sid != payer_id])
+                        # 随机选择付款单位和收款单位（不能相同）
+                        payer_id = random.choice(supplier_ids)
+                        payee_id = random.choice([sid for sid in supplier_ids if sid != payer_id])
                     
-                    # 随机选择付款状态
-                    payment_status = random.choice(payment_statuses)
+                        # 随机选择付款状态
+                        payment_status = random.choice(payment_statuses)
                     
-                    # 随机选择付款用途
-                    payment_purpose = random.choice(payment_purposes)
+                        # 随机选择付款用途
+                        payment_purpose = random.choice(payment_purposes)
                     
-                    # 随机选择经办人
-                    handler = random.choice(handlers)
+                        # 随机选择经办人
+                        handler = random.choice(handlers)
                     
-                    pay_record = {
-                        "pay_number": pay_number,
-                        "order_id": order.id,
-                        "payer_supplier_id": payer_id,
-                        "payee_supplier_id": payee_id,
-                        "payment_purpose": f"{payment_purpose} - {order.order_number}",
-                        "current_payment_amount": Decimal(str(round(current_amount, 2))),
-                        "invoice_amount": Decimal(str(round(invoice_amount, 2))),
-                        "payment_status": payment_status,
-                        "handler": handler,
-                        "create_at": datetime.now()
-                    }
+                        pay_record = {
+                            "pay_number": pay_number,
+                            "order_id": order.id,
+                            "payer_supplier_id": payer_id,
+                            "payee_supplier_id": payee_id,
+                            "payment_purpose": f"{payment_purpose} - {order.order_number}",
+                            "current_payment_amount": Decimal(str(round(current_amount, 2))),
+                            "invoice_amount": Decimal(str(round(invoice_amount, 2))),
+                            "payment_status": payment_status,
+                            "handler": handler,
+                            "create_at": datetime.now()
+                        }
                     
-                    pay_records.append(pay_record)
+                        pay_records.append(pay_record)
+
+                # 批量插入数据
+                for pay_data in pay_records:
+                    pay = PayORM(**pay_data)
+                    db.session.add(pay)
 
-            # 批量插入数据
-            for pay_data in pay_records:
-                pay = PayORM(**pay_data)
-                db.session.add(pay)
+            if force:
+                # 批量删除绕过了 ORM 事件，月度汇总和全文索引中仍有已删除的行，按表重新生成
+                rebuild_rollup()
+                rebuild_indexes()
 
-            db.session.commit()
             print(f"成功添加 {len(pay_records)} 条付款单测试数据！")
 
             # 统计信息
@@ -4,6 +4,7 @@ from decimal import Decimal
 from pear_admin import create_app
 from pear_admin.extensions import db
 from pear_admin.orms import ProjectORM
+from pear_admin.utils.unit_of_work import unit_of_work
 
 app = create_app()
 
@@ -164,24 +165,24 @@ test_projects = [
 def add_test_data(force=False):
     with app.app_context():
         try:
-            # 检查是否已有数据
-            existing_count = ProjectORM.query.count()
-            if existing_count > 0 and not force:
-                print(f"数据库中已有 {existing_count} 条项目数据。")
-                print("如需强制添加，请使用: python add_project_test_data.py --force")
-                return
+            # 清空和插入在同一个工作单元中提交一次，插入失败时不会留下被清空的表
+            with unit_of_work():
+                # 检查是否已有数据
+                existing_count = ProjectORM.query.count()
+                if existing_count > 0 and not force:
+                    print(f"数据库中已有 {existing_count} 条项目数据。")
+                    print("如需强制添加，请使用: python add_project_test_data.py --force")
+                    return
             
-            # 如果强制添加，先清空现有数据
-            if force and existing_count > 0:
-                ProjectORM.query.delete()
-                db.session.commit()
-                print(f"已清空 {existing_count} 条现有数据。")
+                # 如果强制添加，先清空现有数据
+                if force and existing_count > 0:
+                    ProjectORM.query.delete()
+                    print(f"已清空 {existing_count} 条现有数据。")
             
-            for project_data in test_projects:
-                project = ProjectORM(**project_data)
-                db.session.add(project)
-            
-            db.session.commit()
+                for project_data in test_projects:
+                    project = ProjectORM(**project_data)
+                    db.session.add(project)
+
             print(f"成功添加 {len(test_projects)} 条项目测试数据！")
             
             # 显示添加的数据统计
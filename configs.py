@@ -9,9 +9,39 @@ class BaseConfig:
 
     ROOT_PATH = os.path.dirname(os.path.abspath(__file__))
     UPLOAD_FOLDER = os.path.join(ROOT_PATH, "uploads")
+    # 分片上传的单个分片上限（字节），需与 nginx client_max_body_size 配合
+    UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+    # 分片上传会话超过该时长没有收到新分片即视为放弃，由 flask blob gc 清理
+    UPLOAD_SESSION_EXPIRE = timedelta(days=2)
+    # Nginx 中映射到上传目录的 internal location 前缀；为空时由 Flask 直接发送文件
+    UPLOAD_ACCEL_REDIRECT = os.getenv("UPLOAD_ACCEL_REDIRECT", "")
+    # 附件缩略图生成方式：thread 进程内线程池 / worker 由 flask preview worker 处理 / off 不生成
+    PREVIEW_MODE = os.getenv("PREVIEW_MODE", "thread")
+    PREVIEW_WORKERS = 2
+    # 缩略图、预览图的长边像素
+    THUMBNAIL_SIZE = 256
+    PREVIEW_SIZE = 1280
 
     JWT_TOKEN_LOCATION = ["headers"]
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=7)
+    # 下载链接中短期 token 的有效期，见 pear_admin.utils.downloads
+    DOWNLOAD_TOKEN_EXPIRES = timedelta(minutes=5)
+
+    # 列表总数缓存时间（秒）；无过滤条件时是否使用数据库统计信息中的估算行数
+    COUNT_CACHE_TTL = 30
+    COUNT_USE_ESTIMATE = False
+    # 数据看板统计结果缓存时间（秒），相关表被写入后立即失效
+    DASHBOARD_CACHE_TTL = 60
+    # JWT 当前用户（资料、角色、权限）缓存时间（秒），权限数据被修改后立即失效
+    IDENTITY_CACHE_TTL = 300
+    # 编译后菜单树的缓存时间（秒），权限或角色授权被修改后立即失效
+    MENU_CACHE_TTL = 300
+    # 单号序列每次从数据库领取的号段大小
+    SEQUENCE_BLOCK_SIZE = 100
+    # 单个请求提交事务超过该次数时记录警告日志（0 为不检查）
+    COMMITS_PER_REQUEST_WARN = 3
+    # 订单批量导入每批校验、写入的行数
+    IMPORT_BATCH_SIZE = 1000
 
 
 class DevelopmentConfig(BaseConfig):
@@ -27,6 +57,7 @@ class TestingConfig(BaseConfig):
     """测试配置"""
 
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"  # 内存数据库
+    RAISE_ON_LAZYLOAD = True  # 序列化时出现懒加载直接报错，用于发现 N+1 查询
 
 
 class ProductionConfig(BaseConfig):
@@ -45,5 +76,8 @@ class ProductionConfig(BaseConfig):
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # 生产环境由 Nginx 发送上传文件，见 nginx/nginx.conf
+    UPLOAD_ACCEL_REDIRECT = os.getenv("UPLOAD_ACCEL_REDIRECT", "/_protected_uploads/")
+
 
 config = {"dev": DevelopmentConfig, "test": TestingConfig, "prod": ProductionConfig}
@@ -94,6 +94,15 @@ def run_migrations_online():
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
 
+    # SQLite 全文索引影子表 (*_fts) 不在 ORM 元数据中，自动生成迁移时忽略
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ == "table" and reflected and "_fts" in name:
+            return False
+        return True
+
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
+
     connectable = get_engine()
 
     with connectable.connect() as connection:
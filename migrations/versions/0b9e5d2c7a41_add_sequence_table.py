@@ -0,0 +1,28 @@
+"""Add sys_sequence counter table
+
+Revision ID: 0b9e5d2c7a41
+Revises: f3a8c1d5e6b2
+Create Date: 2026-10-18 16:21:48.903115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b9e5d2c7a41'
+down_revision = 'f3a8c1d5e6b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sys_sequence',
+    sa.Column('name', sa.String(length=32), nullable=False, comment='序列名称'),
+    sa.Column('next_value', sa.BigInteger(), nullable=False, comment='下一个未分配的值'),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('sys_sequence')
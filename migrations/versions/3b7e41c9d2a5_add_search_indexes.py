@@ -0,0 +1,71 @@
+"""Add full-text search indexes
+
+Revision ID: 3b7e41c9d2a5
+Revises: ebe029624e8a
+Create Date: 2026-10-18 10:12:40.513204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e41c9d2a5'
+down_revision = 'ebe029624e8a'
+branch_labels = None
+depends_on = None
+
+
+SEARCH_COLUMNS = {
+    'ums_order': (
+        'order_number', 'material_name', 'project_name', 'supplier_contact_person',
+        'contact_phone', 'material_manager', 'sub_project_manager',
+    ),
+    'ums_pay': ('pay_number', 'payment_status', 'handler'),
+    'ums_supplier': (
+        'name', 'contact_person', 'phone', 'email', 'bank_name',
+        'account_number', 'address', 'remark',
+    ),
+    'ums_payer': ('name', 'bank_name', 'account_number', 'remark'),
+}
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+    for table_name, columns in SEARCH_COLUMNS.items():
+        if table_name not in tables:
+            continue
+        if bind.dialect.name == 'mysql':
+            # MySQL: 每列一个 ngram 全文索引；关闭停用词，否则含 a、is 等的 n-gram 不进索引
+            op.execute('SET SESSION innodb_ft_enable_stopword = OFF')
+            for column in columns:
+                op.execute(
+                    f'ALTER TABLE {table_name} ADD FULLTEXT INDEX '
+                    f'ft_{table_name}_{column} ({column}) WITH PARSER ngram'
+                )
+        elif bind.dialect.name == 'sqlite':
+            # SQLite: FTS5 影子表，由 ORM 事件维护
+            fts_name = f'{table_name}_fts'
+            op.execute(f'DROP TABLE IF EXISTS {fts_name}')
+            op.execute(
+                f"CREATE VIRTUAL TABLE {fts_name} USING fts5"
+                f"({', '.join(columns)}, tokenize = 'trigram')"
+            )
+            op.execute(
+                f"INSERT INTO {fts_name} (rowid, {', '.join(columns)}) "
+                f"SELECT id, {', '.join(columns)} FROM {table_name}"
+            )
+
+
+def downgrade():
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+    for table_name, columns in SEARCH_COLUMNS.items():
+        if bind.dialect.name == 'mysql':
+            if table_name not in tables:
+                continue
+            for column in columns:
+                op.execute(f'ALTER TABLE {table_name} DROP INDEX ft_{table_name}_{column}')
+        elif bind.dialect.name == 'sqlite':
+            op.execute(f'DROP TABLE IF EXISTS {table_name}_fts')
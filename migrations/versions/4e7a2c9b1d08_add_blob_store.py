@@ -0,0 +1,48 @@
+"""Add sys_blob content store and ums_attachment.blob_sha256
+
+Revision ID: 4e7a2c9b1d08
+Revises: 9d1f6b3e8c52
+Create Date: 2026-10-18 19:42:10.518374
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e7a2c9b1d08'
+down_revision = '9d1f6b3e8c52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sys_blob',
+    sa.Column('sha256', sa.String(length=64), nullable=False, comment='文件内容的 SHA-256'),
+    sa.Column('size', sa.BigInteger(), nullable=False, comment='文件大小（字节）'),
+    sa.Column('path', sa.String(length=512), nullable=False, comment='相对 UPLOAD_FOLDER 的存储路径'),
+    sa.Column('ref_count', sa.Integer(), server_default='0', nullable=False, comment='引用该文件的附件数'),
+    sa.Column('create_at', sa.DateTime(), nullable=False, comment='创建时间'),
+    sa.Column('update_at', sa.DateTime(), nullable=False, comment='最近一次被上传或引用数变化的时间，垃圾回收的宽限期从这里算起'),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    with op.batch_alter_table('sys_blob', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_sys_blob_update_at'), ['update_at'], unique=False)
+
+    # 已有附件仍指向原来的带时间戳文件，blob_sha256 为空，不参与去重和回收
+    with op.batch_alter_table('ums_attachment', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('blob_sha256', sa.String(length=64), nullable=True, comment='引用的文件内容，旧附件为空'))
+        batch_op.create_index(batch_op.f('ix_ums_attachment_blob_sha256'), ['blob_sha256'], unique=False)
+        batch_op.create_foreign_key('fk_ums_attachment_blob_sha256', 'sys_blob', ['blob_sha256'], ['sha256'])
+
+
+def downgrade():
+    with op.batch_alter_table('ums_attachment', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_ums_attachment_blob_sha256', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_ums_attachment_blob_sha256'))
+        batch_op.drop_column('blob_sha256')
+
+    with op.batch_alter_table('sys_blob', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sys_blob_update_at'))
+
+    op.drop_table('sys_blob')
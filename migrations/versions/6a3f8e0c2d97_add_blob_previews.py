@@ -0,0 +1,39 @@
+"""Add thumbnail / preview columns to sys_blob
+
+Revision ID: 6a3f8e0c2d97
+Revises: 4e7a2c9b1d08
+Create Date: 2026-10-18 21:05:37.264190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a3f8e0c2d97'
+down_revision = '4e7a2c9b1d08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('sys_blob', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('preview_status', sa.String(length=16), nullable=True, comment='缩略图生成状态：pending / processing / done / failed，不支持预览的文件为空'))
+        batch_op.add_column(sa.Column('thumbnail_path', sa.String(length=512), nullable=True, comment='缩略图存储路径'))
+        batch_op.add_column(sa.Column('preview_path', sa.String(length=512), nullable=True, comment='预览图（PDF 为首页）存储路径'))
+        batch_op.create_index(batch_op.f('ix_sys_blob_preview_status'), ['preview_status'], unique=False)
+
+    # 已有的图片和 PDF 交给 flask preview worker 补生成
+    op.execute(
+        "UPDATE sys_blob SET preview_status = 'pending' WHERE "
+        "LOWER(path) LIKE '%.png' OR LOWER(path) LIKE '%.jpg' OR LOWER(path) LIKE '%.jpeg' "
+        "OR LOWER(path) LIKE '%.gif' OR LOWER(path) LIKE '%.pdf'"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('sys_blob', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sys_blob_preview_status'))
+        batch_op.drop_column('preview_path')
+        batch_op.drop_column('thumbnail_path')
+        batch_op.drop_column('preview_status')
@@ -0,0 +1,45 @@
+"""Add nursery dashboard statistics indexes
+
+Revision ID: 7c4d2e9f1a36
+Revises: 0b9e5d2c7a41
+Create Date: 2026-10-18 17:05:33.418260
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4d2e9f1a36'
+down_revision = '0b9e5d2c7a41'
+branch_labels = None
+depends_on = None
+
+
+def _existing_tables():
+    # 苗圃表由 db.create_all() 创建，不在迁移链中；表不存在时由 create_all 按模型建出索引
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade():
+    tables = _existing_tables()
+    if 'nursery_plant' in tables:
+        with op.batch_alter_table('nursery_plant', schema=None) as batch_op:
+            batch_op.create_index('ix_nursery_plant_quantity', ['quantity'], unique=False)
+            batch_op.create_index('ix_nursery_plant_category_quantity', ['category', 'quantity'], unique=False)
+
+    if 'nursery_transaction' in tables:
+        with op.batch_alter_table('nursery_transaction', schema=None) as batch_op:
+            batch_op.create_index('ix_nursery_transaction_type_create_at', ['type', 'create_at'], unique=False)
+
+
+def downgrade():
+    tables = _existing_tables()
+    if 'nursery_transaction' in tables:
+        with op.batch_alter_table('nursery_transaction', schema=None) as batch_op:
+            batch_op.drop_index('ix_nursery_transaction_type_create_at')
+
+    if 'nursery_plant' in tables:
+        with op.batch_alter_table('nursery_plant', schema=None) as batch_op:
+            batch_op.drop_index('ix_nursery_plant_category_quantity')
+            batch_op.drop_index('ix_nursery_plant_quantity')
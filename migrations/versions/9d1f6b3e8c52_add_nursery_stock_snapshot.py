@@ -0,0 +1,37 @@
+"""Add nursery_stock_snapshot table
+
+Revision ID: 9d1f6b3e8c52
+Revises: 7c4d2e9f1a36
+Create Date: 2026-10-18 17:48:12.550734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d1f6b3e8c52'
+down_revision = '7c4d2e9f1a36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('nursery_stock_snapshot',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('snapshot_date', sa.Date(), nullable=False, comment='快照日期（当日结束时的库存）'),
+    sa.Column('plant_id', sa.Integer(), nullable=False, comment='关联库存ID'),
+    sa.Column('quantity', sa.Numeric(precision=12, scale=2), nullable=False, comment='库存数量'),
+    sa.Column('create_at', sa.DateTime(), nullable=True, comment='生成时间'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('snapshot_date', 'plant_id', name='uq_nursery_stock_snapshot_date_plant')
+    )
+    with op.batch_alter_table('nursery_stock_snapshot', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_nursery_stock_snapshot_plant_id'), ['plant_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('nursery_stock_snapshot', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_nursery_stock_snapshot_plant_id'))
+
+    op.drop_table('nursery_stock_snapshot')
@@ -0,0 +1,32 @@
+"""Add create_at composite indexes to order and pay tables
+
+Revision ID: a41d0e6f8c13
+Revises: 3b7e41c9d2a5
+Create Date: 2026-10-18 11:03:17.224518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41d0e6f8c13'
+down_revision = '3b7e41c9d2a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ums_order', schema=None) as batch_op:
+        batch_op.create_index('ix_ums_order_create_at_id', ['create_at', 'id'], unique=False)
+
+    with op.batch_alter_table('ums_pay', schema=None) as batch_op:
+        batch_op.create_index('ix_ums_pay_create_at_id', ['create_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ums_pay', schema=None) as batch_op:
+        batch_op.drop_index('ix_ums_pay_create_at_id')
+
+    with op.batch_alter_table('ums_order', schema=None) as batch_op:
+        batch_op.drop_index('ix_ums_order_create_at_id')
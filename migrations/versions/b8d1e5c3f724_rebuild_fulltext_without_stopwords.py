@@ -0,0 +1,60 @@
+"""Rebuild MySQL full-text indexes without stopwords
+
+Revision ID: b8d1e5c3f724
+Revises: 6a3f8e0c2d97
+Create Date: 2026-10-19 09:42:18.730512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d1e5c3f724'
+down_revision = '6a3f8e0c2d97'
+branch_labels = None
+depends_on = None
+
+
+SEARCH_COLUMNS = {
+    'ums_order': (
+        'order_number', 'material_name', 'project_name', 'supplier_contact_person',
+        'contact_phone', 'material_manager', 'sub_project_manager',
+    ),
+    'ums_pay': ('pay_number', 'payment_status', 'handler'),
+    'ums_supplier': (
+        'name', 'contact_person', 'phone', 'email', 'bank_name',
+        'account_number', 'address', 'remark',
+    ),
+    'ums_payer': ('name', 'bank_name', 'account_number', 'remark'),
+}
+
+
+def _rebuild(stopwords):
+    bind = op.get_bind()
+    if bind.dialect.name != 'mysql':
+        # SQLite 的 FTS5 trigram 没有停用词
+        return
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+    op.execute(f"SET SESSION innodb_ft_enable_stopword = {'ON' if stopwords else 'OFF'}")
+    for table_name, columns in SEARCH_COLUMNS.items():
+        if table_name not in tables:
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table_name)}
+        for column in columns:
+            name = f'ft_{table_name}_{column}'
+            if name in existing:
+                op.execute(f'ALTER TABLE {table_name} DROP INDEX {name}')
+            op.execute(
+                f'ALTER TABLE {table_name} ADD FULLTEXT INDEX {name} ({column}) WITH PARSER ngram'
+            )
+
+
+def upgrade():
+    # 按默认停用词表建立的索引丢弃了含 a、i、is、at 等的 n-gram，关闭停用词重建
+    _rebuild(stopwords=False)
+
+
+def downgrade():
+    _rebuild(stopwords=True)
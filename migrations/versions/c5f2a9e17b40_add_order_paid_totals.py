@@ -0,0 +1,38 @@
+"""Add materialized paid_total, pay_count and balance to order table
+
+Revision ID: c5f2a9e17b40
+Revises: a41d0e6f8c13
+Create Date: 2026-10-18 13:26:51.087342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f2a9e17b40'
+down_revision = 'a41d0e6f8c13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ums_order', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('paid_total', sa.Numeric(precision=18, scale=2), server_default='0', nullable=False, comment='已付款金额合计'))
+        batch_op.add_column(sa.Column('pay_count', sa.Integer(), server_default='0', nullable=False, comment='付款单数量'))
+        batch_op.add_column(sa.Column('balance', sa.Numeric(precision=18, scale=2), nullable=True, comment='订单余额（订单金额 - 已付款金额）'))
+
+    # 按现有付款单回填
+    op.execute(
+        'UPDATE ums_order SET '
+        'paid_total = (SELECT COALESCE(SUM(current_payment_amount), 0) FROM ums_pay WHERE ums_pay.order_id = ums_order.id), '
+        'pay_count = (SELECT COUNT(id) FROM ums_pay WHERE ums_pay.order_id = ums_order.id)'
+    )
+    op.execute('UPDATE ums_order SET balance = COALESCE(order_amount, 0) - paid_total')
+
+
+def downgrade():
+    with op.batch_alter_table('ums_order', schema=None) as batch_op:
+        batch_op.drop_column('balance')
+        batch_op.drop_column('pay_count')
+        batch_op.drop_column('paid_total')
@@ -0,0 +1,103 @@
+"""Make nursery_plant.spec / unit NOT NULL DEFAULT ''
+
+Revision ID: d6a2f0b8e315
+Revises: b8d1e5c3f724
+Create Date: 2026-10-19 10:26:51.408237
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6a2f0b8e315'
+down_revision = 'b8d1e5c3f724'
+branch_labels = None
+depends_on = None
+
+
+def _merge_null_keys(bind):
+    """
+    唯一索引中 NULL 互不相等，规格 / 单位为 NULL 的同一苗木可能有多条库存。
+    按 NULL 视为空字符串分组，合并到 id 最小的一条：数量相加、按数量加权平均成本价，
+    流水改为指向保留的记录，库存快照按日期累加到保留的记录
+    """
+    has_snapshot = 'nursery_stock_snapshot' in sa.inspect(bind).get_table_names()
+    groups = bind.execute(sa.text(
+        "SELECT name, COALESCE(spec, ''), COALESCE(unit, '') FROM nursery_plant "
+        "GROUP BY name, COALESCE(spec, ''), COALESCE(unit, '') HAVING COUNT(id) > 1"
+    )).all()
+    for name, spec, unit in groups:
+        rows = bind.execute(sa.text(
+            "SELECT id, quantity, price FROM nursery_plant "
+            "WHERE name = :name AND COALESCE(spec, '') = :spec AND COALESCE(unit, '') = :unit ORDER BY id"
+        ), {'name': name, 'spec': spec, 'unit': unit}).all()
+        keep_id = rows[0][0]
+        total_qty = sum(float(r[1] or 0) for r in rows)
+        total_value = sum(float(r[1] or 0) * float(r[2] or 0) for r in rows)
+        avg_price = total_value / total_qty if total_qty > 0 else float(rows[0][2] or 0)
+        duplicate_ids = [r[0] for r in rows[1:]]
+
+        bind.execute(sa.text(
+            'UPDATE nursery_plant SET quantity = :quantity, price = :price WHERE id = :id'
+        ), {'quantity': total_qty, 'price': avg_price, 'id': keep_id})
+        for duplicate_id in duplicate_ids:
+            bind.execute(sa.text(
+                'UPDATE nursery_transaction SET plant_id = :keep_id WHERE plant_id = :id'
+            ), {'keep_id': keep_id, 'id': duplicate_id})
+            if has_snapshot:
+                _merge_snapshots(bind, keep_id, duplicate_id)
+            bind.execute(sa.text('DELETE FROM nursery_plant WHERE id = :id'), {'id': duplicate_id})
+
+
+def _merge_snapshots(bind, keep_id, duplicate_id):
+    """
+    把重复记录的快照并入保留的记录
+    同一天两者都有快照时数量相加（(snapshot_date, plant_id) 唯一），否则直接改 plant_id
+    """
+    kept = {
+        row[0]: row[1] for row in bind.execute(sa.text(
+            'SELECT snapshot_date, id FROM nursery_stock_snapshot WHERE plant_id = :id'
+        ), {'id': keep_id})
+    }
+    rows = bind.execute(sa.text(
+        'SELECT id, snapshot_date, quantity FROM nursery_stock_snapshot WHERE plant_id = :id'
+    ), {'id': duplicate_id}).all()
+    for snapshot_id, snapshot_date, quantity in rows:
+        if snapshot_date in kept:
+            bind.execute(sa.text(
+                'UPDATE nursery_stock_snapshot SET quantity = quantity + :quantity WHERE id = :id'
+            ), {'quantity': quantity, 'id': kept[snapshot_date]})
+            bind.execute(sa.text('DELETE FROM nursery_stock_snapshot WHERE id = :id'), {'id': snapshot_id})
+        else:
+            bind.execute(sa.text(
+                'UPDATE nursery_stock_snapshot SET plant_id = :keep_id WHERE id = :id'
+            ), {'keep_id': keep_id, 'id': snapshot_id})
+
+
+def upgrade():
+    # 苗圃表由 db.create_all() 创建，不在迁移链中；表不存在时由 create_all 按模型建出
+    bind = op.get_bind()
+    if 'nursery_plant' not in sa.inspect(bind).get_table_names():
+        return
+
+    _merge_null_keys(bind)
+    bind.execute(sa.text("UPDATE nursery_plant SET spec = '' WHERE spec IS NULL"))
+    bind.execute(sa.text("UPDATE nursery_plant SET unit = '' WHERE unit IS NULL"))
+    with op.batch_alter_table('nursery_plant', schema=None) as batch_op:
+        batch_op.alter_column('spec', existing_type=sa.String(length=100), nullable=False,
+                              server_default='', existing_comment='规格')
+        batch_op.alter_column('unit', existing_type=sa.String(length=20), nullable=False,
+                              server_default='', existing_comment='单位')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if 'nursery_plant' not in sa.inspect(bind).get_table_names():
+        return
+
+    with op.batch_alter_table('nursery_plant', schema=None) as batch_op:
+        batch_op.alter_column('spec', existing_type=sa.String(length=100), nullable=True,
+                              server_default=None, existing_comment='规格')
+        batch_op.alter_column('unit', existing_type=sa.String(length=20), nullable=True,
+                              server_default=None, existing_comment='单位')
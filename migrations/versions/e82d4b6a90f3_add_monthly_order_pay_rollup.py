@@ -0,0 +1,47 @@
+"""Add agg_monthly_order_pay rollup table
+
+Revision ID: e82d4b6a90f3
+Revises: c5f2a9e17b40
+Create Date: 2026-10-18 14:12:40.315207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e82d4b6a90f3'
+down_revision = 'c5f2a9e17b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('agg_monthly_order_pay',
+    sa.Column('month', sa.String(length=7), nullable=False, comment='月份 (YYYY-MM)'),
+    sa.Column('order_count', sa.Integer(), server_default='0', nullable=False, comment='订单数量'),
+    sa.Column('order_amount', sa.Numeric(precision=18, scale=2), server_default='0', nullable=False, comment='订单金额合计'),
+    sa.Column('pay_count', sa.Integer(), server_default='0', nullable=False, comment='付款单数量'),
+    sa.Column('pay_amount', sa.Numeric(precision=18, scale=2), server_default='0', nullable=False, comment='付款金额合计'),
+    sa.PrimaryKeyConstraint('month')
+    )
+
+    # 按现有订单和付款单回填
+    if op.get_bind().dialect.name == 'mysql':
+        order_month = "DATE_FORMAT(create_at, '%Y-%m')"
+    else:
+        order_month = "strftime('%Y-%m', create_at)"
+    op.execute(
+        'INSERT INTO agg_monthly_order_pay (month, order_count, order_amount, pay_count, pay_amount) '
+        'SELECT month, SUM(order_count), SUM(order_amount), SUM(pay_count), SUM(pay_amount) FROM ('
+        f'SELECT {order_month} AS month, COUNT(id) AS order_count, COALESCE(SUM(order_amount), 0) AS order_amount, '
+        '0 AS pay_count, 0 AS pay_amount FROM ums_order GROUP BY 1 '
+        'UNION ALL '
+        f'SELECT {order_month} AS month, 0, 0, COUNT(id), COALESCE(SUM(current_payment_amount), 0) '
+        'FROM ums_pay GROUP BY 1'
+        ') AS t GROUP BY month'
+    )
+
+
+def downgrade():
+    op.drop_table('agg_monthly_order_pay')
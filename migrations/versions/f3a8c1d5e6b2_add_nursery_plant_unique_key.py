@@ -0,0 +1,66 @@
+"""Add unique (name, spec, unit) key to nursery_plant
+
+Revision ID: f3a8c1d5e6b2
+Revises: e82d4b6a90f3
+Create Date: 2026-10-18 15:40:02.671935
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8c1d5e6b2'
+down_revision = 'e82d4b6a90f3'
+branch_labels = None
+depends_on = None
+
+
+def _merge_duplicates(bind):
+    """
+    把同名、同规格、同单位的重复库存合并到 id 最小的一条：
+    数量相加、按数量加权平均成本价，流水改为指向保留的记录
+    """
+    groups = bind.execute(sa.text(
+        'SELECT name, spec, unit FROM nursery_plant '
+        'GROUP BY name, spec, unit HAVING COUNT(id) > 1'
+    )).all()
+    for name, spec, unit in groups:
+        rows = bind.execute(sa.text(
+            'SELECT id, quantity, price FROM nursery_plant '
+            'WHERE name = :name AND spec = :spec AND unit = :unit ORDER BY id'
+        ), {'name': name, 'spec': spec, 'unit': unit}).all()
+        keep_id = rows[0][0]
+        total_qty = sum(float(r[1] or 0) for r in rows)
+        total_value = sum(float(r[1] or 0) * float(r[2] or 0) for r in rows)
+        avg_price = total_value / total_qty if total_qty > 0 else float(rows[0][2] or 0)
+        duplicate_ids = [r[0] for r in rows[1:]]
+
+        bind.execute(sa.text(
+            'UPDATE nursery_plant SET quantity = :quantity, price = :price WHERE id = :id'
+        ), {'quantity': total_qty, 'price': avg_price, 'id': keep_id})
+        for duplicate_id in duplicate_ids:
+            bind.execute(sa.text(
+                'UPDATE nursery_transaction SET plant_id = :keep_id WHERE plant_id = :id'
+            ), {'keep_id': keep_id, 'id': duplicate_id})
+            bind.execute(sa.text('DELETE FROM nursery_plant WHERE id = :id'), {'id': duplicate_id})
+
+
+def upgrade():
+    # 苗圃表由 db.create_all() 创建，不在迁移链中；表不存在时由 create_all 按模型建出唯一索引
+    bind = op.get_bind()
+    if 'nursery_plant' not in sa.inspect(bind).get_table_names():
+        return
+
+    _merge_duplicates(bind)
+    with op.batch_alter_table('nursery_plant', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_nursery_plant_name_spec_unit', ['name', 'spec', 'unit'])
+
+
+def downgrade():
+    bind = op.get_bind()
+    if 'nursery_plant' not in sa.inspect(bind).get_table_names():
+        return
+
+    with op.batch_alter_table('nursery_plant', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_nursery_plant_name_spec_unit', type_='unique')
@@ -1,11 +1,33 @@
+import re
+from urllib.parse import parse_qsl, urlsplit
+
 from flask import Blueprint, request
 from flask_jwt_extended import jwt_required
 
 from pear_admin.extensions import db
-from pear_admin.orms import AttachmentORM
+from pear_admin.orms import AttachmentORM, BlobORM, ProjectORM
+from pear_admin.utils.blob_store import sha_from_url
+from pear_admin.utils.downloads import (
+    URL_PREFIX,
+    download_required,
+    relpath_from_url,
+    send_upload,
+    signed_url,
+)
+from pear_admin.utils.loader import apply_loaders
 
 attachment_api = Blueprint("attachment", __name__, url_prefix="/attachment")
 
+# AttachmentORM.json() 会访问的关系
+ATTACHMENT_LIST_LOADERS = ("blob",)
+
+# 可以签发下载链接的附件接口地址
+_ATTACHMENT_FILE_URL = re.compile(
+    r"^/api/v1/attachment/(\d+/download|blobs/[0-9a-f]{64}/(thumbnail|preview))$"
+)
+# 一次最多查询的缩略图数量
+MAX_THUMBNAIL_URLS = 200
+
 
 @attachment_api.delete("/<int:aid>")
 @jwt_required()
@@ -21,10 +43,103 @@ def delete_attachment(aid):
 @attachment_api.get("/project/<int:pid>")
 @jwt_required()
 def get_project_attachments(pid):
-    attachments = AttachmentORM.query.filter_by(project_id=pid).all()
+    q = apply_loaders(AttachmentORM.query.filter_by(project_id=pid), AttachmentORM, ATTACHMENT_LIST_LOADERS)
+    attachments = q.all()
     return {
         "code": 0,
         "msg": "获取附件列表成功",
         "data": [att.json() for att in attachments]
     }
 
+
+@attachment_api.post("/download-url")
+@jwt_required()
+def create_download_url():
+    """为上传文件或附件下载地址签发短期下载链接，前端拿到后再用浏览器打开"""
+    url = (request.get_json() or {}).get("url") or ""
+    parts = urlsplit(url)
+    path = parts.path
+    if not (path.startswith(URL_PREFIX) or _ATTACHMENT_FILE_URL.match(path)):
+        return {"code": -1, "msg": "不支持的下载地址"}
+    params = {k: v for k, v in parse_qsl(parts.query) if k != "jwt"}
+    return {"code": 0, "msg": "获取下载链接成功", "data": {"url": signed_url(path, **params)}}
+
+
+@attachment_api.get("/<int:aid>/download")
+@download_required
+def download_attachment(aid):
+    # 浏览器直接打开下载链接时无法带请求头，下载 token 通过 ?jwt= 传入
+    attachment = db.session.get(AttachmentORM, aid)
+    if not attachment:
+        return {"code": -1, "msg": "附件不存在"}, 404
+
+    # 附件必须属于一个存在的项目；指定了 project_id 时还要与附件所属项目一致
+    project_id = request.args.get("project_id", type=int)
+    if project_id is not None and project_id != attachment.project_id:
+        return {"code": -1, "msg": "附件不属于该项目"}, 403
+    if db.session.get(ProjectORM, attachment.project_id) is None:
+        return {"code": -1, "msg": "附件所属项目不存在"}, 404
+
+    relpath = relpath_from_url(attachment.file_path)
+    if relpath is None:
+        return {"code": -1, "msg": "附件文件不存在"}, 404
+    return send_upload(
+        relpath,
+        download_name=attachment.original_filename,
+        as_attachment=not request.args.get("inline", default=0, type=int),
+    )
+
+
+# ---------------------------------------------------------------- 缩略图与预览图
+#
+# 缩略图按文件内容生成（见 utils.previews），项目附件和订单附件（只有文件地址）都按内容哈希访问。
+# <img> 无法带请求头，列表页先用 POST /thumbnails 一次取回整张列表的缩略图地址（带短期下载 token），
+# 点击缩略图再通过 /download-url 签发预览图链接。
+
+
+def _blob_preview_path(sha, kind):
+    return f"/api/v1/attachment/blobs/{sha}/{kind}"
+
+
+@attachment_api.post("/thumbnails")
+@jwt_required()
+def get_thumbnails():
+    """按文件地址批量查询缩略图，返回 {文件地址: {thumbnail_url, preview_url}}，没有缩略图的文件不返回"""
+    urls = (request.get_json() or {}).get("urls") or []
+    if not isinstance(urls, list):
+        return {"code": -1, "msg": "参数格式错误"}
+    shas = {}
+    for url in urls[:MAX_THUMBNAIL_URLS]:
+        sha = sha_from_url(url) if isinstance(url, str) else None
+        if sha:
+            shas.setdefault(sha, []).append(url)
+
+    data = {}
+    if shas:
+        for sha in db.session.scalars(
+            db.select(BlobORM.sha256).where(
+                BlobORM.sha256.in_(list(shas)), BlobORM.thumbnail_path.isnot(None)
+            )
+        ):
+            thumbnail = signed_url(_blob_preview_path(sha, "thumbnail"))
+            for url in shas[sha]:
+                data[url] = {"thumbnail_url": thumbnail, "preview_url": _blob_preview_path(sha, "preview")}
+    return {"code": 0, "msg": "获取缩略图成功", "data": data}
+
+
+@attachment_api.get("/blobs/<sha>/thumbnail")
+@download_required
+def blob_thumbnail(sha):
+    blob = db.session.get(BlobORM, sha)
+    if blob is None or not blob.thumbnail_path:
+        return {"code": -1, "msg": "缩略图不存在"}, 404
+    return send_upload(blob.thumbnail_path)
+
+
+@attachment_api.get("/blobs/<sha>/preview")
+@download_required
+def blob_preview(sha):
+    blob = db.session.get(BlobORM, sha)
+    if blob is None or not blob.preview_path:
+        return {"code": -1, "msg": "预览图不存在"}, 404
+    return send_upload(blob.preview_path)
@@ -1,66 +1,73 @@
 """
 Dashboard API - 数据看板接口
+
+每个接口只执行一条聚合查询，结果按相关表的版本号缓存在进程内：
+表被写入后缓存立即失效，其他 worker 的写入依靠 DASHBOARD_CACHE_TTL 兜底。
 """
-from flask import Blueprint
+from flask import Blueprint, current_app
 from flask_jwt_extended import jwt_required
 from sqlalchemy import func
 from datetime import datetime, timedelta
 
 from pear_admin.extensions import db
-from pear_admin.orms import OrderORM, PayORM, SupplierORM, PayerORM
+from pear_admin.orms import MonthlyOrderPayORM, OrderORM, PayORM, SupplierORM, PayerORM
+from pear_admin.utils.cache import TTLCache, table_version
+from pear_admin.utils import rollup  # noqa: F401  注册月度汇总的 flush 事件
 
 dashboard_api = Blueprint("dashboard", __name__, url_prefix="/dashboard")
 
+_dashboard_cache = TTLCache(maxsize=64)
+
+
+def _cached(name, tables, factory, *key):
+    """按接口名、相关表版本号及额外参数缓存统计结果"""
+    cache_key = (name, table_version(*tables), *key)
+    ttl = current_app.config.get("DASHBOARD_CACHE_TTL", 60)
+    return _dashboard_cache.get_or_set(cache_key, factory, ttl=ttl)
+
 
 @dashboard_api.get("/overview")
 @jwt_required()
 def get_overview():
     """获取财务概览数据"""
-    
-    # 订单总金额
-    total_order_amount = db.session.execute(
-        db.select(func.sum(OrderORM.order_amount))
-    ).scalar() or 0
-    
-    # 已付款总额
-    total_paid_amount = db.session.execute(
-        db.select(func.sum(PayORM.current_payment_amount))
-    ).scalar() or 0
-    
+    tables = (
+        OrderORM.__tablename__, PayORM.__tablename__,
+        SupplierORM.__tablename__, PayerORM.__tablename__,
+    )
+    return _cached("overview", tables, _overview)
+
+
+def _overview():
+    # 各项统计作为标量子查询放在同一条 SELECT 中，一次往返取回
+    row = db.session.execute(
+        db.select(
+            db.select(func.coalesce(func.sum(OrderORM.order_amount), 0))
+            .scalar_subquery().label("total_order_amount"),  # 订单总金额
+            db.select(func.count(OrderORM.id)).scalar_subquery().label("order_count"),  # 订单数量
+            db.select(func.coalesce(func.sum(PayORM.current_payment_amount), 0))
+            .scalar_subquery().label("total_paid_amount"),  # 已付款总额
+            db.select(func.count(PayORM.id)).scalar_subquery().label("pay_count"),  # 付款单数量
+            db.select(func.count(SupplierORM.id)).scalar_subquery().label("supplier_count"),  # 供应商数量
+            db.select(func.count(PayerORM.id)).scalar_subquery().label("payer_count"),  # 付款单位数量
+        )
+    ).one()
+
+    total_order_amount = float(row.total_order_amount or 0)
+    total_paid_amount = float(row.total_paid_amount or 0)
     # 待付款余额
-    pending_amount = float(total_order_amount) - float(total_paid_amount)
-    
-    # 订单数量
-    order_count = db.session.execute(
-        db.select(func.count(OrderORM.id))
-    ).scalar() or 0
-    
-    # 付款单数量
-    pay_count = db.session.execute(
-        db.select(func.count(PayORM.id))
-    ).scalar() or 0
-    
-    # 供应商数量
-    supplier_count = db.session.execute(
-        db.select(func.count(SupplierORM.id))
-    ).scalar() or 0
-    
-    # 付款单位数量
-    payer_count = db.session.execute(
-        db.select(func.count(PayerORM.id))
-    ).scalar() or 0
-    
+    pending_amount = total_order_amount - total_paid_amount
+
     return {
         "code": 0,
         "msg": "获取成功",
         "data": {
-            "total_order_amount": round(float(total_order_amount), 2),
-            "total_paid_amount": round(float(total_paid_amount), 2),
+            "total_order_amount": round(total_order_amount, 2),
+            "total_paid_amount": round(total_paid_amount, 2),
             "pending_amount": round(pending_amount, 2),
-            "order_count": order_count,
-            "pay_count": pay_count,
-            "supplier_count": supplier_count,
-            "payer_count": payer_count
+            "order_count": row.order_count or 0,
+            "pay_count": row.pay_count or 0,
+            "supplier_count": row.supplier_count or 0,
+            "payer_count": row.payer_count or 0
         }
     }
 
@@ -69,7 +76,10 @@ def get_overview():
 @jwt_required()
 def get_payment_status():
     """获取付款状态分布"""
-    
+    return _cached("payment-status", (PayORM.__tablename__,), _payment_status)
+
+
+def _payment_status():
     # 按付款状态分组统计
     result = db.session.execute(
         db.select(
@@ -103,62 +113,39 @@ def get_payment_status():
 @jwt_required()
 def get_monthly_trend():
     """获取月度趋势数据（最近12个月）"""
-    
+
     # 计算最近12个月的范围
     today = datetime.now()
-    start_date = datetime(today.year - 1, today.month, 1)
-    
-    # 判断数据库类型
-    bind = db.session.get_bind()
-    is_mysql = "mysql" in bind.dialect.name
-    
-    if is_mysql:
-        # MySQL: 使用 date_format
-        date_func = func.date_format(OrderORM.create_at, '%Y-%m')
-        pay_date_func = func.date_format(PayORM.create_at, '%Y-%m')
-    else:
-        # SQLite: 使用 strftime
-        date_func = func.strftime('%Y-%m', OrderORM.create_at)
-        pay_date_func = func.strftime('%Y-%m', PayORM.create_at)
-
-    # 订单月度趋势
-    order_trend = db.session.execute(
-        db.select(
-            date_func.label("month"),
-            func.count(OrderORM.id).label("count"),
-            func.sum(OrderORM.order_amount).label("amount")
-        ).where(OrderORM.create_at >= start_date)
-        .group_by(date_func)
-        .order_by(date_func)
-    ).all()
-    
-    # 付款月度趋势
-    pay_trend = db.session.execute(
-        db.select(
-            pay_date_func.label("month"),
-            func.count(PayORM.id).label("count"),
-            func.sum(PayORM.current_payment_amount).label("amount")
-        ).where(PayORM.create_at >= start_date)
-        .group_by(pay_date_func)
-        .order_by(pay_date_func)
+    start_month = f"{today.year - 1:04d}-{today.month:02d}"
+    tables = (OrderORM.__tablename__, PayORM.__tablename__)
+    return _cached("monthly-trend", tables, lambda: _monthly_trend(start_month), start_month)
+
+
+def _monthly_trend(start_month):
+    # 直接读取月度汇总表，见 pear_admin.utils.rollup
+    rows = db.session.scalars(
+        db.select(MonthlyOrderPayORM)
+        .where(MonthlyOrderPayORM.month >= start_month)
+        .order_by(MonthlyOrderPayORM.month)
     ).all()
-    
+
     order_data = []
-    for row in order_trend:
-        order_data.append({
-            "month": row.month,
-            "count": row.count or 0,
-            "amount": round(float(row.amount), 2) if row.amount else 0
-        })
-    
     pay_data = []
-    for row in pay_trend:
-        pay_data.append({
-            "month": row.month,
-            "count": row.count or 0,
-            "amount": round(float(row.amount), 2) if row.amount else 0
-        })
-    
+    for row in rows:
+        item = row.json()
+        if row.order_count:
+            order_data.append({
+                "month": row.month,
+                "count": item["order_count"],
+                "amount": item["order_amount"]
+            })
+        if row.pay_count:
+            pay_data.append({
+                "month": row.month,
+                "count": item["pay_count"],
+                "amount": item["pay_amount"]
+            })
+
     return {
         "code": 0,
         "msg": "获取成功",
@@ -173,7 +160,11 @@ def get_monthly_trend():
 @jwt_required()
 def get_top_suppliers():
     """获取TOP10供应商（按订单金额）"""
-    
+    tables = (SupplierORM.__tablename__, OrderORM.__tablename__)
+    return _cached("top-suppliers", tables, _top_suppliers)
+
+
+def _top_suppliers():
     result = db.session.execute(
         db.select(
             SupplierORM.id,
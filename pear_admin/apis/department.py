@@ -3,6 +3,7 @@ from flask_sqlalchemy.pagination import Pagination
 
 from pear_admin.extensions import db
 from pear_admin.orms import DepartmentORM
+from pear_admin.utils.tree import build_tree, mark_parents
 
 department_api = Blueprint("department", __name__, url_prefix="/department")
 
@@ -57,17 +58,7 @@ def del_department(rid):
 
 @department_api.get("/treetable")
 def get_list_as_treetable():
-    q = db.select(DepartmentORM)
-    q = q.where(DepartmentORM.pid == 0)
-    dept_orm_list = db.session.execute(q).scalars()
-    ret = []
-    for child in dept_orm_list:
-        child_data = child.json()
-        child_data["children"] = []
-        if child.children:
-            child_data["isParent"] = True
-        for son in child.children:
-            son_data = son.json()
-            child_data["children"].append(son_data)
-        ret.append(child_data)
+    # 一次查出全部部门，在内存中组装成树
+    dept_orm_list = db.session.execute(db.select(DepartmentORM)).scalars()
+    ret = mark_parents(build_tree([dept.json() for dept in dept_orm_list], root=0))
     return {"code": 0, "message": "请求权限数据成功", "data": ret}
@@ -1,18 +1,35 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from sqlalchemy import case
 from pear_admin.extensions import db
 from pear_admin.orms.nursery import NurseryPlantORM, NurseryTransactionORM
+from pear_admin.utils.cache import TTLCache, table_version
+from pear_admin.utils.counting import count_rows
+from pear_admin.utils.inventory import InventoryError, issue_stock, receive_stock
+from pear_admin.utils.loader import apply_loaders
+from pear_admin.utils.pagination import keyset_paginate
+from pear_admin.utils.sequence import next_order_no
+from pear_admin.utils.stock_ledger import stock_as_of
 import datetime
 import uuid
 
 nursery_api = Blueprint("nursery_api", __name__, url_prefix="/nursery")
 
+# 库存与流水的 json() 不访问任何关系，声明为空以便测试模式下拦截懒加载
+PLANT_LIST_LOADERS = ()
+TRANSACTION_LIST_LOADERS = ()
+
+_stats_cache = TTLCache(maxsize=16)
+
 @nursery_api.get("/inventory")
 def get_inventory():
     """获取苗圃库存列表"""
     page = request.args.get('page', 1, type=int)
     limit = request.args.get('limit', 10, type=int)
     
-    query = NurseryPlantORM.query.filter(NurseryPlantORM.quantity > 0)
+    query = apply_loaders(
+        NurseryPlantORM.query.filter(NurseryPlantORM.quantity > 0),
+        NurseryPlantORM, PLANT_LIST_LOADERS
+    )
     
     # 简单的搜索支持
     search_name = request.args.get('name')
@@ -30,17 +47,76 @@ def get_inventory():
         "data": [item.json() for item in pagination.items]
     })
 
+@nursery_api.get("/inventory/as-of")
+def get_inventory_as_of():
+    """按日期回溯库存：date 当日结束时各苗木的库存（最近快照 + 之后的流水增量）"""
+    try:
+        day = datetime.datetime.strptime(request.args.get('date', ''), "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"code": -1, "msg": "日期格式应为 YYYY-MM-DD"})
+    plant_id = request.args.get('plant_id', type=int)
+
+    stock, snapshot_date = stock_as_of(day, [plant_id] if plant_id else None)
+    if plant_id:
+        stock.setdefault(plant_id, 0)
+    plants = {
+        plant.id: plant
+        for plant in NurseryPlantORM.query.filter(NurseryPlantORM.id.in_(list(stock)))
+    } if stock else {}
+
+    data = []
+    for pid, quantity in sorted(stock.items()):
+        if not quantity and not plant_id:
+            continue
+        plant = plants.get(pid)
+        data.append({
+            "plant_id": pid,
+            "name": plant.name if plant else None,
+            "category": plant.category if plant else None,
+            "spec": plant.spec if plant else None,
+            "unit": plant.unit if plant else None,
+            "quantity": float(quantity),
+        })
+
+    return jsonify({
+        "code": 0,
+        "msg": "",
+        "date": day.strftime("%Y-%m-%d"),
+        "snapshot_date": snapshot_date.strftime("%Y-%m-%d") if snapshot_date else None,
+        "count": len(data),
+        "data": data
+    })
+
 @nursery_api.get("/transactions")
 def get_transactions():
     """获取入出库流水"""
     page = request.args.get('page', 1, type=int)
     limit = request.args.get('limit', 10, type=int)
     
-    query = NurseryTransactionORM.query
+    query = apply_loaders(
+        NurseryTransactionORM.query, NurseryTransactionORM, TRANSACTION_LIST_LOADERS
+    )
     
     type_filter = request.args.get('type')
     if type_filter:
         query = query.filter(NurseryTransactionORM.type == type_filter)
+    
+    # 游标分页模式：按 id 倒序定位，不再统计总数
+    # create_at 允许为空，空值行无法参与 create_at < :v 的比较，会被游标翻页漏掉，因此只用自增 id
+    if "cursor" in request.args:
+        try:
+            keyset = keyset_paginate(
+                query, [NurseryTransactionORM.id], request.args["cursor"], limit
+            )
+        except ValueError:
+            return jsonify({"code": -1, "msg": "分页游标无效"})
+        return jsonify({
+            "code": 0,
+            "msg": "",
+            "data": [item.json() for item in keyset.items],
+            "next_cursor": keyset.next_cursor,
+            "prev_cursor": keyset.prev_cursor,
+        })
         
     pagination = query.order_by(NurseryTransactionORM.create_at.desc()).paginate(
         page=page, per_page=limit, error_out=False
@@ -58,16 +134,16 @@ def inbound():
     """
     入库接口
     核心逻辑:
-    1. 查找是否存在同名、同规格、同单位的苗木
-    2. 如果存在，计算加权平均价: (旧量*旧价 + 新量*新价) / 总量
-    3. 更新库存 or 新增库存记录
+    1. 按 (名称, 规格, 单位) 唯一索引查找苗木
+    2. 如果存在，在一条 UPDATE 中累加数量并计算加权平均价: (旧量*旧价 + 新量*新价) / 总量
+    3. 否则新增库存记录（并发新增同一苗木时回到第 2 步）
     4. 记录流水
     """
     data = request.json
     name = data.get('name')
     category = data.get('category')
-    spec = data.get('spec', '')
-    unit = data.get('unit', '')
+    spec = data.get('spec') or ''
+    unit = data.get('unit') or ''
     quantity = float(data.get('quantity', 0))
     price = float(data.get('price', 0)) # 进价
     location = data.get('location', '')
@@ -78,44 +154,13 @@ def inbound():
         return jsonify({"success": False, "msg": "名称和数量必填且数量需大于0"})
 
     # 生成单号
-    order_no = "IN" + datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-    
-    # 查找库存
-    existing = NurseryPlantORM.query.filter_by(
-        name=name, spec=spec, unit=unit
-    ).first()
-    
-    plant_id = None
+    order_no = next_order_no("IN")
     
-    if existing:
-        old_qty = float(existing.quantity)
-        old_price = float(existing.price)
-        
-        new_total_qty = old_qty + quantity
-        new_total_value = (old_qty * old_price) + (quantity * price)
-        new_avg_price = new_total_value / new_total_qty if new_total_qty > 0 else 0
-        
-        existing.quantity = new_total_qty
-        existing.price = new_avg_price
-        existing.location = location or existing.location
-        existing.update_at = datetime.datetime.now()
-        plant_id = existing.id
-    else:
-        new_plant = NurseryPlantORM(
-            name=name,
-            category=category,
-            spec=spec,
-            unit=unit,
-            quantity=quantity,
-            price=price,
-            location=location,
-            remark=remark,
-            create_at=datetime.datetime.now(),
-            update_at=datetime.datetime.now()
-        )
-        db.session.add(new_plant)
-        db.session.flush() # 获取ID
-        plant_id = new_plant.id
+    # 累加库存并重算加权平均价（单条原子 UPDATE），不存在时新增库存记录
+    plant_id = receive_stock(
+        name, spec, unit, quantity, price,
+        category=category, location=location, remark=remark,
+    )
         
     # 记录流水
     tx = NurseryTransactionORM(
@@ -143,10 +188,10 @@ def outbound():
     """
     批量出库接口
     核心逻辑:
-    1. 遍历所有出库项目
-    2. 对于库存项目：检查库存是否充足，扣减库存
-    3. 对于非入库项目：直接记录流水
-    4. 记录流水
+    1. 一次查询锁定出库单涉及的全部库存项目
+    2. 整单校验库存是否充足，任一项目不足则整单失败并回滚
+    3. 一条 UPDATE 扣减全部库存
+    4. 批量写入流水（非入库项目直接记录流水）
     """
     data = request.json
     items = data.get('items', [])
@@ -158,110 +203,59 @@ def outbound():
         return jsonify({"success": False, "msg": "请添加出库项目"})
     
     # 生成单号
-    order_no = "OUT" + datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    order_no = next_order_no("OUT")
     
     try:
-        for item in items:
-            plant_id = item.get('plant_id')
-            quantity = float(item.get('quantity', 0))
-            price = float(item.get('price', 0))
-            is_non_inventory = item.get('is_non_inventory', False)
-            item_name = item.get('name', '')
-            
-            if quantity <= 0:
-                continue
-            
-            if is_non_inventory or not plant_id:
-                # 非入库项目 - 直接记录流水
-                tx = NurseryTransactionORM(
-                    order_no=order_no,
-                    type='out',
-                    plant_id=None,
-                    plant_name=item_name,
-                    spec=item.get('spec', '-'),
-                    unit=item.get('unit', '株'),
-                    quantity=quantity,
-                    price=price,
-                    total_price=quantity * price,
-                    operator=operator,
-                    destination=destination,
-                    location='非入库',
-                    remark=remark + ' [非入库]',
-                    create_at=datetime.datetime.now()
-                )
-                db.session.add(tx)
-            else:
-                # 库存项目
-                plant = NurseryPlantORM.query.get(plant_id)
-                if not plant:
-                    return jsonify({"success": False, "msg": f"库存项目 {item_name} 不存在"})
-                
-                if float(plant.quantity) < quantity:
-                    return jsonify({"success": False, "msg": f"{plant.name} 库存不足! 当前: {plant.quantity}"})
-                
-                # 扣减库存
-                plant.quantity = float(plant.quantity) - quantity
-                plant.update_at = datetime.datetime.now()
-                
-                # 记录流水
-                tx = NurseryTransactionORM(
-                    order_no=order_no,
-                    type='out',
-                    plant_id=plant.id,
-                    plant_name=plant.name,
-                    spec=plant.spec,
-                    unit=plant.unit,
-                    quantity=quantity,
-                    price=price,
-                    total_price=quantity * price,
-                    operator=operator,
-                    destination=destination,
-                    location=plant.location,
-                    remark=remark,
-                    create_at=datetime.datetime.now()
-                )
-                db.session.add(tx)
-        
+        issue_stock(order_no, items, destination=destination, operator=operator, remark=remark)
         db.session.commit()
         return jsonify({"success": True, "msg": "出库成功", "order_no": order_no})
+    except InventoryError as e:
+        db.session.rollback()
+        return jsonify({"success": False, "msg": str(e)})
     except Exception as e:
         db.session.rollback()
         return jsonify({"success": False, "msg": f"出库失败: {str(e)}"})
 
 @nursery_api.get("/dashboard/stats")
 def dashboard_stats():
-    """仪表盘统计数据"""
-    from sqlalchemy import func
-    
-    # 库存总品种数
-    total_varieties = NurseryPlantORM.query.filter(NurseryPlantORM.quantity > 0).count()
-    
-    # 本月出库次数
+    """仪表盘统计数据（按库存表、流水表的版本号缓存，入库/出库后立即失效）"""
     now = datetime.datetime.now()
     first_day = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    month_outbound = NurseryTransactionORM.query.filter(
+    key = (first_day, table_version(NurseryPlantORM.__tablename__, NurseryTransactionORM.__tablename__))
+    ttl = current_app.config.get("DASHBOARD_CACHE_TTL", 60)
+    return jsonify(_stats_cache.get_or_set(key, lambda: _dashboard_stats(first_day), ttl=ttl))
+
+
+def _dashboard_stats(first_day):
+    from sqlalchemy import func
+
+    in_stock = NurseryPlantORM.quantity > 0
+
+    # 库存总品种数、在库大类数量、低库存预警 (数量 < 50) 用一条条件聚合查询统计，
+    # 本月出库次数作为标量子查询一并取回
+    month_outbound = db.select(func.count(NurseryTransactionORM.id)).where(
         NurseryTransactionORM.type == 'out',
         NurseryTransactionORM.create_at >= first_day
-    ).count()
-    
-    # 在库大类数量
-    categories = db.session.query(NurseryPlantORM.category).filter(
-        NurseryPlantORM.quantity > 0, NurseryPlantORM.category.isnot(None)
-    ).distinct().all()
-    category_count = len([c for c in categories if c[0]])
-    
-    # 低库存预警 (数量 < 50)
-    low_stock = NurseryPlantORM.query.filter(
-        NurseryPlantORM.quantity > 0, NurseryPlantORM.quantity < 50
-    ).count()
+    ).scalar_subquery()
+    counts = db.session.execute(
+        db.select(
+            func.count(case((in_stock, NurseryPlantORM.id))).label('total_varieties'),
+            func.count(func.distinct(case(
+                (in_stock & (NurseryPlantORM.category != ''), NurseryPlantORM.category)
+            ))).label('category_count'),
+            func.count(case((in_stock & (NurseryPlantORM.quantity < 50), NurseryPlantORM.id))).label('low_stock'),
+            month_outbound.label('month_outbound'),
+        )
+    ).one()
     
     # 分类分布
-    category_distribution = db.session.query(
-        NurseryPlantORM.category, func.count(NurseryPlantORM.id)
-    ).filter(NurseryPlantORM.quantity > 0).group_by(NurseryPlantORM.category).all()
+    category_distribution = db.session.execute(
+        db.select(NurseryPlantORM.category, func.count(NurseryPlantORM.id))
+        .where(in_stock).group_by(NurseryPlantORM.category)
+    ).all()
     
     # TOP5 库存
-    top5 = NurseryPlantORM.query.filter(NurseryPlantORM.quantity > 0).order_by(
+    top5 = NurseryPlantORM.query.filter(in_stock).order_by(
         NurseryPlantORM.quantity.desc()
     ).limit(5).all()
     
@@ -270,20 +264,20 @@ def dashboard_stats():
         NurseryTransactionORM.create_at.desc()
     ).limit(10).all()
     
-    return jsonify({
+    return {
         "code": 0,
         "data": {
-            "total_varieties": total_varieties,
-            "month_outbound": month_outbound,
-            "category_count": category_count,
-            "low_stock": low_stock,
+            "total_varieties": counts.total_varieties,
+            "month_outbound": counts.month_outbound,
+            "category_count": counts.category_count,
+            "low_stock": counts.low_stock,
             "category_distribution": [
                 {"category": c[0] or "未分类", "count": c[1]} for c in category_distribution
             ],
             "top5": [{"name": p.name, "quantity": float(p.quantity)} for p in top5],
             "recent_activities": [t.json() for t in recent]
         }
-    })
+    }
 
 @nursery_api.delete("/order/<order_no>")
 def delete_order(order_no):
@@ -388,42 +382,94 @@ def update_order(order_no):
         db.session.rollback()
         return jsonify({"success": False, "msg": f"更新失败: {str(e)}"})
 
-@nursery_api.get("/orders")
-def get_orders():
-    """获取出库单列表 (按订单号分组)"""
+def _order_header_query(keyword=None):
+    """出库单表头：按单号分组汇总，最新的在前"""
     from sqlalchemy import func
-    
-    # 获取所有出库单号
-    order_nos = db.session.query(
+
+    q = db.select(
         NurseryTransactionORM.order_no,
         func.sum(NurseryTransactionORM.total_price).label('total'),
         func.max(NurseryTransactionORM.create_at).label('create_at'),
         func.max(NurseryTransactionORM.operator).label('operator'),
         func.max(NurseryTransactionORM.destination).label('destination'),
         func.count(NurseryTransactionORM.id).label('item_count')
-    ).filter(
+    ).where(
         NurseryTransactionORM.type == 'out',
         NurseryTransactionORM.order_no.isnot(None)
-    ).group_by(NurseryTransactionORM.order_no).order_by(
-        func.max(NurseryTransactionORM.create_at).desc()
-    ).all()
-    
-    orders = []
-    for row in order_nos:
-        # 获取该订单的所有项目
-        items = NurseryTransactionORM.query.filter_by(
-            order_no=row.order_no, type='out'
-        ).all()
-        
-        orders.append({
-            "order_no": row.order_no,
-            "total": float(row.total or 0),
-            "create_at": row.create_at.strftime("%Y-%m-%d %H:%M") if row.create_at else "",
-            "operator": row.operator or "",
-            "destination": row.destination or "",
-            "item_count": row.item_count,
-            "items": [item.json() for item in items]
-        })
-    
-    return jsonify({"code": 0, "data": orders})
+    )
+    if keyword:
+        q = q.where(
+            NurseryTransactionORM.order_no.like(f"%{keyword}%")
+            | NurseryTransactionORM.operator.like(f"%{keyword}%")
+            | NurseryTransactionORM.destination.like(f"%{keyword}%")
+        )
+    return q.group_by(NurseryTransactionORM.order_no).order_by(
+        func.max(NurseryTransactionORM.create_at).desc(),
+        NurseryTransactionORM.order_no.desc()
+    )
 
+
+def _orders_with_items(header_rows):
+    """一次 order_no IN (...) 查询取出这些出库单的全部项目，在内存中按单号分组"""
+    order_nos = [row.order_no for row in header_rows]
+    items_by_order = {order_no: [] for order_no in order_nos}
+    if order_nos:
+        items = db.session.scalars(
+            db.select(NurseryTransactionORM).where(
+                NurseryTransactionORM.order_no.in_(order_nos),
+                NurseryTransactionORM.type == 'out'
+            ).order_by(NurseryTransactionORM.id)
+        )
+        for item in items:
+            items_by_order[item.order_no].append(item.json())
+
+    return [{
+        "order_no": row.order_no,
+        "total": float(row.total or 0),
+        "create_at": row.create_at.strftime("%Y-%m-%d %H:%M") if row.create_at else "",
+        "operator": row.operator or "",
+        "destination": row.destination or "",
+        "item_count": row.item_count,
+        "items": items_by_order[row.order_no]
+    } for row in header_rows]
+
+
+def _stream_orders(q, chunk_size=200):
+    """逐批生成全部出库单的 JSON，响应体不在内存中整体拼接"""
+    import json
+
+    yield '{"code": 0, "data": ['
+    offset = 0
+    first = True
+    while True:
+        rows = db.session.execute(q.limit(chunk_size).offset(offset)).all()
+        if not rows:
+            break
+        for order in _orders_with_items(rows):
+            yield ("" if first else ",") + json.dumps(order, ensure_ascii=False)
+            first = False
+        offset += chunk_size
+    yield ']}'
+
+
+@nursery_api.get("/orders")
+def get_orders():
+    """
+    获取出库单列表 (按订单号分组)
+    page / limit 分页，keyword 按单号、经办人、去向筛选；
+    stream=1 时以流式 JSON 返回全部出库单，用于导出
+    """
+    page = request.args.get('page', 1, type=int)
+    limit = request.args.get('limit', 20, type=int)
+    keyword = request.args.get('keyword', '').strip()
+    q = _order_header_query(keyword)
+
+    if request.args.get('stream', 0, type=int):
+        return Response(stream_with_context(_stream_orders(q)), mimetype="application/json")
+
+    rows = db.session.execute(q.limit(limit).offset((page - 1) * limit)).all()
+    return jsonify({
+        "code": 0,
+        "count": count_rows(q),
+        "data": _orders_with_items(rows)
+    })
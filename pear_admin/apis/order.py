@@ -9,10 +9,20 @@ from sqlalchemy import cast, String, Date, Numeric
 
 from pear_admin.extensions import db
 from pear_admin.orms import OrderORM, SupplierORM, PayORM
-from sqlalchemy.orm import selectinload
+from pear_admin.utils import order_import
+from pear_admin.utils.counting import paginate
+from pear_admin.utils.filters import date_filter
+from pear_admin.utils.loader import apply_loaders
+from pear_admin.utils.pagination import keyset_paginate
+from pear_admin.utils.search import fuzzy
 
 order_api = Blueprint("order", __name__, url_prefix="/order")
 
+# OrderORM.json() 会访问的关系（付款单及其付款/收款单位）
+ORDER_LIST_LOADERS = ("supplier", "pays.payer", "pays.payee_supplier")
+# OrderORM.json(with_pays=False) 只需要供应商，余额读取冗余字段
+ORDER_BALANCE_LOADERS = ("supplier",)
+
 
 @order_api.get("/")
 @jwt_required()
@@ -35,6 +45,7 @@ def order_list():
     material_manager = request.args.get("material_manager", type=str)
     sub_project_manager = request.args.get("sub_project_manager", type=str)
     create_at = request.args.get("create_at", type=str)  # 创建时间筛选
+    with_pays = bool(request.args.get("with_pays", default=1, type=int))  # 是否返回付款单明细
     
     # 构建查询
     q = db.select(OrderORM).order_by(OrderORM.id.desc())
@@ -43,24 +54,24 @@ def order_list():
     if order_id:
         q = q.where(OrderORM.id == order_id)
     if order_number:
-        q = q.where(OrderORM.order_number.like(f"%{order_number}%"))
+        q = q.where(fuzzy(OrderORM.order_number, order_number))
     if material_name:
-        q = q.where(OrderORM.material_name.like(f"%{material_name}%"))
+        q = q.where(fuzzy(OrderORM.material_name, material_name))
     if project_name:
-        q = q.where(OrderORM.project_name.like(f"%{project_name}%"))
+        q = q.where(fuzzy(OrderORM.project_name, project_name))
     if supplier_id:
         q = q.where(OrderORM.supplier_id == supplier_id)
     if supplier_name:
         # 通过供应商名称关联查询（使用子查询避免重复 join）
         supplier_subquery = db.select(SupplierORM.id).where(
-            SupplierORM.name.like(f"%{supplier_name}%")
+            fuzzy(SupplierORM.name, supplier_name)
         )
         q = q.where(OrderORM.supplier_id.in_(supplier_subquery))
     if supplier_contact_person:
         # 直接查询订单表的供应商联系人字段
-        q = q.where(OrderORM.supplier_contact_person.like(f"%{supplier_contact_person}%"))
+        q = q.where(fuzzy(OrderORM.supplier_contact_person, supplier_contact_person))
     if contact_phone:
-        q = q.where(OrderORM.contact_phone.like(f"%{contact_phone}%"))
+        q = q.where(fuzzy(OrderORM.contact_phone, contact_phone))
     if cutting_time:
         # 日期筛选（精确匹配或范围查询）
         try:
@@ -78,29 +89,38 @@ def order_list():
         # 将金额转为字符串进行模糊搜索
         q = q.where(cast(OrderORM.order_amount, String).like(f"%{order_amount}%"))
     if material_manager:
-        q = q.where(OrderORM.material_manager.like(f"%{material_manager}%"))
+        q = q.where(fuzzy(OrderORM.material_manager, material_manager))
     if sub_project_manager:
-        q = q.where(OrderORM.sub_project_manager.like(f"%{sub_project_manager}%"))
+        q = q.where(fuzzy(OrderORM.sub_project_manager, sub_project_manager))
     if create_at:
-        # 创建时间筛选（精确匹配日期部分）
+        # 创建时间筛选（日期 / 日期范围 / 月份，转换为区间条件以使用索引）
+        create_at_clause = date_filter(OrderORM.create_at, create_at)
+        if create_at_clause is not None:
+            q = q.where(create_at_clause)
+    
+    # 预加载关联的供应商、付款单及其付款/收款单位，避免 N+1 查询
+    q = apply_loaders(q, OrderORM, ORDER_LIST_LOADERS if with_pays else ORDER_BALANCE_LOADERS)
+    
+    # 游标分页模式：传入 cursor 参数（首页传空字符串）时启用，按排序键定位，不再统计总数
+    if "cursor" in request.args:
         try:
-            create_date = datetime.strptime(create_at, "%Y-%m-%d").date()
-            q = q.where(db.func.date(OrderORM.create_at) == create_date)
+            keyset = keyset_paginate(q, [OrderORM.id], request.args["cursor"], per_page)
         except ValueError:
-            pass
-    
-    # 使用 selectinload 预加载关联的付款单数据及其供应商关系，避免 N+1 查询
-    q = q.options(
-        selectinload(OrderORM.pays).selectinload(PayORM.payer),
-        selectinload(OrderORM.pays).selectinload(PayORM.payee_supplier)
-    )
+            return {"code": -1, "msg": "分页游标无效"}
+        return {
+            "code": 0,
+            "msg": "获取订单数据成功",
+            "data": [item.json(with_pays=with_pays) for item in keyset.items],
+            "next_cursor": keyset.next_cursor,
+            "prev_cursor": keyset.prev_cursor,
+        }
     
-    pages: Pagination = db.paginate(q, page=page, per_page=per_page, error_out=False)
+    pages: Pagination = paginate(q, page, per_page)
     
     return {
         "code": 0,
         "msg": "获取订单数据成功",
-        "data": [item.json() for item in pages.items],
+        "data": [item.json(with_pays=with_pays) for item in pages.items],
         "count": pages.total,
     }
 
@@ -108,10 +128,9 @@ def order_list():
 @order_api.get("/<int:oid>")
 @jwt_required()
 def get_order(oid):
-    # 使用 selectinload 预加载关联的付款单数据
+    # 预加载关联的付款单数据
     order_obj = db.session.scalar(
-        db.select(OrderORM)
-        .options(selectinload(OrderORM.pays))
+        apply_loaders(db.select(OrderORM), OrderORM, ORDER_LIST_LOADERS)
         .where(OrderORM.id == oid)
     )
     if not order_obj:
@@ -213,6 +232,47 @@ def create_order():
         return {"code": -1, "msg": f"新增订单失败: {str(e)}"}
 
 
+@order_api.post("/import")
+@jwt_required()
+def import_orders():
+    """
+    从 CSV / XLSX 批量导入订单
+    表单字段: file 文件；on_error=abort（有错误时整体不导入，默认）/ skip（跳过错误行）；dry_run=1 只校验
+    """
+    file = request.files.get("file")
+    if file is None or not file.filename:
+        return {"code": -1, "msg": "没有文件被上传"}
+    skip_errors = request.form.get("on_error", "abort") == "skip"
+    dry_run = bool(request.form.get("dry_run", default=0, type=int))
+
+    try:
+        rows = order_import.read_rows(file.stream, file.filename)
+        result = order_import.import_orders(rows, skip_errors=skip_errors, dry_run=dry_run)
+    except order_import.ImportFormatError as e:
+        db.session.rollback()
+        return {"code": -1, "msg": str(e)}
+    except Exception as e:
+        db.session.rollback()
+        return {"code": -1, "msg": f"导入订单失败: {str(e)}"}
+
+    if dry_run or result["imported"] == 0:
+        db.session.rollback()
+    else:
+        db.session.commit()
+
+    if result["error_count"] and not skip_errors:
+        return {
+            "code": -1,
+            "msg": f"有 {result['error_count']} 行数据错误，未导入任何订单",
+            "data": result,
+        }
+    if dry_run:
+        msg = f"校验完成，共 {result['total']} 行，{result['error_count']} 行错误"
+    else:
+        msg = f"导入完成，成功 {result['imported']} 条，失败 {result['error_count']} 条"
+    return {"code": 0, "msg": msg, "data": result}
+
+
 @order_api.put("/<int:oid>")
 @order_api.put("/")
 @jwt_required()
@@ -1,6 +1,3 @@
-from collections import OrderedDict
-from copy import deepcopy
-
 from flask import Blueprint, jsonify, make_response, request
 from flask_jwt_extended import (
     create_access_token,
@@ -11,6 +8,8 @@ from flask_jwt_extended import (
 
 from pear_admin.extensions import db
 from pear_admin.orms import UserORM
+from pear_admin.utils.identity import CurrentUser
+from pear_admin.utils.menu import compile_menu
 
 passport_api = Blueprint("passport", __name__)
 
@@ -48,28 +47,10 @@ def logout():
 @passport_api.get("/menu")
 @jwt_required()
 def menus_api():
-    rights_orm_list = set()
-    current_user: UserORM = get_current_user()
-    for role in current_user.role_list:
-        for rights_orm in role.rights_list:
-            if rights_orm.type != "auth":
-                rights_orm_list.add(rights_orm)
-
-    rights_list = [rights_orm.menu_json() for rights_orm in rights_orm_list]
-    rights_list.sort(key=lambda x: (x["pid"], x["id"]), reverse=True)
-
-    menu_dict_list = OrderedDict()
-    for menu_dict in rights_list:
-        if menu_dict["id"] in menu_dict_list.keys():  # 如果当前节点已经存在与字典中
-            # 当前节点添加子节点
-            menu_dict["children"] = deepcopy(menu_dict_list[menu_dict["id"]])
-            menu_dict["children"].sort(key=lambda item: item["sort"])
-            # 删除子节点
-            del menu_dict_list[menu_dict["id"]]
-
-        if menu_dict["pid"] not in menu_dict_list:
-            menu_dict_list[menu_dict["pid"]] = [menu_dict]
-        else:
-            menu_dict_list[menu_dict["pid"]].append(menu_dict)
-
-    return sorted(menu_dict_list.get(0), key=lambda item: item["sort"])
+    current_user: CurrentUser = get_current_user()
+    # 按角色编译并缓存的菜单树，未变化时返回 304
+    menu = compile_menu(current_user.role_ids)
+    response = make_response(menu.body)
+    response.mimetype = "application/json"
+    response.set_etag(menu.etag)
+    return response.make_conditional(request)
@@ -7,9 +7,17 @@ from flask_sqlalchemy.pagination import Pagination
 
 from pear_admin.extensions import db
 from pear_admin.orms import PayORM, OrderORM, SupplierORM, PayerORM
+from pear_admin.utils.counting import paginate
+from pear_admin.utils.filters import date_filter
+from pear_admin.utils.loader import apply_loaders
+from pear_admin.utils.pagination import keyset_paginate
+from pear_admin.utils.search import fuzzy
 
 pay_api = Blueprint("pay", __name__, url_prefix="/pay")
 
+# PayORM.json() 会访问的关系
+PAY_LIST_LOADERS = ("order", "payer", "payee_supplier")
+
 
 @pay_api.get("/")
 @jwt_required()
@@ -37,38 +45,52 @@ def pay_list():
     if pay_id:
         q = q.where(PayORM.id == pay_id)
     if pay_number:
-        q = q.where(PayORM.pay_number.like(f"%{pay_number}%"))
+        q = q.where(fuzzy(PayORM.pay_number, pay_number))
     if order_id:
         q = q.where(PayORM.order_id == order_id)
     if order_number:
         # 通过订单编号筛选（需要关联订单表）
-        subquery = db.select(OrderORM.id).filter(OrderORM.order_number.like(f"%{order_number}%")).scalar_subquery()
+        subquery = db.select(OrderORM.id).filter(fuzzy(OrderORM.order_number, order_number)).scalar_subquery()
         q = q.where(PayORM.order_id.in_(subquery))
     if payer_supplier_id:
         q = q.where(PayORM.payer_supplier_id == payer_supplier_id)
     if payer_supplier_name:
         # 通过付款单位名称筛选 (使用 PayerORM)
-        subquery = db.select(PayerORM.id).filter(PayerORM.name.like(f"%{payer_supplier_name}%")).scalar_subquery()
+        subquery = db.select(PayerORM.id).filter(fuzzy(PayerORM.name, payer_supplier_name)).scalar_subquery()
         q = q.where(PayORM.payer_supplier_id.in_(subquery))
     if payee_supplier_id:
         q = q.where(PayORM.payee_supplier_id == payee_supplier_id)
     if payee_supplier_name:
         # 通过收款单位名称筛选
-        subquery = db.select(SupplierORM.id).filter(SupplierORM.name.like(f"%{payee_supplier_name}%")).scalar_subquery()
+        subquery = db.select(SupplierORM.id).filter(fuzzy(SupplierORM.name, payee_supplier_name)).scalar_subquery()
         q = q.where(PayORM.payee_supplier_id.in_(subquery))
     if payment_status:
-        q = q.where(PayORM.payment_status.like(f"%{payment_status}%"))
+        q = q.where(fuzzy(PayORM.payment_status, payment_status))
     if handler:
-        q = q.where(PayORM.handler.like(f"%{handler}%"))
+        q = q.where(fuzzy(PayORM.handler, handler))
     if create_at:
-        # 创建时间筛选（精确匹配日期部分）
+        # 创建时间筛选（日期 / 日期范围 / 月份，转换为区间条件以使用索引）
+        create_at_clause = date_filter(PayORM.create_at, create_at)
+        if create_at_clause is not None:
+            q = q.where(create_at_clause)
+    
+    q = apply_loaders(q, PayORM, PAY_LIST_LOADERS)
+    
+    # 游标分页模式：传入 cursor 参数（首页传空字符串）时启用，按排序键定位，不再统计总数
+    if "cursor" in request.args:
         try:
-            create_date = datetime.strptime(create_at, "%Y-%m-%d").date()
-            q = q.where(db.func.date(PayORM.create_at) == create_date)
+            keyset = keyset_paginate(q, [PayORM.id], request.args["cursor"], per_page)
         except ValueError:
-            pass
+            return {"code": -1, "msg": "分页游标无效"}
+        return {
+            "code": 0,
+            "msg": "获取付款单数据成功",
+            "data": [item.json() for item in keyset.items],
+            "next_cursor": keyset.next_cursor,
+            "prev_cursor": keyset.prev_cursor,
+        }
     
-    pages: Pagination = db.paginate(q, page=page, per_page=per_page, error_out=False)
+    pages: Pagination = paginate(q, page, per_page)
     
     return {
         "code": 0,
@@ -81,7 +103,9 @@ def pay_list():
 @pay_api.get("/<int:pid>")
 @jwt_required()
 def get_pay(pid):
-    pay_obj = db.session.get(PayORM, pid)
+    pay_obj = db.session.scalar(
+        apply_loaders(db.select(PayORM), PayORM, PAY_LIST_LOADERS).where(PayORM.id == pid)
+    )
     if not pay_obj:
         return {"code": -1, "msg": "付款单不存在"}
     
@@ -3,10 +3,10 @@ from datetime import datetime
 from flask import Blueprint, request
 from flask_jwt_extended import jwt_required
 from flask_sqlalchemy.pagination import Pagination
-from sqlalchemy import cast, String
 
 from pear_admin.extensions import db
 from pear_admin.orms import PayerORM
+from pear_admin.utils.search import fuzzy
 
 payer_api = Blueprint("payer", __name__, url_prefix="/payer")
 
@@ -31,14 +31,13 @@ def payer_list():
     if type_id:
         q = q.where(PayerORM.type_id == type_id)
     if name:
-        q = q.where(PayerORM.name.like(f"%{name}%"))
+        q = q.where(fuzzy(PayerORM.name, name))
     if bank_name:
-        q = q.where(PayerORM.bank_name.like(f"%{bank_name}%"))
+        q = q.where(fuzzy(PayerORM.bank_name, bank_name))
     if account_number:
-        # 将账号转为字符串进行搜索
-        q = q.where(cast(PayerORM.account_number, String).like(f"%{account_number}%"))
+        q = q.where(fuzzy(PayerORM.account_number, account_number))
     if remark:
-        q = q.where(PayerORM.remark.like(f"%{remark}%"))
+        q = q.where(fuzzy(PayerORM.remark, remark))
     
     pages: Pagination = db.paginate(q, page=page, per_page=per_page, error_out=False)
     
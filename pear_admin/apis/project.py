@@ -1,17 +1,21 @@
 from datetime import datetime
 
-import json
-
 from flask import Blueprint, request
 from flask_jwt_extended import jwt_required
 from flask_sqlalchemy.pagination import Pagination
 from sqlalchemy import cast, String
 
 from pear_admin.extensions import db
-from pear_admin.orms import AttachmentORM, ProjectORM
+from pear_admin.orms import ProjectORM
+from pear_admin.utils.attachment_sync import parse_attachments, sync_attachments
+from pear_admin.utils.counting import paginate
+from pear_admin.utils.loader import apply_loaders
 
 project_api = Blueprint("project", __name__, url_prefix="/project")
 
+# ProjectORM.json() 会访问的关系
+PROJECT_LIST_LOADERS = ("attachment_list.blob",)
+
 
 @project_api.get("/")
 @jwt_required()
@@ -41,7 +45,8 @@ def project_list():
     if project_amount:
         q = q.where(cast(ProjectORM.project_amount, String).like(f"%{project_amount}%"))
     
-    pages: Pagination = db.paginate(q, page=page, per_page=per_page, error_out=False)
+    q = apply_loaders(q, ProjectORM, PROJECT_LIST_LOADERS)
+    pages: Pagination = paginate(q, page, per_page)
     
     return {
         "code": 0,
@@ -101,39 +106,21 @@ def create_project():
         }
         project_data = {k: v for k, v in data.items() if k in allowed_fields}
     
-        # 创建项目
+        # 创建项目，与附件在同一个事务中提交
         project = ProjectORM(**project_data)
-        project.save()
+        db.session.add(project)
+        db.session.flush()
     
         # 处理附件数据
-        if attachments_data:
+        attachments_list = parse_attachments(attachments_data) if attachments_data else None
+        if attachments_list:
             try:
-                attachments_list = json.loads(attachments_data) if isinstance(attachments_data, str) else attachments_data
-                if isinstance(attachments_list, list):
-                    for att_data in attachments_list:
-                        if att_data.get("code"):
-                            attachment_id = att_data.get("id")
-                            if attachment_id:
-                                # 更新现有附件记录，关联到项目
-                                attachment = AttachmentORM.query.get(attachment_id)
-                                if attachment:
-                                    attachment.project_id = project.id
-                                    attachment.attachment_code = att_data.get("code", attachment.attachment_code)
-                                    attachment.save()
-                            elif att_data.get("filename") or att_data.get("url"):
-                                # 创建新的附件记录
-                                attachment = AttachmentORM(
-                                    project_id=project.id,
-                                    attachment_code=att_data.get("code", ""),
-                                    filename=att_data.get("filename", att_data.get("name", "")),
-                                    original_filename=att_data.get("name", att_data.get("filename", "")),
-                                    file_path=att_data.get("url", ""),
-                                    file_size=att_data.get("size", 0)
-                                )
-                                attachment.save()
+                with db.session.begin_nested():
+                    sync_attachments(project.id, attachments_list, adopt=True, prune=False)
             except Exception as e:
                 # 附件处理失败不影响项目创建
                 pass
+        db.session.commit()
     
         return {"code": 0, "msg": "新增项目成功", "data": {"id": project.id}}
     except Exception as e:
@@ -170,48 +157,16 @@ def change_project(pid=None):
             value = float(value)
         setattr(project_obj, key, value)
     
-    project_obj.save()
-    
-    # 处理附件数据
-    if attachments_data is not None:
+    # 处理附件数据，与项目修改在同一个事务中提交
+    attachments_list = parse_attachments(attachments_data) if attachments_data is not None else None
+    if attachments_list is not None:
         try:
-            attachments_list = json.loads(attachments_data) if isinstance(attachments_data, str) else attachments_data
-            if isinstance(attachments_list, list):
-                # 获取当前项目的所有附件ID
-                existing_attachment_ids = {att.id for att in project_obj.attachment_list}
-                new_attachment_ids = set()
-                
-                # 更新或创建附件记录
-                for att_data in attachments_list:
-                    attachment_id = att_data.get("id")
-                    if attachment_id:
-                        # 更新现有附件
-                        attachment = AttachmentORM.query.get(attachment_id)
-                        if attachment and attachment.project_id == pid:
-                            attachment.attachment_code = att_data.get("code", attachment.attachment_code)
-                            attachment.save()
-                            new_attachment_ids.add(attachment_id)
-                    elif att_data.get("code") and att_data.get("filename"):
-                        # 创建新附件记录
-                        attachment = AttachmentORM(
-                            project_id=pid,
-                            attachment_code=att_data.get("code", ""),
-                            filename=att_data.get("filename", att_data.get("name", "")),
-                            original_filename=att_data.get("name", att_data.get("filename", "")),
-                            file_path=att_data.get("url", ""),
-                            file_size=att_data.get("size", 0)
-                        )
-                        attachment.save()
-                        new_attachment_ids.add(attachment.id)
-                
-                # 删除不在新列表中的附件
-                to_delete_ids = existing_attachment_ids - new_attachment_ids
-                if to_delete_ids:
-                    AttachmentORM.query.filter(AttachmentORM.id.in_(to_delete_ids)).delete()
-                    db.session.commit()
+            with db.session.begin_nested():
+                sync_attachments(project_obj.id, attachments_list)
         except Exception as e:
             # 附件处理失败不影响项目更新
             pass
+    db.session.commit()
     
     return {"code": 0, "msg": "修改项目信息成功"}
 
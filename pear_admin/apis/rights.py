@@ -1,10 +1,9 @@
-from copy import deepcopy
-
 from flask import Blueprint, request
 from flask_jwt_extended import jwt_required
 
 from pear_admin.extensions import db
 from pear_admin.orms import RightsORM
+from pear_admin.utils.tree import build_tree, descendants_select, mark_parents
 
 rights_api = Blueprint("rights", __name__, url_prefix="/rights")
 
@@ -62,25 +61,10 @@ def get_list_as_tree():
     rights_list = [
         {"id": r.id, "pid": r.pid, "title": r.name, "sort": r.sort} for r in rights_all
     ]
-    # 2. 获取已有权限 id 集合
-    # 3. 列表转属性组件
-    rights_list.sort(key=lambda item: (item["pid"], item["id"]), reverse=True)
-    tree_dict = {}
-    for rights_dict in rights_list:  # 遍历子节点
-        # 2. 如果当前阶段已经存在于树状表格字典，则是父节点
-        if rights_dict["id"] in tree_dict.keys():
-            # 将之前的节点添加到父节点之下
-            rights_dict["children"] = deepcopy(tree_dict[rights_dict["id"]])
-            rights_dict["children"].sort(key=lambda item: item["sort"])
-            del tree_dict[rights_dict["id"]]
-
-        # 1. 如果父节点未出现在树状字典里面，就新增子节点列表，否则就追加
-        if rights_dict["pid"] not in tree_dict.keys():
-            tree_dict[rights_dict["pid"]] = [rights_dict]
-        else:
-            tree_dict[rights_dict["pid"]].append(rights_dict)
-
-    return {"code": 0, "data": tree_dict.get(0)}
+    # 2. 列表转树形组件，同一层按 sort 排序
+    tree = build_tree(rights_list, root=0, sort_key=lambda item: item["sort"] or 0)
+
+    return {"code": 0, "data": tree}
 
 
 @rights_api.get("/treetable")
@@ -94,29 +78,16 @@ def get_list_as_treetable():
     ).order_by(RightsORM.sort, RightsORM.id)
     pages = db.paginate(q, page=page, per_page=per_page, error_out=False)
 
-    ret = []
-
-    # 构建树状表格的数据
-    for rights_item in pages.items:
-        data = rights_item.json()
-        data["children"] = []
-        
-        # 加载子节点
-        for child in rights_item.children:
-            child_data = child.json()
-            child_data["children"] = []
-            
-            # 加载子节点的子节点
-            if child.children:
-                child_data["children"] = [
-                    sub_child.json() for sub_child in child.children
-                ]
-                child_data["isParent"] = True
-
-            data["children"].append(child_data)
-        
-        if data["children"]:
-            data["isParent"] = True
-        ret.append(data)
+    # 递归 CTE 一次查出当前页顶级菜单下的全部后代，在内存中组装（不限层级）
+    top_ids = [rights_item.id for rights_item in pages.items]
+    descendants = []
+    if top_ids:
+        descendants = db.session.scalars(
+            descendants_select(RightsORM, top_ids).order_by(RightsORM.sort, RightsORM.id)
+        ).all()
+
+    nodes = [rights_item.json() for rights_item in pages.items]
+    nodes += [rights_item.json() for rights_item in descendants]
+    ret = mark_parents(build_tree(nodes, root=None))
     
     return {"code": 0, "msg": "请求权限数据成功", "count": pages.total, "data": ret}
@@ -3,6 +3,7 @@ from flask_sqlalchemy.pagination import Pagination
 
 from pear_admin.extensions import db
 from pear_admin.orms import RightsORM, RoleORM
+from pear_admin.utils.identity import bump_permissions
 
 role_api = Blueprint("role", __name__, url_prefix="/role")
 
@@ -80,5 +81,6 @@ def change_role_rights(rid):
         db.select(RightsORM).where(RightsORM.id.in_(rights_list))
     ).all()
     role.rights_list = [r[0] for r in rights_obj_list]
+    bump_permissions()
     role.save()
     return {"code": 0, "msg": "授权成功"}
@@ -3,10 +3,11 @@ from datetime import datetime
 from flask import Blueprint, request
 from flask_jwt_extended import jwt_required
 from flask_sqlalchemy.pagination import Pagination
-from sqlalchemy import cast, String
 
 from pear_admin.extensions import db
 from pear_admin.orms import SupplierORM
+from pear_admin.utils.counting import paginate
+from pear_admin.utils.search import fuzzy
 
 supplier_api = Blueprint("supplier", __name__, url_prefix="/supplier")
 
@@ -35,24 +36,23 @@ def supplier_list():
     if type_id:
         q = q.where(SupplierORM.type_id == type_id)
     if name:
-        q = q.where(SupplierORM.name.like(f"%{name}%"))
+        q = q.where(fuzzy(SupplierORM.name, name))
     if contact_person:
-        q = q.where(SupplierORM.contact_person.like(f"%{contact_person}%"))
+        q = q.where(fuzzy(SupplierORM.contact_person, contact_person))
     if phone:
-        q = q.where(SupplierORM.phone.like(f"%{phone}%"))
+        q = q.where(fuzzy(SupplierORM.phone, phone))
     if email:
-        q = q.where(SupplierORM.email.like(f"%{email}%"))
+        q = q.where(fuzzy(SupplierORM.email, email))
     if bank_name:
-        q = q.where(SupplierORM.bank_name.like(f"%{bank_name}%"))
+        q = q.where(fuzzy(SupplierORM.bank_name, bank_name))
     if account_number:
-        # 将账号转为字符串进行搜索
-        q = q.where(cast(SupplierORM.account_number, String).like(f"%{account_number}%"))
+        q = q.where(fuzzy(SupplierORM.account_number, account_number))
     if address:
-        q = q.where(SupplierORM.address.like(f"%{address}%"))
+        q = q.where(fuzzy(SupplierORM.address, address))
     if remark:
-        q = q.where(SupplierORM.remark.like(f"%{remark}%"))
+        q = q.where(fuzzy(SupplierORM.remark, remark))
     
-    pages: Pagination = db.paginate(q, page=page, per_page=per_page, error_out=False)
+    pages: Pagination = paginate(q, page, per_page)
     
     return {
         "code": 0,
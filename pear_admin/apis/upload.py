@@ -1,13 +1,14 @@
-import os
+import json
+import uuid
 from datetime import datetime
 from pathlib import Path
 
 from flask import Blueprint, current_app, request
-from flask_jwt_extended import jwt_required
-from werkzeug.utils import secure_filename
+from flask_jwt_extended import get_jwt_identity, jwt_required
 
 from pear_admin.extensions import db
 from pear_admin.orms import AttachmentORM
+from pear_admin.utils import blob_store, previews
 
 upload_api = Blueprint("upload", __name__, url_prefix="/upload")
 
@@ -19,6 +20,47 @@ ALLOWED_EXTENSIONS = {
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def _upload_folder():
+    upload_folder = Path(current_app.config.get('UPLOAD_FOLDER', 'uploads'))
+    upload_folder.mkdir(parents=True, exist_ok=True)
+    return upload_folder
+
+
+def _finish_upload(blob, original_filename, project_id=None, attachment_code=None):
+    """文件内容已存入 blob：按需关联项目附件，提交事务，返回上传接口的 data"""
+    # 同一内容只存一份，文件名即内容哈希
+    filename = Path(blob.path).name
+    file_url = blob.url
+
+    # 如果提供了项目ID和附件编号，保存到数据库
+    attachment_id = None
+    if project_id and attachment_code:
+        attachment = AttachmentORM(
+            project_id=project_id,
+            attachment_code=attachment_code,
+            filename=filename,
+            original_filename=original_filename,
+            file_path=file_url,
+            file_size=blob.size,
+            blob_sha256=blob.sha256
+        )
+        db.session.add(attachment)
+        db.session.flush()
+        attachment_id = attachment.id
+    previews.enqueue(blob)
+    db.session.commit()
+    # 缩略图在后台生成，不占用上传请求
+    previews.schedule(blob)
+
+    return {
+        "id": attachment_id,
+        "filename": filename,
+        "original_filename": original_filename,
+        "url": file_url,
+        "size": blob.size
+    }
+
+
 @upload_api.post("/")
 @jwt_required()
 def upload_file():
@@ -37,50 +79,191 @@ def upload_file():
     attachment_code = request.form.get("attachment_code", type=str)
     
     try:
-        # 生成安全的文件名
-        filename = secure_filename(file.filename)
-        # 添加时间戳避免文件名冲突
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        name, ext = os.path.splitext(filename)
-        filename = f"{name}_{timestamp}{ext}"
-        
-        # 创建上传目录
-        upload_folder = Path(current_app.config.get('UPLOAD_FOLDER', 'uploads'))
-        upload_folder.mkdir(parents=True, exist_ok=True)
-        
-        # 保存文件
-        file_path = upload_folder / filename
-        file.save(str(file_path))
-        
-        # 文件相对路径（用于下载）
-        file_url = f"/uploads/{filename}"
-        
-        # 如果提供了项目ID和附件编号，保存到数据库
-        attachment_id = None
-        if project_id and attachment_code:
-            attachment = AttachmentORM(
-                project_id=project_id,
-                attachment_code=attachment_code,
-                filename=filename,
-                original_filename=file.filename,
-                file_path=file_url,
-                file_size=file_path.stat().st_size
-            )
-            attachment.save()
-            attachment_id = attachment.id
-        
+        # 保存文件，同时计算内容哈希
+        blob = blob_store.store_stream(file.stream, file.filename)
+
         # 返回文件信息
         return {
             "code": 0,
             "msg": "上传成功",
-            "data": {
-                "id": attachment_id,
-                "filename": filename,
-                "original_filename": file.filename,
-                "url": file_url,
-                "size": file_path.stat().st_size
-            }
+            "data": _finish_upload(blob, file.filename, project_id, attachment_code)
         }
     except Exception as e:
+        db.session.rollback()
         return {"code": -1, "msg": f"上传失败: {str(e)}"}
 
+
+# ---------------------------------------------------------------- 分片上传
+#
+# 大文件（图纸、压缩包）分片上传，可断点续传：
+# 1. POST   /upload/sessions                创建上传会话，返回 upload_id 与建议分片大小
+# 2. PUT    /upload/sessions/<id>?offset=N  请求体为原始分片数据，从 offset 处写入
+# 3. GET    /upload/sessions/<id>           查询已接收的字节数，中断后从这里继续
+# 4. POST   /upload/sessions/<id>/complete  全部接收后完成上传，返回值与 POST /upload/ 相同
+# 5. DELETE /upload/sessions/<id>           放弃上传
+#
+# 分片直接从请求流写入 UPLOAD_FOLDER/.partial/<id>.part，不经过表单解析和临时文件，
+# 进程内存占用与文件大小无关。会话状态保存在同目录的 <id>.json 中，多个 worker 共享。
+# 会话只属于创建它的用户，其他用户访问时按不存在处理；超过 UPLOAD_SESSION_EXPIRE
+# 没有新分片的会话由 `flask blob gc` 清理。
+
+_STREAM_BLOCK_SIZE = 1024 * 1024
+
+
+def _partial_folder():
+    folder = _upload_folder() / blob_store.PARTIAL_DIR
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder
+
+
+def _load_session(upload_id):
+    """返回 (会话信息, 分片文件路径)；会话不存在或不属于当前用户时返回 (None, None)"""
+    try:
+        uuid.UUID(hex=upload_id)
+    except ValueError:
+        return None, None
+    folder = _partial_folder()
+    meta_path = folder / f"{upload_id}.json"
+    if not meta_path.exists():
+        return None, None
+    with open(meta_path, encoding="utf-8") as f:
+        session = json.load(f)
+    if session.get("user_id") != get_jwt_identity():
+        return None, None
+    return session, folder / f"{upload_id}.part"
+
+
+def _received(part_path):
+    return part_path.stat().st_size if part_path.exists() else 0
+
+
+@upload_api.post("/sessions")
+@jwt_required()
+def create_upload_session():
+    data = request.get_json() or {}
+    filename = data.get("filename", "")
+    size = data.get("size")
+
+    if not filename:
+        return {"code": -1, "msg": "文件名为空"}
+    if not allowed_file(filename):
+        return {"code": -1, "msg": "不支持的文件类型"}
+    if not isinstance(size, int) or size < 0:
+        return {"code": -1, "msg": "文件大小无效"}
+
+    upload_id = uuid.uuid4().hex
+    folder = _partial_folder()
+    session = {
+        "filename": filename,
+        "size": size,
+        "project_id": data.get("project_id"),
+        "attachment_code": data.get("attachment_code"),
+        "user_id": get_jwt_identity(),
+        "create_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with open(folder / f"{upload_id}.json", "w", encoding="utf-8") as f:
+        json.dump(session, f, ensure_ascii=False)
+    (folder / f"{upload_id}.part").touch()
+
+    return {
+        "code": 0,
+        "msg": "创建上传会话成功",
+        "data": {
+            "upload_id": upload_id,
+            "offset": 0,
+            "size": size,
+            "chunk_size": current_app.config.get("UPLOAD_CHUNK_SIZE", 4 * 1024 * 1024),
+        }
+    }
+
+
+@upload_api.get("/sessions/<upload_id>")
+@jwt_required()
+def get_upload_session(upload_id):
+    session, part_path = _load_session(upload_id)
+    if session is None:
+        return {"code": -1, "msg": "上传会话不存在"}, 404
+    return {
+        "code": 0,
+        "msg": "获取上传进度成功",
+        "data": {"upload_id": upload_id, "offset": _received(part_path), "size": session["size"]}
+    }
+
+
+@upload_api.put("/sessions/<upload_id>")
+@jwt_required()
+def upload_chunk(upload_id):
+    session, part_path = _load_session(upload_id)
+    if session is None:
+        return {"code": -1, "msg": "上传会话不存在"}, 404
+
+    offset = request.args.get("offset", type=int)
+    received = _received(part_path)
+    # 只允许从已接收位置或之前（重传失败的分片）继续写入
+    if offset is None or offset < 0 or offset > received:
+        return {"code": -1, "msg": "分片偏移量无效", "data": {"offset": received}}, 409
+
+    length = request.content_length
+    max_chunk = current_app.config.get("UPLOAD_CHUNK_SIZE", 4 * 1024 * 1024)
+    if length is None or length > max_chunk:
+        return {"code": -1, "msg": f"分片大小必须指定且不超过 {max_chunk} 字节"}, 413
+    if offset + length > session["size"]:
+        return {"code": -1, "msg": "分片超出文件大小"}, 416
+
+    written = 0
+    with open(part_path, "r+b") as f:
+        f.seek(offset)
+        f.truncate()
+        while True:
+            block = request.stream.read(min(_STREAM_BLOCK_SIZE, length - written))
+            if not block:
+                break
+            f.write(block)
+            written += len(block)
+            if written >= length:
+                break
+
+    return {
+        "code": 0,
+        "msg": "分片上传成功",
+        "data": {"upload_id": upload_id, "offset": offset + written, "size": session["size"]}
+    }
+
+
+@upload_api.post("/sessions/<upload_id>/complete")
+@jwt_required()
+def complete_upload_session(upload_id):
+    session, part_path = _load_session(upload_id)
+    if session is None:
+        return {"code": -1, "msg": "上传会话不存在"}, 404
+
+    received = _received(part_path)
+    if received != session["size"]:
+        return {"code": -1, "msg": "文件尚未上传完整", "data": {"offset": received}}, 409
+
+    try:
+        # 分片可能被重传覆盖，哈希在全部接收后对拼好的文件计算一次
+        blob = blob_store.store_file(part_path, session["filename"])
+        (part_path.parent / f"{upload_id}.json").unlink(missing_ok=True)
+
+        return {
+            "code": 0,
+            "msg": "上传成功",
+            "data": _finish_upload(
+                blob, session["filename"], session.get("project_id"), session.get("attachment_code")
+            )
+        }
+    except Exception as e:
+        db.session.rollback()
+        return {"code": -1, "msg": f"上传失败: {str(e)}"}
+
+
+@upload_api.delete("/sessions/<upload_id>")
+@jwt_required()
+def abort_upload_session(upload_id):
+    session, part_path = _load_session(upload_id)
+    if session is None:
+        return {"code": -1, "msg": "上传会话不存在"}, 404
+    part_path.unlink(missing_ok=True)
+    (part_path.parent / f"{upload_id}.json").unlink(missing_ok=True)
+    return {"code": 0, "msg": "已取消上传"}
@@ -6,6 +6,7 @@ from flask_sqlalchemy.pagination import Pagination
 
 from pear_admin.extensions import db
 from pear_admin.orms import RoleORM, UserORM
+from pear_admin.utils.identity import bump_permissions
 
 user_api = Blueprint("user", __name__, url_prefix="/user")
 
@@ -90,6 +91,7 @@ def change_user_role(rid):
         db.select(RoleORM).where(RoleORM.id.in_(role_list))
     ).all()
     user.role_list = [r[0] for r in role_obj_list]
+    bump_permissions()
     user.save()
     return {"code": 0, "msg": "授权成功"}
 
@@ -120,12 +122,15 @@ def change_password():
     if len(new_password) < 6:
         return {"code": -1, "msg": "新密码长度不能少于6位"}, 400
     
+    # current_user 是缓存的只读快照，修改密码需要加载用户记录
+    user: UserORM = current_user.orm()
+
     # 验证原密码
-    if not current_user.check_password(old_password):
+    if not user.check_password(old_password):
         return {"code": -1, "msg": "原密码错误"}, 400
     
     # 设置新密码
-    current_user.password = new_password
-    current_user.save()
+    user.password = new_password
+    user.save()
     
     return {"code": 0, "msg": "密码修改成功"}
@@ -3,11 +3,15 @@ from flask import Flask
 from .init_db import db, migrate
 from .init_jwt import jwt
 from .init_script import register_script
+from pear_admin.utils.cache import register_cache
+from pear_admin.utils.unit_of_work import register_unit_of_work
 
 
 def register_extensions(app: Flask):
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
+    register_cache(app)
+    register_unit_of_work(app)
 
     register_script(app)
@@ -1,7 +1,5 @@
 from flask_jwt_extended import JWTManager
 
-from pear_admin.orms.user import UserORM
-
 jwt = JWTManager()
 
 
@@ -12,15 +10,34 @@ def user_identity_lookup(user):
 
 @jwt.user_lookup_loader
 def user_lookup_callback(_jwt_header, jwt_data):
+    # 返回缓存的 CurrentUser 快照，见 pear_admin.utils.identity
+    from pear_admin.utils.identity import load_identity
+
     identity = jwt_data["sub"]
-    return UserORM.query.filter(UserORM.id == identity).one_or_none()
+    return load_identity(int(identity))
 
 
 @jwt.expired_token_loader
-def expired_token_callback():
+def expired_token_callback(_jwt_header, _jwt_data):
     return {"msg": "token 已过期，请重新登录", "code": -1}, 403
 
 
 @jwt.unauthorized_loader
 def missing_token_callback(error):
     return {"msg": "操作未授权，请重新登录", "code": -1}, 403
+
+
+@jwt.token_verification_loader
+def download_token_scope(_jwt_header, jwt_data):
+    # 下载 token 只能访问签发时绑定的地址，见 pear_admin.utils.downloads
+    from flask import request
+
+    from pear_admin.utils.downloads import DOWNLOAD_CLAIM
+
+    scope = jwt_data.get(DOWNLOAD_CLAIM)
+    return scope is None or scope == request.path
+
+
+@jwt.token_verification_failed_loader
+def token_verification_failed_callback(_jwt_header, _jwt_data):
+    return {"msg": "下载链接无效，请重新下载", "code": -1}, 403
@@ -1,10 +1,12 @@
 import csv
 import os
 
+import click
 from flask import Flask, current_app
 
 from pear_admin.extensions import db
 from pear_admin.orms import DepartmentORM, RightsORM, RoleORM, UserORM
+from pear_admin.utils.unit_of_work import unit_of_work
 
 
 def dict_to_orm(d, o):
@@ -15,14 +17,13 @@ def dict_to_orm(d, o):
             setattr(o, k, v or None)
 
 
+@unit_of_work()
 def csv_to_databases(path, orm):
     with open(path, encoding="utf-8") as file:
         for d in csv.DictReader(file):
             o = orm()
             dict_to_orm(d, o)
-            db.session.add(o)
-            db.session.flush()
-        db.session.commit()
+            o.save()
 
 
 def register_script(app: Flask):
@@ -84,3 +85,153 @@ def register_script(app: Flask):
         # 旧的 CSV 导入逻辑已弃用，改用上面的 SQL 导入
         # ...
 
+        # 3. 重建全文索引（SQL 导入绕过了 ORM 事件，SQLite 影子表需要重新生成）
+        from pear_admin.utils.search import rebuild_indexes
+
+        rebuild_indexes()
+
+        # 4. 重建月度汇总
+        from pear_admin.utils.rollup import rebuild_rollup
+
+        rebuild_rollup()
+
+        # 5. 重算订单已付款金额、付款单数量和余额（付款单同样由 SQL 导入，未触发 PayORM 事件）
+        from pear_admin.orms.pay import refresh_order_totals
+
+        refresh_order_totals(db.session.connection())
+        db.session.commit()
+
+    @app.cli.group()
+    def search():
+        """全文索引维护"""
+
+    @search.command("rebuild")
+    def search_rebuild():
+        """创建或重建订单、付款单、供应商、付款单位的全文索引"""
+        from pear_admin.utils.search import rebuild_indexes
+
+        tables = rebuild_indexes()
+        if tables:
+            print(f"Rebuilt search index for: {', '.join(tables)}")
+        else:
+            print("Current database does not support full-text search index, LIKE will be used.")
+
+    @app.cli.group()
+    def order():
+        """订单数据维护"""
+
+    @order.command("rebuild-totals")
+    def order_rebuild_totals():
+        """按付款单重新计算全部订单的已付款金额、付款单数量和余额"""
+        from pear_admin.orms.pay import refresh_order_totals
+
+        refresh_order_totals(db.session.connection())
+        db.session.commit()
+        print("Order paid totals, pay counts and balances rebuilt.")
+
+    @app.cli.group()
+    def rollup():
+        """汇总表维护"""
+
+    @rollup.command("rebuild")
+    def rollup_rebuild():
+        """按订单表和付款表重建月度汇总 agg_monthly_order_pay"""
+        from pear_admin.utils.rollup import rebuild_rollup
+
+        months = rebuild_rollup()
+        print(f"Rebuilt monthly rollup for {months} month(s).")
+
+    @app.cli.group()
+    def blob():
+        """附件去重存储维护"""
+
+    @blob.command("recount")
+    def blob_recount():
+        """按附件表重新统计每份文件内容的引用数"""
+        from pear_admin.orms.attachment import refresh_blob_refs
+
+        refresh_blob_refs(db.session.connection())
+        db.session.commit()
+        print("Blob reference counts rebuilt.")
+
+    @blob.command("gc")
+    @click.option("--grace-hours", default=24, show_default=True, help="未被引用的内容保留多久后删除")
+    def blob_gc(grace_hours):
+        """删除不再被任何附件引用的文件内容，以及过期的分片上传会话"""
+        from datetime import timedelta
+
+        from pear_admin.utils.blob_store import collect_garbage, expire_partial_uploads
+
+        rows, files = collect_garbage(timedelta(hours=grace_hours))
+        print(f"Removed {rows} unreferenced blob(s), {files} file(s) deleted.")
+        partial = expire_partial_uploads(app.config.get("UPLOAD_SESSION_EXPIRE", timedelta(days=2)))
+        print(f"Removed {partial} expired partial upload file(s).")
+
+    @app.cli.group()
+    def preview():
+        """附件缩略图生成"""
+
+    @preview.command("worker")
+    @click.option("--once", is_flag=True, help="处理完当前待生成的内容后退出")
+    @click.option("--interval", default=5, show_default=True, help="没有任务时的轮询间隔（秒）")
+    def preview_worker(once, interval):
+        """轮询并生成待处理的附件缩略图和预览图（PREVIEW_MODE=worker 时使用）"""
+        import time
+
+        from pear_admin.utils.previews import pending_shas, process
+
+        while True:
+            shas = pending_shas()
+            done = sum(1 for sha in shas if process(sha))
+            if done:
+                print(f"Generated previews for {done} blob(s).")
+            if once and not done:
+                break
+            if not done:
+                db.session.remove()
+                time.sleep(interval)
+
+    @preview.command("requeue")
+    @click.option("--failed-only", is_flag=True, help="只重试生成失败的内容")
+    def preview_requeue(failed_only):
+        """把生成失败或中断的内容重新放回队列"""
+        from pear_admin.utils.previews import requeue
+
+        print(f"Requeued {requeue(failed_only)} blob(s).")
+
+    @app.cli.group()
+    def nursery():
+        """苗圃库存快照维护"""
+
+    @nursery.command("rebuild-snapshots")
+    @click.option("--period", type=click.Choice(["month", "day"]), default="month", help="快照周期")
+    def nursery_rebuild_snapshots(period):
+        """删除全部库存快照，按流水重放重新生成（截止到昨天）"""
+        from pear_admin.utils.stock_ledger import rebuild_snapshots
+
+        dates, rows = rebuild_snapshots(period)
+        print(f"Rebuilt {rows} snapshot row(s) for {dates} {period}(s).")
+
+    @nursery.command("take-snapshot")
+    @click.option("--date", "day", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="快照日期，默认昨天，必须早于今天")
+    def nursery_take_snapshot(day):
+        """生成指定日期结束时的库存快照，适合每日定时执行"""
+        from pear_admin.utils.stock_ledger import take_snapshot
+
+        try:
+            rows = take_snapshot(day.date() if day else None)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--date")
+        print(f"Wrote {rows} snapshot row(s).")
+
+    @nursery.command("verify-snapshots")
+    def nursery_verify_snapshots():
+        """核对快照及当前库存与流水重放结果是否一致"""
+        from pear_admin.utils.stock_ledger import verify_snapshots
+
+        problems = verify_snapshots()
+        for source, plant_id, recorded, expected in problems:
+            print(f"{source}: plant {plant_id} recorded {recorded}, ledger {expected}")
+        if problems:
+            raise SystemExit(f"{len(problems)} mismatch(es) found.")
+        print("Snapshots and current stock match the ledger.")
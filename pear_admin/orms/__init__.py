@@ -1,6 +1,7 @@
 from pear_admin.extensions import db
 
 from .attachment import AttachmentORM
+from .blob import BlobORM
 from .department import DepartmentORM
 from .order import OrderORM
 from .pay import PayORM
@@ -26,6 +27,8 @@ role_rights = db.Table(
 )
 
 from .payer import PayerORM
-from .nursery import NurseryPlantORM, NurseryTransactionORM
+from .nursery import NurseryPlantORM, NurseryStockSnapshotORM, NurseryTransactionORM
+from .rollup import MonthlyOrderPayORM
+from .sequence import SequenceORM
 
-__all__ = ["DepartmentORM", "RightsORM", "RoleORM", "UserORM", "SupplierORM", "ProjectORM", "AttachmentORM", "OrderORM", "PayORM", "PayerORM", "DictionaryORM", "DictionaryDetailORM", "NurseryPlantORM", "NurseryTransactionORM"]
+__all__ = ["DepartmentORM", "RightsORM", "RoleORM", "UserORM", "SupplierORM", "ProjectORM", "AttachmentORM", "BlobORM", "OrderORM", "PayORM", "PayerORM", "DictionaryORM", "DictionaryDetailORM", "NurseryPlantORM", "NurseryTransactionORM", "NurseryStockSnapshotORM", "MonthlyOrderPayORM", "SequenceORM"]
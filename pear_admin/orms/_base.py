@@ -1,4 +1,5 @@
 from pear_admin.extensions import db
+from pear_admin.utils.unit_of_work import in_unit_of_work
 
 
 class BaseORM(db.Model):
@@ -6,8 +7,11 @@ class BaseORM(db.Model):
 
     def save(self):
         db.session.add(self)
-        db.session.commit()
+        # 工作单元中只加入会话，由工作单元统一提交，见 utils.unit_of_work
+        if not in_unit_of_work():
+            db.session.commit()
 
     def delete(self):
         db.session.delete(self)
-        db.session.commit()
+        if not in_unit_of_work():
+            db.session.commit()
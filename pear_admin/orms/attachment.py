@@ -1,8 +1,13 @@
 from datetime import datetime
 
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
 from pear_admin.extensions import db
+from pear_admin.utils.cache import mark_written
 
 from ._base import BaseORM
+from .blob import BlobORM
 
 
 class AttachmentORM(BaseORM):
@@ -20,6 +25,13 @@ class AttachmentORM(BaseORM):
     original_filename = db.Column(db.String(255), nullable=False, comment="原始文件名")
     file_path = db.Column(db.String(512), nullable=False, comment="文件路径")
     file_size = db.Column(db.BigInteger, nullable=False, comment="文件大小（字节）")
+    blob_sha256 = db.Column(
+        db.String(64),
+        db.ForeignKey("sys_blob.sha256"),
+        nullable=True,
+        index=True,
+        comment="引用的文件内容，旧附件为空"
+    )
     create_at = db.Column(
         db.DateTime,
         nullable=False,
@@ -29,6 +41,7 @@ class AttachmentORM(BaseORM):
 
     # 关系属性
     project = db.relationship("ProjectORM", backref="attachment_list")
+    blob = db.relationship("BlobORM")
 
     def json(self):
         # 处理datetime字段 - 可能是datetime对象或bytes类型
@@ -49,7 +62,80 @@ class AttachmentORM(BaseORM):
             "name": self.original_filename,
             "filename": self.filename,
             "url": self.file_path,
+            "download_url": f"/api/v1/attachment/{self.id}/download",
+            # 缩略图和预览图由后台生成，旧附件没有
+            **(self.blob.preview_json() if self.blob_sha256 else {
+                "preview_status": None, "thumbnail_url": None, "preview_url": None,
+            }),
             "size": self.file_size,
             "create_at": format_datetime(self.create_at),
         }
 
+
+def refresh_blob_refs(connection, shas=None):
+    """
+    按附件表重新统计文件内容的引用数
+    shas 为 None 时重算全部
+    """
+    blobs = BlobORM.__table__
+    attachments = AttachmentORM.__table__
+    ref_count = (
+        db.select(db.func.count(attachments.c.id))
+        .where(attachments.c.blob_sha256 == blobs.c.sha256)
+        .scalar_subquery()
+    )
+    stmt = db.update(blobs).values(ref_count=ref_count)
+    if shas is not None:
+        shas = {sha for sha in shas if sha}
+        if not shas:
+            return
+        stmt = stmt.where(blobs.c.sha256.in_(shas)).values(update_at=datetime.now())
+    connection.execute(stmt)
+
+
+def _touched_shas(target):
+    history = db.inspect(target).attrs.blob_sha256.history
+    return set(history.deleted or ()) | {target.blob_sha256}
+
+
+def _touch_blobs(target, shas):
+    # 先记在会话上，整个 flush 结束后用一条 UPDATE 统一重算，批量增删附件时不逐行重算
+    session = db.object_session(target)
+    if session is not None:
+        session.info.setdefault("touched_blobs", set()).update(sha for sha in shas if sha)
+
+
+@db.event.listens_for(AttachmentORM, "before_insert")
+def _before_attachment_insert(mapper, connection, target):
+    # 先上传、后随项目表单提交的附件只带 url，从 url 中取出内容哈希
+    if target.blob_sha256 is None:
+        from pear_admin.utils.blob_store import sha_from_url
+
+        target.blob_sha256 = sha_from_url(target.file_path)
+
+
+@db.event.listens_for(AttachmentORM, "after_insert")
+def _after_attachment_insert(mapper, connection, target):
+    _touch_blobs(target, {target.blob_sha256})
+
+
+@db.event.listens_for(AttachmentORM, "after_update")
+def _after_attachment_update(mapper, connection, target):
+    if db.inspect(target).attrs.blob_sha256.history.has_changes():
+        _touch_blobs(target, _touched_shas(target))
+
+
+@db.event.listens_for(AttachmentORM, "after_delete")
+def _after_attachment_delete(mapper, connection, target):
+    _touch_blobs(target, _touched_shas(target))
+
+
+def _after_flush(session, flush_context):
+    shas = session.info.pop("touched_blobs", None)
+    if shas:
+        refresh_blob_refs(session.connection(), shas)
+        mark_written(session, BlobORM.__tablename__)
+
+
+if not event.contains(Session, "after_flush", _after_flush):
+    event.listen(Session, "after_flush", _after_flush)
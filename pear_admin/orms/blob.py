@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from pear_admin.extensions import db
+
+from ._base import BaseORM
+
+
+class BlobORM(BaseORM):
+    """按 SHA-256 去重存储的文件内容，见 utils.blob_store"""
+
+    __tablename__ = "sys_blob"
+
+    sha256 = db.Column(db.String(64), primary_key=True, comment="文件内容的 SHA-256")
+    size = db.Column(db.BigInteger, nullable=False, comment="文件大小（字节）")
+    path = db.Column(db.String(512), nullable=False, comment="相对 UPLOAD_FOLDER 的存储路径")
+    ref_count = db.Column(db.Integer, nullable=False, default=0, server_default="0", comment="引用该文件的附件数")
+    create_at = db.Column(db.DateTime, nullable=False, default=datetime.now, comment="创建时间")
+    preview_status = db.Column(
+        db.String(16), nullable=True, index=True,
+        comment="缩略图生成状态：pending / processing / done / failed，不支持预览的文件为空"
+    )
+    thumbnail_path = db.Column(db.String(512), nullable=True, comment="缩略图存储路径")
+    preview_path = db.Column(db.String(512), nullable=True, comment="预览图（PDF 为首页）存储路径")
+    update_at = db.Column(
+        db.DateTime, nullable=False, default=datetime.now, index=True,
+        comment="最近一次被上传或引用数变化的时间，垃圾回收的宽限期从这里算起"
+    )
+
+    @property
+    def url(self):
+        return f"/uploads/{self.path}"
+
+    def preview_json(self):
+        # 请求头带 token 时可以直接访问；<img> 使用的带下载 token 的地址由 POST /attachment/thumbnails 签发
+        base = f"/api/v1/attachment/blobs/{self.sha256}"
+        return {
+            "preview_status": self.preview_status,
+            "thumbnail_url": f"{base}/thumbnail" if self.thumbnail_path else None,
+            "preview_url": f"{base}/preview" if self.preview_path else None,
+        }
@@ -8,12 +8,19 @@ class NurseryPlantORM(BaseORM):
     存储当前苗木的实时库存和成本
     """
     __tablename__ = "nursery_plant"
+    __table_args__ = (
+        # 入库按 (名称, 规格, 单位) 定位苗木，同时防止并发入库重复建档
+        db.UniqueConstraint("name", "spec", "unit", name="uq_nursery_plant_name_spec_unit"),
+        # 仪表盘统计：在库 (quantity > 0)、低库存、按分类分布
+        db.Index("ix_nursery_plant_quantity", "quantity"),
+        db.Index("ix_nursery_plant_category_quantity", "category", "quantity"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, comment="苗木名称")
     category = db.Column(db.String(50), comment="分类(苗木/蔬菜/养殖等)")
-    spec = db.Column(db.String(100), comment="规格")
-    unit = db.Column(db.String(20), comment="单位")
+    spec = db.Column(db.String(100), nullable=False, default="", server_default="", comment="规格")
+    unit = db.Column(db.String(20), nullable=False, default="", server_default="", comment="单位")
     quantity = db.Column(db.Numeric(10, 2), default=0, comment="当前库存数量")
     price = db.Column(db.Numeric(10, 2), default=0, comment="加权平均成本价")
     location = db.Column(db.String(100), comment="存放位置")
@@ -44,6 +51,10 @@ class NurseryTransactionORM(BaseORM):
     记录所有的入库、出库操作
     """
     __tablename__ = "nursery_transaction"
+    __table_args__ = (
+        # 仪表盘统计本月出库次数
+        db.Index("ix_nursery_transaction_type_create_at", "type", "create_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     order_no = db.Column(db.String(50), nullable=False, index=True, comment="单号")
@@ -85,3 +96,28 @@ class NurseryTransactionORM(BaseORM):
             "create_at": self.create_at.strftime("%Y-%m-%d %H:%M:%S") if self.create_at else "",
             "remark": self.remark
         }
+
+
+class NurseryStockSnapshotORM(BaseORM):
+    """
+    苗圃-库存快照表
+    记录每个苗木在快照日结束时的库存数量，用于按日期回溯库存，见 utils.stock_ledger
+    """
+    __tablename__ = "nursery_stock_snapshot"
+    __table_args__ = (
+        db.UniqueConstraint("snapshot_date", "plant_id", name="uq_nursery_stock_snapshot_date_plant"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    snapshot_date = db.Column(db.Date, nullable=False, comment="快照日期（当日结束时的库存）")
+    plant_id = db.Column(db.Integer, nullable=False, index=True, comment="关联库存ID")
+    quantity = db.Column(db.Numeric(12, 2), nullable=False, default=0, comment="库存数量")
+    create_at = db.Column(db.DateTime, default=datetime.datetime.now, comment="生成时间")
+
+    def json(self):
+        return {
+            "id": self.id,
+            "snapshot_date": self.snapshot_date.strftime("%Y-%m-%d") if self.snapshot_date else "",
+            "plant_id": self.plant_id,
+            "quantity": float(self.quantity) if self.quantity else 0,
+        }
@@ -7,6 +7,10 @@ from ._base import BaseORM
 
 class OrderORM(BaseORM):
     __tablename__ = "ums_order"
+    __table_args__ = (
+        # 按创建时间筛选 / 游标分页
+        db.Index("ix_ums_order_create_at_id", "create_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True, comment="自增id")
     order_number = db.Column(db.String(64), nullable=False, unique=True, comment="订单编号")
@@ -27,6 +31,16 @@ class OrderORM(BaseORM):
     material_manager = db.Column(db.String(64), nullable=True, comment="材料负责人")
     sub_project_manager = db.Column(db.String(64), nullable=True, comment="分项目负责人")
     attachments = db.Column(db.Text, nullable=True, comment="附件")
+
+    # 冗余字段，由付款单的增删改在同一事务中维护，见 pay.refresh_order_totals
+    paid_total = db.Column(
+        db.Numeric(18, 2), nullable=False, default=0, server_default="0", comment="已付款金额合计"
+    )
+    pay_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0", comment="付款单数量"
+    )
+    balance = db.Column(db.Numeric(18, 2), nullable=True, comment="订单余额（订单金额 - 已付款金额）")
+
     create_at = db.Column(
         db.DateTime,
         nullable=False,
@@ -37,7 +51,7 @@ class OrderORM(BaseORM):
     # 关系属性（延迟导入避免循环依赖）
     supplier = db.relationship("SupplierORM", backref="orders", lazy="select")
 
-    def json(self):
+    def json(self, with_pays=True):
         import json as json_lib
         
         # 处理日期字段 - 可能是date/datetime对象或bytes类型
@@ -80,20 +94,12 @@ class OrderORM(BaseORM):
             except:
                 attachments_data = []
         
-        # 获取关联的付款单信息
+        # 获取关联的付款单信息（只需要余额时可以不加载付款单）
         pays_list = []
-        total_payment_amount = 0  # 付款单金额合计
         try:
             # 通过 backref 获取关联的付款单
-            if hasattr(self, 'pays') and self.pays:
+            if with_pays and hasattr(self, 'pays') and self.pays:
                 for pay in self.pays:
-                    # 计算付款单金额合计 - 处理可能的bytes类型
-                    if pay.current_payment_amount:
-                        amount_val = pay.current_payment_amount
-                        if isinstance(amount_val, bytes):
-                            amount_val = amount_val.decode('utf-8')
-                        total_payment_amount += float(amount_val)
-                    
                     pays_list.append({
                         "id": pay.id,
                         "pay_number": pay.pay_number,
@@ -108,13 +114,17 @@ class OrderORM(BaseORM):
             # 如果关系未加载或出错，返回空列表
             pays_list = []
         
-        # 计算订单余额 = 订单金额 - 付款单金额之和
-        # 处理order_amount可能是bytes的情况
-        order_amount_raw = self.order_amount
-        if isinstance(order_amount_raw, bytes):
-            order_amount_raw = order_amount_raw.decode('utf-8')
-        order_amount_value = float(order_amount_raw) if order_amount_raw else 0
-        order_balance = order_amount_value - total_payment_amount
+        # 订单余额 = 订单金额 - 付款单金额之和，直接读取冗余字段
+        def to_float(amount_field):
+            if isinstance(amount_field, bytes):
+                amount_field = amount_field.decode('utf-8')
+            return float(amount_field) if amount_field else 0
+
+        paid_total = to_float(self.paid_total)
+        if self.balance is not None:
+            order_balance = to_float(self.balance)
+        else:
+            order_balance = to_float(self.order_amount) - paid_total
         
         return {
             "id": self.id,
@@ -130,12 +140,25 @@ class OrderORM(BaseORM):
             "material_details": self.material_details,
             "order_amount": format_amount(self.order_amount),
             "order_balance": str(round(order_balance, 2)),  # 订单余额，保留两位小数
+            "paid_total": str(round(paid_total, 2)),  # 已付款金额合计
             "material_manager": self.material_manager,
             "sub_project_manager": self.sub_project_manager,
             "attachments": self.attachments,
             "attachments_list": attachments_data,
             "pays_list": pays_list,  # 关联的付款单列表
-            "pays_count": len(pays_list),  # 付款单数量
+            "pays_count": self.pay_count or 0,  # 付款单数量
             "is_order": True,  # 标记这是订单行
             "create_at": format_datetime(self.create_at),
         }
+
+
+@db.event.listens_for(OrderORM, "before_insert")
+def _init_balance(mapper, connection, target):
+    target.balance = (target.order_amount or 0) - (target.paid_total or 0)
+
+
+@db.event.listens_for(OrderORM, "before_update")
+def _update_balance(mapper, connection, target):
+    # 以数据库中的 paid_total 为准，避免会话里的旧值覆盖付款单刚刚维护过的结果
+    if db.inspect(target).attrs.order_amount.history.has_changes():
+        target.balance = db.func.coalesce(target.order_amount, 0) - OrderORM.__table__.c.paid_total
@@ -1,12 +1,18 @@
 from datetime import datetime
 
 from pear_admin.extensions import db
+from pear_admin.utils.cache import mark_written
 
 from ._base import BaseORM
+from .order import OrderORM
 
 
 class PayORM(BaseORM):
     __tablename__ = "ums_pay"
+    __table_args__ = (
+        # 按创建时间筛选 / 游标分页
+        db.Index("ix_ums_pay_create_at_id", "create_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True, comment="自增id")
     pay_number = db.Column(db.String(64), nullable=False, unique=True, comment="付款单编号")
@@ -109,3 +115,65 @@ class PayORM(BaseORM):
             "handler": self.handler,
             "create_at": format_datetime(self.create_at),
         }
+
+
+def refresh_order_totals(connection, order_ids=None):
+    """
+    按付款单重新汇总订单的 paid_total / pay_count / balance
+    order_ids 为 None 时重算全部订单
+    """
+    orders = OrderORM.__table__
+    pays = PayORM.__table__
+    paid_total = (
+        db.select(db.func.coalesce(db.func.sum(pays.c.current_payment_amount), 0))
+        .where(pays.c.order_id == orders.c.id)
+        .scalar_subquery()
+    )
+    pay_count = (
+        db.select(db.func.count(pays.c.id))
+        .where(pays.c.order_id == orders.c.id)
+        .scalar_subquery()
+    )
+    stmt = db.update(orders).values(
+        paid_total=paid_total,
+        pay_count=pay_count,
+        balance=db.func.coalesce(orders.c.order_amount, 0) - paid_total,
+    )
+    if order_ids is not None:
+        order_ids = {oid for oid in order_ids if oid}
+        if not order_ids:
+            return
+        stmt = stmt.where(orders.c.id.in_(order_ids))
+    connection.execute(stmt)
+
+
+def _touched_order_ids(target):
+    history = db.inspect(target).attrs.order_id.history
+    return set(history.deleted or ()) | {target.order_id}
+
+
+def _refresh_orders(connection, target, order_ids):
+    refresh_order_totals(connection, order_ids)
+    session = db.object_session(target)
+    if session is not None:
+        mark_written(session, OrderORM.__tablename__)
+
+
+@db.event.listens_for(PayORM, "after_insert")
+def _after_pay_insert(mapper, connection, target):
+    _refresh_orders(connection, target, {target.order_id})
+
+
+@db.event.listens_for(PayORM, "after_update")
+def _after_pay_update(mapper, connection, target):
+    state = db.inspect(target)
+    if (
+        state.attrs.order_id.history.has_changes()
+        or state.attrs.current_payment_amount.history.has_changes()
+    ):
+        _refresh_orders(connection, target, _touched_order_ids(target))
+
+
+@db.event.listens_for(PayORM, "after_delete")
+def _after_pay_delete(mapper, connection, target):
+    _refresh_orders(connection, target, _touched_order_ids(target))
@@ -0,0 +1,28 @@
+from pear_admin.extensions import db
+
+from ._base import BaseORM
+
+
+class MonthlyOrderPayORM(BaseORM):
+    """订单 / 付款按月汇总，由 utils.rollup 在 flush 时增量维护"""
+
+    __tablename__ = "agg_monthly_order_pay"
+
+    month = db.Column(db.String(7), primary_key=True, comment="月份 (YYYY-MM)")
+    order_count = db.Column(db.Integer, nullable=False, default=0, server_default="0", comment="订单数量")
+    order_amount = db.Column(
+        db.Numeric(18, 2), nullable=False, default=0, server_default="0", comment="订单金额合计"
+    )
+    pay_count = db.Column(db.Integer, nullable=False, default=0, server_default="0", comment="付款单数量")
+    pay_amount = db.Column(
+        db.Numeric(18, 2), nullable=False, default=0, server_default="0", comment="付款金额合计"
+    )
+
+    def json(self):
+        return {
+            "month": self.month,
+            "order_count": self.order_count,
+            "order_amount": round(float(self.order_amount or 0), 2),
+            "pay_count": self.pay_count,
+            "pay_amount": round(float(self.pay_amount or 0), 2),
+        }
@@ -0,0 +1,12 @@
+from pear_admin.extensions import db
+
+from ._base import BaseORM
+
+
+class SequenceORM(BaseORM):
+    """序列计数器，每个进程按块领取号段，见 utils.sequence"""
+
+    __tablename__ = "sys_sequence"
+
+    name = db.Column(db.String(32), primary_key=True, comment="序列名称")
+    next_value = db.Column(db.BigInteger, nullable=False, default=1, comment="下一个未分配的值")
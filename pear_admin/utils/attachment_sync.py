@@ -0,0 +1,106 @@
+"""
+项目附件的批量同步
+
+项目表单提交的是附件的完整列表 [{id, code, name, filename, url, size}, ...]。
+原来逐条 query.get + save()，每条附件一次查询、一次提交。这里一次查出相关的附件行，
+在内存中与提交的列表比对出新增、修改、删除三组：修改和删除交给同一个 flush，
+新增用一条 executemany 插入，由调用方统一提交一次。
+"""
+import json
+from datetime import datetime
+
+from pear_admin.extensions import db
+from pear_admin.orms import AttachmentORM, BlobORM
+from pear_admin.orms.attachment import refresh_blob_refs
+
+from .blob_store import sha_from_url
+from .cache import mark_written
+
+
+def parse_attachments(data):
+    """表单中的附件列表可能是 JSON 字符串也可能是数组，格式不对时返回 None"""
+    try:
+        items = json.loads(data) if isinstance(data, str) else data
+    except ValueError:
+        return None
+    if not isinstance(items, list):
+        return None
+    return [item for item in items if isinstance(item, dict)]
+
+
+def _attachment_id(item):
+    try:
+        return int(item.get("id") or 0) or None
+    except (TypeError, ValueError):
+        return None
+
+
+def sync_attachments(project_id, items, adopt=False, prune=True):
+    """
+    把项目的附件同步为 items，返回 (新增数, 修改数, 删除数)；不提交事务
+
+    adopt: 带 id 的附件属于其他项目时是否改挂到本项目（新建项目时，附件可能已随上传入库）
+    prune: 是否删除本项目中不在 items 里的附件
+    """
+    ids = {aid for aid in map(_attachment_id, items) if aid}
+
+    # 1. 一次查询取出本项目现有附件和列表中引用的附件
+    condition = AttachmentORM.project_id == project_id
+    if ids:
+        condition = db.or_(condition, AttachmentORM.id.in_(ids))
+    existing = {att.id: att for att in db.session.scalars(db.select(AttachmentORM).where(condition))}
+
+    # 2. 与提交的列表比对
+    now = datetime.now()
+    kept = set()
+    inserts = []
+    updated = 0
+    for item in items:
+        aid = _attachment_id(item)
+        code = item.get("code")
+        if aid:
+            attachment = existing.get(aid)
+            if attachment is None or (attachment.project_id != project_id and not adopt):
+                continue
+            kept.add(aid)
+            changed = False
+            if attachment.project_id != project_id:
+                attachment.project_id = project_id
+                changed = True
+            if code and code != attachment.attachment_code:
+                attachment.attachment_code = code
+                changed = True
+            updated += changed
+        elif code and (item.get("filename") or item.get("url")):
+            url = item.get("url", "")
+            inserts.append({
+                "project_id": project_id,
+                "attachment_code": code,
+                "filename": item.get("filename") or item.get("name", ""),
+                "original_filename": item.get("name") or item.get("filename", ""),
+                "file_path": url,
+                "file_size": item.get("size") or 0,
+                "blob_sha256": sha_from_url(url),
+                "create_at": now,
+            })
+
+    deletes = []
+    if prune:
+        deletes = [
+            att for aid, att in existing.items()
+            if att.project_id == project_id and aid not in kept
+        ]
+
+    # 3. 修改和删除走同一个 flush，ORM 按批发送；
+    #    新增不需要取回自增 id，用一条 executemany 插入，不逐行 INSERT ... RETURNING
+    for attachment in deletes:
+        db.session.delete(attachment)
+    db.session.flush()
+    if inserts:
+        db.session.execute(db.insert(AttachmentORM), inserts)
+        # 批量插入不触发附件的 ORM 事件，手动重算引用数
+        shas = {row["blob_sha256"] for row in inserts if row["blob_sha256"]}
+        if shas:
+            refresh_blob_refs(db.session.connection(), shas)
+            mark_written(db.session, BlobORM.__tablename__)
+    return len(inserts), updated, len(deletes)
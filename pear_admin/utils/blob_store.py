@@ -0,0 +1,205 @@
+"""
+按内容去重的附件存储
+
+上传的文件按 SHA-256 存放在 UPLOAD_FOLDER/blobs/<前两位>/<sha256><扩展名>，
+同一份图纸无论被上传多少次、挂在多少个项目下，磁盘上只有一份。
+哈希在写盘的同时计算，不需要再读一遍文件。
+
+sys_blob 记录每份内容被多少条附件引用 (ref_count)，由附件表的 ORM 事件维护。
+引用数降到 0 的内容不会立即删除：上传和随项目表单提交附件是两个请求，
+中间这段时间内容也没有引用。collect_garbage() 只清理引用数为 0
+且超过宽限期没有再被上传或引用的内容，由 `flask blob gc` 定期执行。
+"""
+import hashlib
+import os
+import re
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from pear_admin.extensions import db
+from pear_admin.orms import BlobORM
+from pear_admin.orms.attachment import refresh_blob_refs
+
+BLOB_DIR = "blobs"
+# 分片上传会话与写盘中的临时文件
+PARTIAL_DIR = ".partial"
+
+_BLOCK_SIZE = 1024 * 1024
+_EXTENSION = re.compile(r"^\.[a-z0-9]{1,10}$")
+_BLOB_URL = re.compile(r"^/uploads/" + BLOB_DIR + r"/[0-9a-f]{2}/([0-9a-f]{64})(\.[\w-]+)?$")
+
+
+def upload_root():
+    return Path(current_app.config.get("UPLOAD_FOLDER", "uploads"))
+
+
+def sha_from_url(url):
+    """附件 url 指向去重存储时返回内容哈希，否则返回 None"""
+    match = _BLOB_URL.match(url or "")
+    return match.group(1) if match else None
+
+
+def _blob_relpath(sha, filename):
+    # 不能先 secure_filename：中文文件名会被整体去掉，只剩扩展名本身
+    ext = os.path.splitext(filename or "")[1].lower()
+    if not _EXTENSION.match(ext):
+        ext = ""
+    return f"{BLOB_DIR}/{sha[:2]}/{sha}{ext}"
+
+
+def _temp_path():
+    folder = upload_root() / PARTIAL_DIR
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder / f"{uuid.uuid4().hex}.tmp"
+
+
+def _touch(sha):
+    return db.session.execute(
+        db.update(BlobORM).where(BlobORM.sha256 == sha).values(update_at=datetime.now())
+    ).rowcount
+
+
+def _commit_blob(temp_path, sha, size, filename):
+    """把已算好哈希的临时文件放入存储，返回 BlobORM；不提交事务"""
+    if _touch(sha):
+        blob = db.session.get(BlobORM, sha)
+        target = upload_root() / blob.path
+        if target.exists():
+            temp_path.unlink(missing_ok=True)
+        else:
+            # 记录还在但文件被误删，用这次上传的内容补上
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(temp_path, target)
+        return blob
+
+    relpath = _blob_relpath(sha, filename)
+    target = upload_root() / relpath
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(temp_path, target)
+
+    now = datetime.now()
+    blob = BlobORM(sha256=sha, size=size, path=relpath, ref_count=0, create_at=now, update_at=now)
+    try:
+        # 并发上传同一内容时，后插入的一方违反主键，直接使用已有记录
+        with db.session.begin_nested():
+            db.session.add(blob)
+    except IntegrityError:
+        blob = db.session.get(BlobORM, sha)
+        if blob is None:
+            raise
+    return blob
+
+
+def store_stream(stream, filename):
+    """边读边写边计算哈希，把上传流存入去重存储，返回 BlobORM；不提交事务"""
+    temp_path = _temp_path()
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, "wb") as f:
+            while True:
+                block = stream.read(_BLOCK_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+                f.write(block)
+                size += len(block)
+        return _commit_blob(temp_path, digest.hexdigest(), size, filename)
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+
+def store_file(path, filename):
+    """把磁盘上已有的文件（例如分片上传拼好的文件）移入去重存储，返回 BlobORM；不提交事务"""
+    path = Path(path)
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_BLOCK_SIZE), b""):
+            digest.update(block)
+    try:
+        return _commit_blob(path, digest.hexdigest(), path.stat().st_size, filename)
+    finally:
+        path.unlink(missing_ok=True)
+
+
+def collect_garbage(grace=timedelta(days=1)):
+    """
+    删除引用数为 0 且超过宽限期的内容，以及没有记录的孤立文件
+    返回 (删除的记录数, 删除的文件数)
+    """
+    cutoff = datetime.now() - grace
+    root = upload_root()
+
+    # 项目删除时附件由数据库级联删除，不经过 ORM 事件，先按附件表重算一次引用数
+    refresh_blob_refs(db.session.connection())
+    db.session.commit()
+
+    candidates = db.session.execute(
+        db.select(BlobORM.sha256, BlobORM.path, BlobORM.thumbnail_path, BlobORM.preview_path).where(
+            BlobORM.ref_count <= 0, BlobORM.update_at < cutoff
+        )
+    ).all()
+    removed_rows = removed_files = 0
+    for sha, relpath, *derived in candidates:
+        # 条件写在 DELETE 里：选出之后又被上传或引用的内容不会被删掉
+        deleted = db.session.execute(
+            db.delete(BlobORM).where(
+                BlobORM.sha256 == sha, BlobORM.ref_count <= 0, BlobORM.update_at < cutoff
+            )
+        ).rowcount
+        db.session.commit()
+        if not deleted:
+            continue
+        removed_rows += 1
+        for path in (relpath, *derived):
+            target = root / path if path else None
+            if target is not None and target.exists():
+                target.unlink()
+                removed_files += 1
+
+    # 写盘后事务失败留下的文件（包括生成到一半的缩略图临时文件）
+    blob_root = root / BLOB_DIR
+    if blob_root.exists():
+        known = set()
+        for row in db.session.execute(
+            db.select(BlobORM.path, BlobORM.thumbnail_path, BlobORM.preview_path)
+        ):
+            known.update(path for path in row if path)
+        for path in blob_root.glob("*/*"):
+            relpath = path.relative_to(root).as_posix()
+            if relpath in known or datetime.fromtimestamp(path.stat().st_mtime) >= cutoff:
+                continue
+            path.unlink()
+            removed_files += 1
+    return removed_rows, removed_files
+
+
+def expire_partial_uploads(max_age):
+    """
+    清理 PARTIAL_DIR 中超过 max_age 没有变化的分片上传会话（<id>.json + <id>.part）
+    和写盘中途失败留下的临时文件，返回删除的文件数
+    """
+    folder = upload_root() / PARTIAL_DIR
+    if not folder.exists():
+        return 0
+    cutoff = datetime.now() - max_age
+
+    groups = {}
+    for path in folder.iterdir():
+        if path.is_file():
+            groups.setdefault(path.stem, []).append(path)
+
+    removed = 0
+    for paths in groups.values():
+        # 会话以最后一次写入分片的时间为准，元数据和分片文件一起删除
+        last_modified = max(datetime.fromtimestamp(path.stat().st_mtime) for path in paths)
+        if last_modified >= cutoff:
+            continue
+        for path in paths:
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
@@ -0,0 +1,145 @@
+"""
+进程内缓存与基于写入的失效
+
+每张表维护一个版本号。会话 flush、ORM 批量 DML 时记录被写入的表，
+flush 与提交后递增这些表的版本号。缓存键里带上相关表的版本号，
+表一旦被写入，旧的缓存项就不会再被命中，等 TTL 到期或容量满时被清掉。
+
+缓存只在当前进程内有效：gunicorn 多 worker 下其他进程的写入感知不到，
+只能依靠 TTL 兜底，因此 TTL 应保持在秒级到分钟级。
+"""
+import threading
+import time
+from itertools import chain
+
+from flask import Flask
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+_MISSING = object()
+
+
+def table_version(*tables):
+    """返回若干张表当前的版本号，用作缓存键的一部分"""
+    return tuple(_versions.get(name, 0) for name in tables)
+
+
+def bump_tables(*tables):
+    """手动递增表版本号，使依赖这些表的缓存失效"""
+    with _versions_lock:
+        for name in tables:
+            _versions[name] = _versions.get(name, 0) + 1
+
+
+class TTLCache:
+    """带过期时间和容量上限的简单线程安全缓存"""
+
+    def __init__(self, ttl=30, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            expire_at, value = item
+            if expire_at < time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value, ttl=None):
+        expire_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.maxsize:
+                self._evict()
+            self._data[key] = (expire_at, value)
+
+    def get_or_set(self, key, factory, ttl=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value, ttl)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _evict(self):
+        # 先清理过期项，仍然超出容量时按写入顺序淘汰最早的一批
+        now = time.monotonic()
+        for key in [k for k, (expire_at, _) in self._data.items() if expire_at < now]:
+            del self._data[key]
+        overflow = len(self._data) - self.maxsize + 1
+        for key in list(self._data)[:max(overflow, self.maxsize // 10)]:
+            del self._data[key]
+
+
+def _written_tables(session):
+    return session.info.setdefault("written_tables", set())
+
+
+def mark_written(session, *tables):
+    """
+    记录会话中通过 Core 语句写入的表（例如 ORM 事件里直接执行的 UPDATE），
+    这些写入不经过 flush 的对象列表，需要手动登记
+    """
+    _written_tables(session).update(tables)
+    bump_tables(*tables)
+
+
+def _after_flush(session, flush_context):
+    tables = _written_tables(session)
+    for obj in chain(session.new, session.dirty, session.deleted):
+        state = inspect(obj)
+        tables.update(t.name for t in state.mapper.tables)
+        # 多对多关系的变更落在中间表上
+        for relationship in state.mapper.relationships:
+            if relationship.secondary is None:
+                continue
+            try:
+                changed = state.attrs[relationship.key].history.has_changes()
+            except Exception:
+                changed = False
+            if changed:
+                tables.add(relationship.secondary.name)
+    bump_tables(*tables)
+
+
+def _do_orm_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            _written_tables(orm_execute_state.session).add(table.name)
+            bump_tables(table.name)
+
+
+def _after_commit(session):
+    # flush 时已经递增过一次；提交后再递增一次，
+    # 让 flush 与提交之间被其他请求读入缓存的旧数据也失效
+    tables = session.info.pop("written_tables", None)
+    if tables:
+        bump_tables(*tables)
+
+
+def _after_rollback(session):
+    session.info.pop("written_tables", None)
+
+
+def register_cache(app: Flask):
+    """注册写入追踪的会话事件（只注册一次）"""
+    for name, listener in (
+        ("after_flush", _after_flush),
+        ("do_orm_execute", _do_orm_execute),
+        ("after_commit", _after_commit),
+        ("after_rollback", _after_rollback),
+    ):
+        if not event.contains(Session, name, listener):
+            event.listen(Session, name, listener)
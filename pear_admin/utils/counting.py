@@ -0,0 +1,94 @@
+"""
+列表总数统计策略
+
+db.paginate 每翻一页都会对过滤后的查询执行一次 COUNT(*)，带 LIKE 条件的大表上，
+这次统计的开销和取当前页差不多。这里把总数按"规范化后的过滤条件"缓存：
+
+- 缓存键为统计语句本身 (SQL + 参数) 加上涉及表的版本号，表被写入后自动失效；
+- 缓存项在 COUNT_CACHE_TTL 秒后过期，兜底其他 worker 进程的写入；
+- 开启 COUNT_USE_ESTIMATE 时，没有任何过滤条件的查询直接使用
+  information_schema / sqlite_stat1 中的估算行数，取不到估算值再精确统计。
+"""
+from flask import current_app
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import func, inspect, text
+from sqlalchemy.orm import lazyload
+from sqlalchemy.sql.util import find_tables
+
+from pear_admin.extensions import db
+
+from .cache import TTLCache, table_version
+
+_count_cache = TTLCache(maxsize=2048)
+
+
+def _tables_of(select):
+    """查询涉及的全部表，包括过滤条件子查询里引用的表"""
+    names = set()
+    for description in select.column_descriptions:
+        entity = description.get("entity")
+        if entity is not None:
+            names.update(t.name for t in inspect(entity).tables)
+    if select.whereclause is not None:
+        names.update(
+            t.name for t in find_tables(select.whereclause, check_columns=True)
+            if getattr(t, "name", None)
+        )
+    return tuple(sorted(names))
+
+
+def estimate_rows(table_name):
+    """从数据库统计信息中读取表的估算行数，取不到时返回 None"""
+    dialect = db.session.get_bind().dialect.name
+    try:
+        if dialect == "mysql":
+            return db.session.execute(
+                text(
+                    "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :name"
+                ),
+                {"name": table_name},
+            ).scalar()
+        if dialect == "sqlite":
+            stats = db.session.execute(
+                text("SELECT stat FROM sqlite_stat1 WHERE tbl = :name"),
+                {"name": table_name},
+            ).scalars().all()
+            counts = [int(stat.split()[0]) for stat in stats if stat]
+            return max(counts) if counts else None
+    except Exception:
+        # sqlite_stat1 只有执行过 ANALYZE 才存在
+        return None
+    return None
+
+
+def _exact_count(select):
+    sub = select.options(lazyload("*")).order_by(None).subquery()
+    return db.session.execute(db.select(func.count()).select_from(sub)).scalar()
+
+
+def count_rows(select):
+    """统计查询的总行数（带缓存）"""
+    tables = _tables_of(select)
+    compiled = select.order_by(None).compile()
+    key = (str(compiled), repr(sorted(compiled.params.items())), tables, table_version(*tables))
+
+    def factory():
+        if (
+            select.whereclause is None
+            and len(tables) == 1
+            and current_app.config.get("COUNT_USE_ESTIMATE")
+        ):
+            estimated = estimate_rows(tables[0])
+            if estimated is not None:
+                return int(estimated)
+        return _exact_count(select)
+
+    return _count_cache.get_or_set(key, factory, ttl=current_app.config.get("COUNT_CACHE_TTL", 30))
+
+
+def paginate(select, page, per_page) -> Pagination:
+    """与 db.paginate 相同，但总数走 count_rows 的缓存策略"""
+    pages = db.paginate(select, page=page, per_page=per_page, error_out=False, count=False)
+    pages.total = count_rows(select)
+    return pages
@@ -0,0 +1,97 @@
+"""
+上传文件的鉴权下载
+
+上传目录不再由 Nginx 直接公开，下载请求先经过 Flask 校验登录状态，再交回 Nginx 传输：
+
+- 配置了 UPLOAD_ACCEL_REDIRECT（Nginx 中 internal 的 location 前缀）时，
+  只返回带 X-Accel-Redirect 头的空响应，文件内容、Range 和条件请求都由 Nginx 处理，
+  Python 不读取文件；
+- 未配置时（开发服务器）用 send_file 直接发送，同样支持 Range、ETag 和条件 GET。
+
+浏览器打开下载链接、<img> 加载缩略图时无法带请求头，token 只能放在查询参数里，
+会留在访问日志、浏览历史和 Referer 中。所以查询参数只接受 signed_url() 签发的下载 token：
+有效期 DOWNLOAD_TOKEN_EXPIRES（默认 5 分钟），download 声明绑定到签发时的地址，
+不能用于其他地址，也不能当作登录 token 调用其他接口（见 init_jwt 中的校验）。
+"""
+import mimetypes
+from datetime import timedelta
+from functools import wraps
+from urllib.parse import quote, urlencode
+
+from flask import Response, abort, current_app, send_file
+from flask_jwt_extended import (
+    create_access_token,
+    get_current_user,
+    get_jwt,
+    get_jwt_request_location,
+    verify_jwt_in_request,
+)
+from werkzeug.security import safe_join
+
+from .blob_store import PARTIAL_DIR, sha_from_url, upload_root
+
+URL_PREFIX = "/uploads/"
+# 下载 token 中绑定地址的声明
+DOWNLOAD_CLAIM = "download"
+
+
+def relpath_from_url(url):
+    """把 /uploads/... 形式的文件地址转换为相对 UPLOAD_FOLDER 的路径，不是上传文件时返回 None"""
+    if not url or not url.startswith(URL_PREFIX):
+        return None
+    return url[len(URL_PREFIX):]
+
+
+def signed_url(path, **params):
+    """返回带短期下载 token 的地址，token 只能用于访问 path（不含查询参数）"""
+    token = create_access_token(
+        identity=get_current_user(),
+        expires_delta=current_app.config.get("DOWNLOAD_TOKEN_EXPIRES", timedelta(minutes=5)),
+        additional_claims={DOWNLOAD_CLAIM: path},
+    )
+    return f"{path}?{urlencode({**params, 'jwt': token})}"
+
+
+def download_required(fn):
+    """请求头中的登录 token 或查询参数中的下载 token；查询参数中的登录 token 不被接受"""
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        verify_jwt_in_request(locations=["headers", "query_string"])
+        if get_jwt_request_location() == "query_string" and DOWNLOAD_CLAIM not in get_jwt():
+            return {"code": -1, "msg": "下载链接无效，请重新下载"}, 403
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def send_upload(relpath, download_name=None, as_attachment=False):
+    """发送 UPLOAD_FOLDER 下的文件；路径越界或文件不存在时返回 404"""
+    path = safe_join(str(upload_root()), relpath) if relpath else None
+    if path is None or relpath.startswith(PARTIAL_DIR + "/"):
+        abort(404)
+
+    accel_prefix = current_app.config.get("UPLOAD_ACCEL_REDIRECT")
+    if accel_prefix:
+        response = Response(mimetype=mimetypes.guess_type(download_name or relpath)[0])
+        response.headers["X-Accel-Redirect"] = accel_prefix.rstrip("/") + "/" + quote(relpath)
+        if download_name:
+            disposition = "attachment" if as_attachment else "inline"
+            response.headers["Content-Disposition"] = (
+                f"{disposition}; filename*=UTF-8''{quote(download_name)}"
+            )
+        return response
+
+    try:
+        # 去重存储中的文件内容不会变化，直接用内容哈希作强 ETag
+        sha = sha_from_url(URL_PREFIX + relpath)
+        return send_file(
+            path,
+            download_name=download_name,
+            as_attachment=as_attachment,
+            conditional=True,
+            etag=sha if sha else True,
+            max_age=3600 if sha else None,
+        )
+    except FileNotFoundError:
+        abort(404)
@@ -0,0 +1,51 @@
+"""
+可走索引的查询条件
+
+db.func.date(create_at) == d 这样把列包在函数里的写法会让索引失效。
+这里把日期、日期范围、月份统一改写为列上的半开区间 create_at >= 起 AND create_at < 止。
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_
+
+# layui 日期范围选择器默认的分隔符
+RANGE_SEPARATOR = " - "
+
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def parse_date_range(value):
+    """
+    把日期字符串解析为 [开始, 结束) 的 datetime 区间，无法解析时返回 None
+    支持 "2026-01-08"、"2026-01-01 - 2026-01-31"、"2026-01"
+    """
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        if RANGE_SEPARATOR in value:
+            start, end = value.split(RANGE_SEPARATOR, 1)
+            start = datetime.strptime(start.strip(), "%Y-%m-%d")
+            end = datetime.strptime(end.strip(), "%Y-%m-%d") + timedelta(days=1)
+        elif len(value) == 7:
+            start = datetime.strptime(value, "%Y-%m")
+            end = _next_month(start)
+        else:
+            start = datetime.strptime(value, "%Y-%m-%d")
+            end = start + timedelta(days=1)
+    except ValueError:
+        return None
+    if end <= start:
+        return None
+    return start, end
+
+
+def date_filter(column, value):
+    """返回 column 落在 value 所表示日期区间内的条件，无法解析时返回 None"""
+    bounds = parse_date_range(value)
+    if bounds is None:
+        return None
+    start, end = bounds
+    return and_(column >= start, column < end)
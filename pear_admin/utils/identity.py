@@ -0,0 +1,89 @@
+"""
+JWT 当前用户缓存
+
+每个 @jwt_required() 请求都要按 token 中的用户 id 查询用户，需要权限时再逐个角色加载。
+这里把用户资料、角色 id 和权限列表组装成只读的 CurrentUser 快照，
+按 (用户 id, 权限版本号) 缓存在进程内。
+
+权限版本号由用户、角色、权限及两张中间表的表版本号组成，这些表被写入后缓存立即失效；
+其他 worker 的修改依靠 IDENTITY_CACHE_TTL 兜底。
+"""
+from flask import current_app
+
+from pear_admin.extensions import db
+
+from .cache import TTLCache, mark_written, table_version
+
+PERMISSION_TABLES = ("ums_user", "ums_user_role", "ums_role", "ums_role_rights", "ums_rights")
+
+_identity_cache = TTLCache(maxsize=1024)
+
+
+class CurrentUser:
+    """当前登录用户的只读快照，不绑定数据库会话，需要修改用户时通过 orm() 重新加载"""
+
+    def __init__(self, profile, role_ids, rights):
+        self.id = profile["id"]
+        self.profile = profile
+        self.role_ids = tuple(role_ids)
+        self.rights = tuple(rights)
+        self.rights_ids = frozenset(r["id"] for r in self.rights)
+        self.rights_codes = frozenset(r["code"] for r in self.rights if r["code"])
+
+    @property
+    def username(self):
+        return self.profile["username"]
+
+    @property
+    def nickname(self):
+        return self.profile["nickname"]
+
+    def json(self):
+        return dict(self.profile)
+
+    def orm(self):
+        from pear_admin.orms import UserORM
+
+        return db.session.get(UserORM, self.id)
+
+
+def permissions_version():
+    """权限版本号，用户、角色、权限或其关联被写入后变化"""
+    return table_version(*PERMISSION_TABLES)
+
+
+def bump_permissions(session=None):
+    """标记权限数据已修改；动态关系 (lazy="dynamic") 的赋值在 flush 时无法可靠识别，修改授权时显式调用"""
+    mark_written(session or db.session, *PERMISSION_TABLES)
+
+
+def _build(user_id):
+    from pear_admin.orms import RightsORM, UserORM, role_rights, user_role
+
+    user = db.session.get(UserORM, user_id)
+    if user is None:
+        return None
+    role_ids = db.session.scalars(
+        db.select(user_role.c.role_id).where(user_role.c.user_id == user_id)
+    ).all()
+    rights_list = []
+    if role_ids:
+        rights_list = db.session.scalars(
+            db.select(RightsORM)
+            .join(role_rights, role_rights.c.rights_id == RightsORM.id)
+            .where(role_rights.c.role_id.in_(role_ids))
+            .distinct()
+        ).all()
+
+    return CurrentUser(user.json(), role_ids, [r.json() for r in rights_list])
+
+
+def load_identity(user_id):
+    """返回用户 id 对应的 CurrentUser，用户不存在时返回 None（不缓存）"""
+    key = (user_id, permissions_version())
+    identity = _identity_cache.get(key)
+    if identity is None:
+        identity = _build(user_id)
+        if identity is not None:
+            _identity_cache.set(key, identity, ttl=current_app.config.get("IDENTITY_CACHE_TTL", 300))
+    return identity
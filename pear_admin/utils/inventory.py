@@ -0,0 +1,202 @@
+"""
+苗圃库存变动
+
+库存数量与加权平均成本都在数据库中用一条 UPDATE 原子地计算，
+不在 Python 中先读后写，并发入库同一苗木时不会丢失数量。
+(name, spec, unit) 上有唯一索引，按这三列定位苗木是一次索引查找。
+
+出库按整单处理：一次 IN 查询锁定全部苗木，整单校验通过后用一条 UPDATE 扣减库存、
+一次批量 INSERT 写入流水，往返次数与出库项目数无关。
+"""
+import datetime
+from decimal import Decimal
+
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+
+from pear_admin.extensions import db
+from pear_admin.orms.nursery import NurseryPlantORM, NurseryTransactionORM
+
+
+class InventoryError(Exception):
+    """库存校验失败，消息可以直接返回给前端"""
+
+
+def _add_to_plant(plant_id, quantity, price, location):
+    """
+    原子地累加库存并重算加权平均价: (旧量*旧价 + 新量*新价) / 总量
+    price 必须写在 quantity 之前：MySQL 单表 UPDATE 按从左到右的顺序赋值，
+    后面的表达式会读到前面已经更新过的列
+    """
+    old_qty = func.coalesce(NurseryPlantORM.quantity, 0)
+    old_price = func.coalesce(NurseryPlantORM.price, 0)
+    new_qty = old_qty + quantity
+    db.session.execute(
+        db.update(NurseryPlantORM)
+        .where(NurseryPlantORM.id == plant_id)
+        .ordered_values(
+            (NurseryPlantORM.price, case(
+                (new_qty > 0, (old_qty * old_price + quantity * price) / new_qty),
+                else_=0,
+            )),
+            (NurseryPlantORM.quantity, new_qty),
+            (NurseryPlantORM.location, func.coalesce(
+                func.nullif(location or "", ""), NurseryPlantORM.location
+            )),
+            (NurseryPlantORM.update_at, datetime.datetime.now()),
+        )
+    )
+
+
+def _find_plant_id(name, spec, unit, for_update=False):
+    query = db.select(NurseryPlantORM.id).where(
+        NurseryPlantORM.name == name,
+        NurseryPlantORM.spec == spec,
+        NurseryPlantORM.unit == unit,
+    )
+    if for_update:
+        query = query.with_for_update()
+    return db.session.scalar(query)
+
+
+def receive_stock(name, spec, unit, quantity, price, category=None, location="", remark=""):
+    """
+    入库：存在同名、同规格、同单位的苗木时原子地累加数量并重算成本，否则新增库存记录
+    返回苗木 id；不提交事务
+
+    规格、单位为空时按空字符串处理：唯一索引中 NULL 互不相等，
+    传入 None 会让同一苗木建出多条库存记录
+    """
+    spec = spec or ""
+    unit = unit or ""
+    plant_id = _find_plant_id(name, spec, unit)
+    if plant_id is not None:
+        _add_to_plant(plant_id, quantity, price, location)
+        return plant_id
+
+    now = datetime.datetime.now()
+    new_plant = NurseryPlantORM(
+        name=name,
+        category=category,
+        spec=spec,
+        unit=unit,
+        quantity=quantity,
+        price=price,
+        location=location,
+        remark=remark,
+        create_at=now,
+        update_at=now,
+    )
+    try:
+        # 并发入库同一新苗木时，后插入的一方违反唯一索引，回到累加分支
+        with db.session.begin_nested():
+            db.session.add(new_plant)
+        return new_plant.id
+    except IntegrityError:
+        # 必须是加锁读：MySQL REPEATABLE READ 下普通 SELECT 读事务快照，
+        # 看不到对方刚提交的记录；加锁读读取最新提交的版本
+        plant_id = _find_plant_id(name, spec, unit, for_update=True)
+        if plant_id is None:
+            raise
+        _add_to_plant(plant_id, quantity, price, location)
+        return plant_id
+
+
+def _decimal(value):
+    return Decimal(str(value or 0))
+
+
+def issue_stock(order_no, items, destination="", operator="Admin", remark=""):
+    """
+    整单出库，返回写入的流水条数；不提交事务，校验失败时抛出 InventoryError
+    items: [{plant_id, quantity, price, name, spec, unit, is_non_inventory}, ...]
+    """
+    now = datetime.datetime.now()
+    lines = []
+    for item in items:
+        quantity = _decimal(item.get('quantity'))
+        if quantity <= 0:
+            continue
+        plant_id = item.get('plant_id')
+        if item.get('is_non_inventory', False) or not plant_id:
+            plant_id = None
+        lines.append((item, int(plant_id) if plant_id else None, quantity, _decimal(item.get('price'))))
+
+    # 1. 一次查询取出（并在 MySQL 上锁定）全部库存项目
+    plant_ids = sorted({plant_id for _, plant_id, _, _ in lines if plant_id})
+    plants = {}
+    if plant_ids:
+        plants = {
+            plant.id: plant
+            for plant in db.session.scalars(
+                db.select(NurseryPlantORM)
+                .where(NurseryPlantORM.id.in_(plant_ids))
+                .order_by(NurseryPlantORM.id)
+                .with_for_update()
+            )
+        }
+
+    # 2. 整单校验，同一苗木出现在多行时合计后再比较
+    demand = {}
+    for item, plant_id, quantity, _ in lines:
+        if plant_id is None:
+            continue
+        if plant_id not in plants:
+            raise InventoryError(f"库存项目 {item.get('name', '')} 不存在")
+        demand[plant_id] = demand.get(plant_id, 0) + quantity
+    for plant_id, quantity in demand.items():
+        plant = plants[plant_id]
+        if _decimal(plant.quantity) < quantity:
+            raise InventoryError(f"{plant.name} 库存不足! 当前: {plant.quantity}")
+
+    # 3. 一条 UPDATE 扣减全部库存；WHERE 中再次比较库存，防止校验后被其他事务扣减
+    if demand:
+        amount = case(demand, value=NurseryPlantORM.id)
+        updated = db.session.execute(
+            db.update(NurseryPlantORM)
+            .where(NurseryPlantORM.id.in_(demand), NurseryPlantORM.quantity >= amount)
+            .values(quantity=NurseryPlantORM.quantity - amount, update_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if updated != len(demand):
+            raise InventoryError("库存已被其他出库单占用，请刷新后重试")
+        for plant in plants.values():
+            db.session.expire(plant, ["quantity", "update_at"])
+
+    # 4. 批量写入流水
+    rows = []
+    for item, plant_id, quantity, price in lines:
+        row = {
+            "order_no": order_no,
+            "type": 'out',
+            "quantity": quantity,
+            "price": price,
+            "total_price": quantity * price,
+            "operator": operator,
+            "destination": destination,
+            "create_at": now,
+        }
+        if plant_id is None:
+            # 非入库项目 - 直接记录流水
+            row.update(
+                plant_id=None,
+                plant_name=item.get('name', ''),
+                spec=item.get('spec', '-'),
+                unit=item.get('unit', '株'),
+                location='非入库',
+                remark=remark + ' [非入库]',
+            )
+        else:
+            plant = plants[plant_id]
+            row.update(
+                plant_id=plant.id,
+                plant_name=plant.name,
+                spec=plant.spec,
+                unit=plant.unit,
+                location=plant.location,
+                remark=remark,
+            )
+        rows.append(row)
+    if rows:
+        db.session.execute(db.insert(NurseryTransactionORM), rows)
+    return len(rows)
@@ -0,0 +1,81 @@
+"""
+菜单树编译
+
+每个角色的菜单树只在权限数据变化时编译一次，缓存在进程内；
+多角色用户把各角色的树按节点 id 合并，合并结果序列化为 JSON 并计算 ETag，
+前端带 If-None-Match 再次请求时直接返回 304。
+
+缓存键包含 ums_rights 与 ums_role_rights 的表版本号，两张表被写入后重新编译；
+其他 worker 的修改依靠 MENU_CACHE_TTL 兜底。
+"""
+import hashlib
+import json
+
+from flask import current_app
+
+from pear_admin.extensions import db
+
+from .cache import TTLCache, table_version
+from .tree import build_tree, walk
+
+MENU_TABLES = ("ums_rights", "ums_role_rights")
+
+# 出现在菜单中的权限类型，其余（按钮权限 auth 等）不展示
+MENU_TYPES = ("menu", "path")
+
+_menu_cache = TTLCache(maxsize=512)
+
+
+class CompiledMenu:
+    """编译好的菜单：序列化后的 JSON 与对应的 ETag"""
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+
+
+def _ttl():
+    return current_app.config.get("MENU_CACHE_TTL", 300)
+
+
+def _sort_key(node):
+    return node["sort"] or 0, node["id"]
+
+
+def role_tree(role_id):
+    """单个角色的菜单树（缓存）；返回的结构由缓存共享，不要修改"""
+    from pear_admin.orms import RightsORM, role_rights
+
+    def factory():
+        rights_list = db.session.scalars(
+            db.select(RightsORM)
+            .join(role_rights, role_rights.c.rights_id == RightsORM.id)
+            .where(role_rights.c.role_id == role_id, RightsORM.type.in_(MENU_TYPES))
+        ).unique().all()
+        # 父节点不属于本角色的节点留在顶层，合并其他角色的树时还可能找到父节点
+        return build_tree([r.menu_json() for r in rights_list], root=None, sort_key=_sort_key)
+
+    return _menu_cache.get_or_set(("role", role_id, table_version(*MENU_TABLES)), factory, ttl=_ttl())
+
+
+def merge_trees(trees):
+    """合并多个角色的菜单树，返回只包含顶级节点 (pid == 0) 的新树"""
+    # 缓存中的树不能修改，先按 id 去重拷贝出不带 children 的平铺节点
+    nodes = {}
+    for tree in trees:
+        for node in walk(tree):
+            if node["id"] not in nodes:
+                nodes[node["id"]] = {k: v for k, v in node.items() if k != "children"}
+    return build_tree(nodes.values(), root=0, sort_key=_sort_key)
+
+
+def compile_menu(role_ids):
+    """返回若干角色合并后的 CompiledMenu（缓存）"""
+    role_ids = tuple(sorted(set(role_ids)))
+
+    def factory():
+        tree = merge_trees(role_tree(role_id) for role_id in role_ids)
+        body = json.dumps(tree, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return CompiledMenu(body)
+
+    return _menu_cache.get_or_set(("menu", role_ids, table_version(*MENU_TABLES)), factory, ttl=_ttl())
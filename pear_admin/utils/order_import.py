@@ -0,0 +1,313 @@
+"""
+订单批量导入（CSV / XLSX）
+
+逐行调用新增订单接口时，每行一次编号查重、一次 INSERT、一次提交。这里流式读取表格，
+每 IMPORT_BATCH_SIZE 行为一批：
+
+- 批内先做格式校验（必填、日期、金额），错误记录到行号，不中断其他行；
+- 供应商名称一次 IN 查询解析为 supplier_id，已解析过的名称缓存在本次导入内；
+- 订单编号一次 IN 查询与库中已有编号查重，文件内重复用集合判断；
+- 通过校验的行用一条 executemany INSERT 写入。
+
+整个导入在一个事务中。on_error="abort"（默认）时只要有错误行就整体回滚，什么都不导入；
+"skip" 时跳过错误行导入其余行。dry_run 只校验不写入。
+
+批量 INSERT 不经过 ORM 的 flush，月度汇总和 SQLite 全文索引影子表在这里按批同步；
+付款汇总列新订单都为 0，余额即订单金额。
+
+表头可以用字段名 (order_number) 或列注释 (订单编号)；供应商用 supplier_name / 供应商名称 列。
+CSV 按 UTF-8 读取，开头不是合法 UTF-8 时按 GB18030 读取（中文 Excel 默认另存为 GBK）。
+XLSX 需要可选依赖 openpyxl (poetry install -E import)。
+"""
+import codecs
+import csv
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from flask import current_app
+
+from pear_admin.extensions import db
+from pear_admin.orms import OrderORM, SupplierORM
+
+from . import rollup, search
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+# 允许导入的订单列
+IMPORT_FIELDS = (
+    "order_number", "material_name", "project_name", "supplier_contact_person",
+    "contact_phone", "cutting_time", "estimated_arrival_time", "material_details",
+    "order_amount", "material_manager", "sub_project_manager",
+)
+DATE_FIELDS = ("cutting_time", "estimated_arrival_time")
+REQUIRED_FIELDS = ("order_number", "material_name")
+
+# 错误明细最多返回的条数，总数另行返回
+MAX_REPORTED_ERRORS = 500
+# 判断 CSV 编码时读取的字节数
+_SNIFF_SIZE = 64 * 1024
+
+
+class ImportFormatError(Exception):
+    """文件本身无法解析（格式不支持、缺少表头等），消息可以直接返回给前端"""
+
+
+def _header_map():
+    columns = OrderORM.__table__.c
+    mapping = {}
+    for name in IMPORT_FIELDS:
+        mapping[name] = name
+        if columns[name].comment:
+            mapping[columns[name].comment] = name
+    for alias in ("supplier_name", "供应商名称", "供应商"):
+        mapping[alias] = "supplier_name"
+    return mapping
+
+
+def _csv_encoding(stream):
+    """带 BOM 或开头能按 UTF-8 解码时为 UTF-8，否则按 GB18030（GBK 的超集）"""
+    head = stream.read(_SNIFF_SIZE)
+    stream.seek(0)
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # final=False：截断在多字节字符中间不算错误
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+    except UnicodeDecodeError:
+        return "gb18030"
+    return "utf-8"
+
+
+def _csv_rows(stream):
+    try:
+        yield from csv.reader(codecs.iterdecode(stream, _csv_encoding(stream)))
+    except UnicodeDecodeError:
+        raise ImportFormatError("无法识别文件编码，请另存为 UTF-8 或 GBK 编码的 CSV 后导入")
+
+
+def _xlsx_rows(stream):
+    if openpyxl is None:
+        raise ImportFormatError("服务器未安装 openpyxl，暂不支持导入 xlsx，请另存为 CSV 后导入")
+    # read_only 模式按行解析，不把整个工作表读入内存
+    workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    try:
+        for values in workbook.active.iter_rows(values_only=True):
+            yield ["" if v is None else v for v in values]
+    finally:
+        workbook.close()
+
+
+def read_rows(stream, filename):
+    """按文件扩展名逐行读取，返回 (行号, {字段: 值}) 的迭代器；行号从表头所在的第 1 行算起"""
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if ext == "csv":
+        rows = _csv_rows(stream)
+    elif ext == "xlsx":
+        rows = _xlsx_rows(stream)
+    else:
+        raise ImportFormatError("只支持 CSV 或 XLSX 文件")
+
+    try:
+        header = next(rows)
+    except StopIteration:
+        raise ImportFormatError("文件为空")
+    mapping = _header_map()
+    fields = [mapping.get(str(h).strip()) for h in header]
+    missing = [name for name in REQUIRED_FIELDS if name not in fields]
+    if missing:
+        labels = [OrderORM.__table__.c[name].comment for name in missing]
+        raise ImportFormatError(f"缺少必需的列：{'、'.join(labels)}")
+
+    def generate():
+        for line, values in enumerate(rows, start=2):
+            record = {f: v for f, v in zip(fields, values) if f}
+            if not any(str(v).strip() for v in record.values()):
+                continue  # 空行
+            yield line, record
+    return generate()
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = _text(value)
+    if text is None:
+        return None
+    # 去掉时间部分；Excel 中常见不补零的 2024/1/5
+    text = text.split()[0].split("T")[0]
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%d", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"invalid date: {text}")
+
+
+def _validate(record):
+    """返回 (订单数据, 供应商名称, 错误信息)"""
+    data = {}
+    for name in IMPORT_FIELDS:
+        if name in DATE_FIELDS or name == "order_amount":
+            continue
+        data[name] = _text(record.get(name))
+    for name in REQUIRED_FIELDS:
+        if not data[name]:
+            return None, None, f"{OrderORM.__table__.c[name].comment}不能为空"
+
+    for name in DATE_FIELDS:
+        try:
+            data[name] = _parse_date(record.get(name))
+        except ValueError:
+            return None, None, f"{OrderORM.__table__.c[name].comment}格式错误，应为 YYYY-MM-DD 或 YYYY/M/D"
+
+    amount = _text(record.get("order_amount"))
+    try:
+        data["order_amount"] = Decimal(amount.replace(",", "")) if amount else None
+    except InvalidOperation:
+        return None, None, "订单金额格式错误"
+
+    return data, _text(record.get("supplier_name")), None
+
+
+class _Importer:
+    def __init__(self, skip_errors, dry_run):
+        self.skip_errors = skip_errors
+        self.dry_run = dry_run
+        self.suppliers = {}
+        self.seen_numbers = set()
+        self.total = 0
+        self.imported = 0
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, line, order_number, msg):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": line, "order_number": order_number, "msg": msg})
+
+    def _resolve_suppliers(self, names):
+        # 同名供应商取 id 最小的一个，与手工选择列表的默认排序一致
+        unknown = {name for name in names if name not in self.suppliers}
+        if not unknown:
+            return
+        rows = db.session.execute(
+            db.select(SupplierORM.name, db.func.min(SupplierORM.id))
+            .where(SupplierORM.name.in_(unknown))
+            .group_by(SupplierORM.name)
+        )
+        self.suppliers.update(dict(rows.all()))
+        for name in unknown:
+            self.suppliers.setdefault(name, None)
+
+    def process(self, batch):
+        self.total += len(batch)
+        valid = []
+        for line, record in batch:
+            data, supplier_name, msg = _validate(record)
+            if msg:
+                self.error(line, _text(record.get("order_number")), msg)
+                continue
+            number = data["order_number"]
+            if number in self.seen_numbers:
+                self.error(line, number, f"订单编号 {number} 在文件中重复")
+                continue
+            self.seen_numbers.add(number)
+            valid.append((line, data, supplier_name))
+
+        # 1. 供应商名称 -> id，一次 IN 查询
+        self._resolve_suppliers({name for _, _, name in valid if name})
+        # 2. 订单编号查重，一次 IN 查询
+        numbers = [data["order_number"] for _, data, _ in valid]
+        existing = set()
+        if numbers:
+            existing = set(db.session.scalars(
+                db.select(OrderORM.order_number).where(OrderORM.order_number.in_(numbers))
+            ))
+
+        now = datetime.now()
+        rows = []
+        for line, data, supplier_name in valid:
+            if data["order_number"] in existing:
+                self.error(line, data["order_number"], f"订单编号 {data['order_number']} 已存在")
+                continue
+            supplier_id = None
+            if supplier_name:
+                supplier_id = self.suppliers.get(supplier_name)
+                if supplier_id is None:
+                    self.error(line, data["order_number"], f"供应商 {supplier_name} 不存在")
+                    continue
+            rows.append({
+                **data,
+                "supplier_id": supplier_id,
+                "paid_total": 0,
+                "pay_count": 0,
+                "balance": data["order_amount"] or 0,
+                "create_at": now,
+            })
+
+        # 有错误且不跳过时后面的行只校验，不再写入
+        if self.dry_run or (self.error_count and not self.skip_errors) or not rows:
+            return
+        # 3. 一条 executemany 写入
+        db.session.execute(db.insert(OrderORM), rows)
+        self.imported += len(rows)
+        self._sync_derived(rows)
+
+    def _sync_derived(self, rows):
+        """同步 flush 之外维护的派生数据：月度汇总、SQLite 全文索引影子表"""
+        connection = db.session.connection()
+        deltas = defaultdict(lambda: defaultdict(int))
+        for row in rows:
+            values = deltas[rollup.month_of(row["create_at"])]
+            values["order_count"] += 1
+            values["order_amount"] += row["order_amount"] or 0
+        rollup.apply_deltas(connection, deltas)
+
+        if search.has_shadow_index(connection, OrderORM):
+            columns = search.SEARCH_COLUMNS[OrderORM]
+            indexed = db.session.execute(
+                db.select(OrderORM.id, *[getattr(OrderORM, c) for c in columns])
+                .where(OrderORM.order_number.in_([row["order_number"] for row in rows]))
+            ).mappings().all()
+            search.index_rows(connection, OrderORM, [dict(r) for r in indexed])
+
+
+def import_orders(rows, skip_errors=False, dry_run=False):
+    """
+    导入 read_rows() 产生的行，返回导入结果；不提交事务
+    出现错误且 skip_errors 为 False 时不写入任何行，调用方应回滚
+    """
+    importer = _Importer(skip_errors, dry_run)
+    batch_size = current_app.config.get("IMPORT_BATCH_SIZE", 1000)
+    batch = []
+    for item in rows:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            importer.process(batch)
+            batch = []
+    if batch:
+        importer.process(batch)
+
+    return {
+        "total": importer.total,
+        "imported": 0 if (importer.error_count and not skip_errors) else importer.imported,
+        "error_count": importer.error_count,
+        "errors": sorted(importer.errors, key=lambda e: e["row"]),
+    }
@@ -0,0 +1,115 @@
+"""
+游标（keyset）分页
+
+OFFSET 分页翻到越后面越慢，并且每一页都要额外执行一次 COUNT(*)。
+游标分页记住当前页最后一行的排序键，下一页直接 WHERE 定位到该位置之后，
+配合 (create_at, id) 或 id 上的索引，任何一页都只需要一次索引范围扫描。
+
+游标对前端是不透明的字符串，内容为 base64 编码的 {"d": 方向, "k": 排序键值}。
+"""
+import base64
+import json
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+from pear_admin.extensions import db
+
+
+class KeysetPage:
+    """游标分页结果"""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def _to_json(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _from_json(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(item, columns, direction):
+    payload = {"d": direction, "k": [_to_json(getattr(item, c.key)) for c in columns]}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, columns):
+    """解析游标，返回 (方向, 排序键值)；格式不对时抛出 ValueError"""
+    # 游标来自客户端，任何结构或类型不对的内容都统一当作无效游标
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        direction = payload["d"]
+        values = payload["k"]
+        if direction not in ("next", "prev") or not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("invalid cursor")
+        return direction, [_from_json(c, v) for c, v in zip(columns, values)]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("invalid cursor")
+
+
+def _seek_clause(columns, values, smaller):
+    """
+    生成 (c1, c2, ...) 与游标值比较的条件
+    展开为 c1 < v1 OR (c1 = v1 AND c2 < v2) ...，避免行构造器比较在 MySQL 上用不到索引
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        compare = column < values[i] if smaller else column > values[i]
+        clauses.append(and_(*[columns[j] == values[j] for j in range(i)], compare))
+    return or_(*clauses)
+
+
+def keyset_paginate(query, columns, cursor=None, limit=10, descending=True):
+    """
+    按 columns 做游标分页
+    query 可以是 db.select(Model) 也可以是 Model.query，已有的排序会被替换为 columns
+    """
+    direction, values = "next", None
+    if cursor:
+        direction, values = decode_cursor(cursor, columns)
+    forward = direction == "next"
+
+    # 倒序时向后翻页取更小的值；向前翻页则反向查询，取回后再倒转
+    reverse_scan = forward != descending
+    q = query.order_by(None)
+    if values is not None:
+        q = q.where(_seek_clause(columns, values, smaller=not reverse_scan))
+    q = q.order_by(*[c.asc() if reverse_scan else c.desc() for c in columns])
+    q = q.limit(limit + 1)
+
+    if isinstance(q, Query):
+        items = q.all()
+    else:
+        items = db.session.scalars(q).unique().all()
+
+    has_more = len(items) > limit
+    items = items[:limit]
+    if not forward:
+        items.reverse()
+    if not items:
+        return KeysetPage(items)
+
+    if forward:
+        next_cursor = encode_cursor(items[-1], columns, "next") if has_more else None
+        prev_cursor = encode_cursor(items[0], columns, "prev") if values is not None else None
+    else:
+        next_cursor = encode_cursor(items[-1], columns, "next")
+        prev_cursor = encode_cursor(items[0], columns, "prev") if has_more else None
+    return KeysetPage(items, next_cursor, prev_cursor)
@@ -0,0 +1,196 @@
+"""
+附件缩略图与预览图
+
+项目、订单页面的附件列表原来只能下载原图 / 原 PDF 来预览，动辄几 MB。
+上传完成后为图片和 PDF 生成两张 JPEG，与文件内容放在同一目录：
+
+- <sha256>.thumb.jpg   列表缩略图，长边 THUMBNAIL_SIZE
+- <sha256>.preview.jpg 预览图（PDF 取首页），长边 PREVIEW_SIZE
+
+缩略图按文件内容生成，同一内容只生成一次。生成状态记录在 sys_blob.preview_status：
+上传接口提交事务后把内容标记为 pending，再按 PREVIEW_MODE 处理：
+
+- thread: 交给进程内的线程池，上传请求立即返回；
+- worker: 由 `flask preview worker` 单独进程轮询 pending 记录生成；
+- off:    只标记不生成。
+
+两种方式都先用一条带条件的 UPDATE 把 pending 改为 processing 来领取任务，
+线程池与独立 worker 同时运行也不会重复生成。
+
+图片需要 Pillow，PDF 需要 PyMuPDF，均为可选依赖 (poetry install -E preview)；
+缺少时对应文件保持 pending，等装好依赖的 worker 处理。
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from pear_admin.extensions import db
+from pear_admin.orms import BlobORM
+
+from .blob_store import upload_root
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif")
+PDF_EXTENSIONS = (".pdf",)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _extension(blob):
+    name = blob.path.rsplit("/", 1)[-1]
+    return "." + name.rsplit(".", 1)[-1].lower() if "." in name else ""
+
+
+def is_previewable(blob):
+    return _extension(blob) in IMAGE_EXTENSIONS + PDF_EXTENSIONS
+
+
+def can_render(blob):
+    """当前进程是否装有生成该文件预览所需的库"""
+    ext = _extension(blob)
+    if ext in IMAGE_EXTENSIONS:
+        return Image is not None
+    if ext in PDF_EXTENSIONS:
+        return Image is not None and pymupdf is not None
+    return False
+
+
+def enqueue(blob):
+    """标记需要生成预览；不提交事务，提交后调用 schedule()"""
+    if blob.preview_status is None and is_previewable(blob):
+        blob.preview_status = "pending"
+
+
+def _claim(sha):
+    claimed = db.session.execute(
+        db.update(BlobORM)
+        .where(BlobORM.sha256 == sha, BlobORM.preview_status == "pending")
+        .values(preview_status="processing")
+    ).rowcount
+    db.session.commit()
+    return bool(claimed)
+
+
+def _open_image(blob):
+    source = upload_root() / blob.path
+    if _extension(blob) in PDF_EXTENSIONS:
+        with pymupdf.open(source) as document:
+            page = document.load_page(0)
+            # 按预览图尺寸计算缩放，避免大幅面图纸先渲染成超大位图
+            size = current_app.config.get("PREVIEW_SIZE", 1280)
+            zoom = min(size / max(page.rect.width, page.rect.height, 1), 4)
+            pixmap = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+            return Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+    image = Image.open(source)
+    image.draft("RGB", (current_app.config.get("PREVIEW_SIZE", 1280),) * 2)
+    return image
+
+
+def _save_jpeg(image, size, relpath):
+    copy = image.copy()
+    copy.thumbnail((size, size))
+    if copy.mode != "RGB":
+        copy = copy.convert("RGB")
+    target = upload_root() / relpath
+    temp = target.with_name(target.name + ".tmp")
+    copy.save(temp, "JPEG", quality=80, optimize=True)
+    temp.replace(target)
+
+
+def render(blob):
+    """生成缩略图和预览图，返回 (缩略图路径, 预览图路径)"""
+    base = blob.path.rsplit(".", 1)[0] if "." in blob.path.rsplit("/", 1)[-1] else blob.path
+    thumbnail_path = f"{base}.thumb.jpg"
+    preview_path = f"{base}.preview.jpg"
+    with _open_image(blob) as image:
+        image.load()
+        _save_jpeg(image, current_app.config.get("PREVIEW_SIZE", 1280), preview_path)
+        _save_jpeg(image, current_app.config.get("THUMBNAIL_SIZE", 256), thumbnail_path)
+    return thumbnail_path, preview_path
+
+
+def process(sha):
+    """领取并处理一份内容；没领到（已被其他进程处理）或缺少依赖时返回 False"""
+    blob = db.session.get(BlobORM, sha)
+    if blob is None or not can_render(blob) or not _claim(sha):
+        return False
+    try:
+        thumbnail_path, preview_path = render(blob)
+    except Exception:
+        logger.exception("preview generation failed for blob %s", sha)
+        db.session.rollback()
+        db.session.execute(
+            db.update(BlobORM).where(BlobORM.sha256 == sha).values(preview_status="failed")
+        )
+    else:
+        db.session.execute(
+            db.update(BlobORM).where(BlobORM.sha256 == sha).values(
+                preview_status="done", thumbnail_path=thumbnail_path, preview_path=preview_path
+            )
+        )
+    db.session.commit()
+    return True
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get("PREVIEW_WORKERS", 2),
+                thread_name_prefix="preview",
+            )
+        return _executor
+
+
+def _run_in_context(app, sha):
+    with app.app_context():
+        try:
+            process(sha)
+        finally:
+            db.session.remove()
+
+
+def schedule(blob):
+    """事务提交后调用：thread 模式下交给线程池生成，其他模式留给 worker"""
+    if blob.preview_status != "pending" or current_app.config.get("PREVIEW_MODE", "thread") != "thread":
+        return
+    if not can_render(blob):
+        return
+    app = current_app._get_current_object()
+    _get_executor().submit(_run_in_context, app, blob.sha256)
+
+
+def pending_shas(limit=20):
+    return db.session.scalars(
+        db.select(BlobORM.sha256)
+        .where(BlobORM.preview_status == "pending")
+        .order_by(BlobORM.update_at)
+        .limit(limit)
+    ).all()
+
+
+def requeue(failed_only=False):
+    """把失败（以及中断在 processing）的内容重新标记为 pending，返回条数"""
+    statuses = ("failed",) if failed_only else ("failed", "processing")
+    count = db.session.execute(
+        db.update(BlobORM)
+        .where(BlobORM.preview_status.in_(statuses))
+        .values(preview_status="pending")
+    ).rowcount
+    db.session.commit()
+    return count
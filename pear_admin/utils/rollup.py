@@ -0,0 +1,166 @@
+"""
+订单 / 付款月度汇总表 agg_monthly_order_pay 的维护
+
+每次 flush 后根据新增、修改、删除的订单和付款单计算各月份的增量，
+在同一事务里累加到汇总表，月度趋势只需读取最近 12 行。
+
+通过原生 SQL 导入或批量 UPDATE 的数据不会经过 flush，导入后执行 `flask rollup rebuild` 重建。
+"""
+from collections import defaultdict
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+
+from pear_admin.extensions import db
+from pear_admin.orms import MonthlyOrderPayORM, OrderORM, PayORM
+
+# 汇总的模型 -> (金额列, 汇总表中的数量列, 汇总表中的金额列)
+ROLLUP_SOURCES = {
+    OrderORM: ("order_amount", "order_count", "order_amount"),
+    PayORM: ("current_payment_amount", "pay_count", "pay_amount"),
+}
+
+
+def month_of(value):
+    """创建时间所属月份 YYYY-MM"""
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode("utf-8")
+    if isinstance(value, str):
+        return value[:7]
+    return value.strftime("%Y-%m")
+
+
+def _old_value(state, key):
+    history = state.attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    return state.attrs[key].value
+
+
+def _collect(session):
+    """返回 {month: {汇总列: 增量}}"""
+    deltas = defaultdict(lambda: defaultdict(int))
+
+    def add(month, count_key, amount_key, count, amount):
+        if month is None:
+            return
+        deltas[month][count_key] += count
+        deltas[month][amount_key] += amount or 0
+
+    for obj in session.new:
+        if type(obj) not in ROLLUP_SOURCES:
+            continue
+        amount_attr, count_key, amount_key = ROLLUP_SOURCES[type(obj)]
+        add(month_of(obj.create_at), count_key, amount_key, 1, getattr(obj, amount_attr))
+
+    for obj in session.dirty:
+        if type(obj) not in ROLLUP_SOURCES:
+            continue
+        amount_attr, count_key, amount_key = ROLLUP_SOURCES[type(obj)]
+        state = inspect(obj)
+        if not (
+            state.attrs.create_at.history.has_changes()
+            or state.attrs[amount_attr].history.has_changes()
+        ):
+            continue
+        add(month_of(_old_value(state, "create_at")), count_key, amount_key,
+            -1, -(_old_value(state, amount_attr) or 0))
+        add(month_of(obj.create_at), count_key, amount_key, 1, getattr(obj, amount_attr))
+
+    for obj in session.deleted:
+        if type(obj) not in ROLLUP_SOURCES:
+            continue
+        amount_attr, count_key, amount_key = ROLLUP_SOURCES[type(obj)]
+        add(month_of(obj.create_at), count_key, amount_key, -1, -(getattr(obj, amount_attr) or 0))
+
+    return {month: values for month, values in deltas.items() if any(values.values())}
+
+
+def _upsert(dialect):
+    """返回支持“主键冲突时累加”的 INSERT 构造函数，当前数据库不支持时返回 None"""
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert
+
+
+def apply_deltas(connection, deltas):
+    """
+    把 {month: {列: 增量}} 累加到汇总表，月份行不存在时插入
+
+    用一条 INSERT ... ON DUPLICATE KEY UPDATE / ON CONFLICT DO UPDATE 完成：
+    先 UPDATE、影响 0 行再 INSERT 的写法，在两个事务同时写入某月第一笔数据时
+    都会走到 INSERT，MySQL 上一方死锁或主键冲突，新增订单 / 付款随之失败。
+    """
+    rollup = MonthlyOrderPayORM.__table__
+    insert = _upsert(connection.dialect.name)
+    for month, values in sorted(deltas.items()):
+        if insert is None:
+            result = connection.execute(
+                db.update(rollup)
+                .where(rollup.c.month == month)
+                .values({key: rollup.c[key] + delta for key, delta in values.items()})
+            )
+            if result.rowcount == 0:
+                connection.execute(db.insert(rollup).values(month=month, **values))
+            continue
+
+        statement = insert(rollup).values(month=month, **values)
+        if connection.dialect.name == "mysql":
+            statement = statement.on_duplicate_key_update(
+                {key: rollup.c[key] + delta for key, delta in values.items()}
+            )
+        else:
+            statement = statement.on_conflict_do_update(
+                index_elements=[rollup.c.month],
+                set_={key: rollup.c[key] + delta for key, delta in values.items()},
+            )
+        connection.execute(statement)
+
+
+def _after_flush(session, flush_context):
+    deltas = _collect(session)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+if not event.contains(Session, "after_flush", _after_flush):
+    event.listen(Session, "after_flush", _after_flush)
+
+
+def _month_expression(dialect, column):
+    if dialect == "mysql":
+        return func.date_format(column, "%Y-%m")
+    return func.strftime("%Y-%m", column)
+
+
+def rebuild_rollup():
+    """按订单表和付款表重新生成全部月度汇总，返回月份数"""
+    connection = db.session.connection()
+    dialect = connection.dialect.name
+    deltas = defaultdict(dict)
+    for model, (amount_attr, count_key, amount_key) in ROLLUP_SOURCES.items():
+        month = _month_expression(dialect, model.create_at)
+        rows = connection.execute(
+            db.select(
+                month.label("month"),
+                func.count(model.id),
+                func.coalesce(func.sum(getattr(model, amount_attr)), 0),
+            ).group_by(month)
+        ).all()
+        for row_month, count, amount in rows:
+            deltas[row_month][count_key] = count
+            deltas[row_month][amount_key] = amount
+
+    connection.execute(db.delete(MonthlyOrderPayORM.__table__))
+    apply_deltas(connection, deltas)
+    db.session.commit()
+    return len(deltas)
+
@@ -0,0 +1,262 @@
+"""
+列表模糊搜索的全文索引
+
+列表接口的模糊条件都是 LIKE '%x%'，B-tree 索引无法使用，每次搜索都是全表扫描。
+这里为订单、付款单、供应商、付款单位的文本列建立 n-gram 索引：
+
+- MySQL: 每个文本列一个 FULLTEXT 索引 (WITH PARSER ngram)，由数据库自行维护；
+- SQLite: 每张表一个 FTS5 影子表 <表名>_fts (tokenize='trigram')，
+  由 ORM 的 insert / update / delete 事件同步。
+
+fuzzy() 先用索引把候选行缩小到很少的几行，再用原来的 LIKE 复核。以下情况索引给出的候选
+会比 LIKE 少，直接退回 LIKE：
+
+- 搜索词含 % 或 _：LIKE 把它们当通配符，全文索引当普通字符；
+- MySQL 上搜索词含 InnoDB 默认停用词（a、i、is、at ...）：旧版索引按停用词表建立，
+  含停用词的 n-gram 不在索引里。索引现在关闭停用词建立，但无法区分库里的是哪一种；
+- MySQL 上搜索词含空白：ngram 解析器丢弃含空白的 n-gram。
+
+索引不存在、搜索词短于 n-gram 长度或其他数据库时同样退回 LIKE。
+
+通过原生 SQL 导入的数据不会触发 ORM 事件，导入后执行 `flask search rebuild` 重建。
+"""
+import threading
+
+from sqlalchemy import bindparam, column, event, literal_column, select, table, text
+
+from pear_admin.extensions import db
+from pear_admin.orms import OrderORM, PayerORM, PayORM, SupplierORM
+
+# 建立全文索引的文本列
+SEARCH_COLUMNS = {
+    OrderORM: (
+        "order_number", "material_name", "project_name", "supplier_contact_person",
+        "contact_phone", "material_manager", "sub_project_manager",
+    ),
+    PayORM: ("pay_number", "payment_status", "handler"),
+    SupplierORM: (
+        "name", "contact_person", "phone", "email", "bank_name",
+        "account_number", "address", "remark",
+    ),
+    PayerORM: ("name", "bank_name", "account_number", "remark"),
+}
+
+# 各数据库 n-gram 切分长度，短于该长度的搜索词无法走索引
+MIN_TERM_LENGTH = {"mysql": 2, "sqlite": 3}
+
+# InnoDB 默认停用词中长度不超过 n-gram 的部分：ngram 解析器丢弃包含它们的 bigram，
+# 搜索词中出现任意一个，就有 LIKE 能匹配而索引里没有的 bigram
+MYSQL_NGRAM_STOPWORDS = (
+    "a", "i", "an", "as", "at", "be", "by", "de", "en", "in", "is", "it", "la", "of", "on", "or", "to",
+)
+
+_state = {}
+_state_lock = threading.Lock()
+
+
+def fts_table_name(model):
+    return f"{model.__tablename__}_fts"
+
+
+def fulltext_index_name(model, name):
+    return f"ft_{model.__tablename__}_{name}"
+
+
+def _indexed_columns(connection, model):
+    """当前数据库中 model 已建立索引的列（按连接的数据库缓存）"""
+    key = (str(connection.engine.url), model.__tablename__)
+    with _state_lock:
+        if key in _state:
+            return _state[key]
+
+    dialect = connection.dialect.name
+    columns = frozenset()
+    if dialect == "sqlite":
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": fts_table_name(model)},
+        ).first()
+        if exists:
+            columns = frozenset(SEARCH_COLUMNS[model])
+    elif dialect == "mysql":
+        index_names = set(
+            connection.execute(
+                text(
+                    "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :name "
+                    "AND INDEX_TYPE = 'FULLTEXT'"
+                ),
+                {"name": model.__tablename__},
+            ).scalars()
+        )
+        columns = frozenset(
+            name for name in SEARCH_COLUMNS[model]
+            if fulltext_index_name(model, name) in index_names
+        )
+
+    with _state_lock:
+        _state[key] = columns
+    return columns
+
+
+def has_shadow_index(connection, model):
+    """model 是否有需要应用自行同步的 SQLite 影子表；批量导入决定是否回查 id 时使用"""
+    return connection.dialect.name == "sqlite" and bool(_indexed_columns(connection, model))
+
+
+def _reset_state():
+    with _state_lock:
+        _state.clear()
+
+
+def _index_can_match(term, dialect):
+    """索引能否找出 LIKE '%term%' 的全部结果"""
+    if "%" in term or "_" in term:
+        return False
+    if len(term.strip()) < MIN_TERM_LENGTH.get(dialect, 0):
+        return False
+    if dialect == "mysql":
+        lowered = term.lower()
+        if any(ch.isspace() for ch in lowered):
+            return False
+        if any(word in lowered for word in MYSQL_NGRAM_STOPWORDS):
+            return False
+    return True
+
+
+def _phrase(term):
+    # 作为短语整体匹配；双引号在两种语法里都是短语界定符，直接去掉
+    return '"' + term.replace('"', " ") + '"'
+
+
+def fuzzy(attr, term):
+    """
+    返回与 attr LIKE '%term%' 等价的过滤条件
+    attr 为 ORM 列属性，例如 fuzzy(OrderORM.material_name, "钢筋")
+    """
+    like = attr.like(f"%{term}%")
+    model = attr.class_
+    if model not in SEARCH_COLUMNS or attr.key not in SEARCH_COLUMNS[model]:
+        return like
+
+    connection = db.session.connection()
+    dialect = connection.dialect.name
+    if not _index_can_match(term, dialect):
+        return like
+    if attr.key not in _indexed_columns(connection, model):
+        return like
+
+    if dialect == "mysql":
+        return db.and_(attr.match(_phrase(term)), like)
+
+    fts_name = fts_table_name(model)
+    fts = table(fts_name, column("rowid"))
+    matched = select(fts.c.rowid).where(
+        literal_column(fts_name).op("MATCH")(
+            bindparam(None, f"{attr.key} : {_phrase(term)}", unique=True)
+        )
+    )
+    return db.and_(model.id.in_(matched), like)
+
+
+# ---------------------------------------------------------------- SQLite 同步
+
+
+def _row_values(model, target):
+    values = {"id": target.id}
+    for name in SEARCH_COLUMNS[model]:
+        value = getattr(target, name)
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        values[name] = value
+    return values
+
+
+def index_rows(connection, model, rows):
+    """把若干行 (dict，含 id 与文本列) 写入 SQLite 影子表；批量导入等绕过 ORM 事件时使用"""
+    if connection.dialect.name != "sqlite" or not _indexed_columns(connection, model):
+        return
+    fts_name = fts_table_name(model)
+    names = SEARCH_COLUMNS[model]
+    params = [{"rowid": row["id"], **{n: row.get(n) for n in names}} for row in rows]
+    if not params:
+        return
+    connection.execute(
+        text(f"DELETE FROM {fts_name} WHERE rowid = :rowid"),
+        [{"rowid": p["rowid"]} for p in params],
+    )
+    connection.execute(
+        text(
+            f"INSERT INTO {fts_name} (rowid, {', '.join(names)}) "
+            f"VALUES (:rowid, {', '.join(':' + n for n in names)})"
+        ),
+        params,
+    )
+
+
+def _after_save(mapper, connection, target):
+    model = mapper.class_
+    index_rows(connection, model, [_row_values(model, target)])
+
+
+def _after_delete(mapper, connection, target):
+    model = mapper.class_
+    if connection.dialect.name != "sqlite" or not _indexed_columns(connection, model):
+        return
+    connection.execute(
+        text(f"DELETE FROM {fts_table_name(model)} WHERE rowid = :rowid"),
+        {"rowid": target.id},
+    )
+
+
+for _model in SEARCH_COLUMNS:
+    event.listen(_model, "after_insert", _after_save)
+    event.listen(_model, "after_update", _after_save)
+    event.listen(_model, "after_delete", _after_delete)
+
+
+# ---------------------------------------------------------------- 建立索引
+
+
+def rebuild_indexes():
+    """创建 / 重建全部全文索引，返回处理的表名列表"""
+    connection = db.session.connection()
+    dialect = connection.dialect.name
+    rebuilt = []
+    for model, names in SEARCH_COLUMNS.items():
+        tablename = model.__tablename__
+        if dialect == "sqlite":
+            fts_name = fts_table_name(model)
+            connection.execute(text(f"DROP TABLE IF EXISTS {fts_name}"))
+            connection.execute(
+                text(
+                    f"CREATE VIRTUAL TABLE {fts_name} USING fts5"
+                    f"({', '.join(names)}, tokenize = 'trigram')"
+                )
+            )
+            connection.execute(
+                text(
+                    f"INSERT INTO {fts_name} (rowid, {', '.join(names)}) "
+                    f"SELECT id, {', '.join(names)} FROM {tablename}"
+                )
+            )
+        elif dialect == "mysql":
+            # 只对本连接生效；建索引时读取，关闭后含 a、is 等的 n-gram 也会进索引
+            connection.execute(text("SET SESSION innodb_ft_enable_stopword = OFF"))
+            _reset_state()
+            existing = _indexed_columns(connection, model)
+            for name in names:
+                if name in existing:
+                    continue
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {tablename} ADD FULLTEXT INDEX "
+                        f"{fulltext_index_name(model, name)} ({name}) WITH PARSER ngram"
+                    )
+                )
+        else:
+            continue
+        rebuilt.append(tablename)
+    db.session.commit()
+    _reset_state()
+    return rebuilt
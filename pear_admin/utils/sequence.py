@@ -0,0 +1,75 @@
+"""
+单号序列
+
+各 gunicorn worker 从 sys_sequence 计数表按块领取号段（每次 SEQUENCE_BLOCK_SIZE 个），
+号段用完之前在进程内分配，不需要访问数据库。
+领取号段在独立的连接和事务中完成，与请求事务无关：请求回滚时号码作废但不会被重复使用。
+
+同一进程内号码单调递增；不同 worker 的号段互不重叠，因此全局唯一，但跨进程不保证按时间先后递增。
+"""
+import datetime
+import os
+import threading
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from pear_admin.extensions import db
+
+from .cache import bump_tables
+
+_blocks = {}
+_blocks_lock = threading.Lock()
+_pid = os.getpid()
+
+
+def _allocate_block(name, size):
+    """领取一个号段，返回 [start, end)"""
+    from pear_admin.orms.sequence import SequenceORM
+
+    table = SequenceORM.__table__
+    for _ in range(3):
+        with db.engine.begin() as connection:
+            # 先 UPDATE 拿到行锁，再读回本事务写入的值
+            updated = connection.execute(
+                db.update(table)
+                .where(table.c.name == name)
+                .values(next_value=table.c.next_value + size)
+            ).rowcount
+            if updated:
+                end = connection.execute(
+                    db.select(table.c.next_value).where(table.c.name == name)
+                ).scalar_one()
+                bump_tables(table.name)
+                return end - size, end
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(db.insert(table).values(name=name, next_value=1 + size))
+            bump_tables(table.name)
+            return 1, 1 + size
+        except IntegrityError:
+            # 其他进程刚好创建了同名序列，重新走 UPDATE
+            continue
+    raise RuntimeError(f"无法分配序列号段: {name}")
+
+
+def next_value(name):
+    """取序列 name 的下一个值"""
+    global _pid
+    size = current_app.config.get("SEQUENCE_BLOCK_SIZE", 100)
+    with _blocks_lock:
+        # gunicorn 预加载后 fork 出的 worker 不能沿用父进程的号段
+        if _pid != os.getpid():
+            _blocks.clear()
+            _pid = os.getpid()
+        current, end = _blocks.get(name, (0, 0))
+        if current >= end:
+            current, end = _allocate_block(name, size)
+        _blocks[name] = (current + 1, end)
+        return current
+
+
+def next_order_no(prefix):
+    """生成单号：前缀 + 时间 (YYYYmmddHHMMSS) + 至少 6 位序号，例如 IN20260118093015000123"""
+    value = next_value(f"order_no:{prefix}")
+    return f"{prefix}{datetime.datetime.now():%Y%m%d%H%M%S}{value:06d}"
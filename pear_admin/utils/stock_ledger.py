@@ -0,0 +1,245 @@
+"""
+苗圃库存快照与按日期回溯
+
+库存表只保存当前数量，"某天结束时有多少库存" 需要从头重放流水。
+这里按天或按月为每个苗木保存快照 (nursery_stock_snapshot)，回溯时取不晚于目标日期的
+最近一次快照，再只重放快照之后到目标日期的流水。
+
+补录、修改或删除历史流水（出库单修改 / 删除）会让该流水日期及之后的快照失效，
+对应快照在同一事务中被删除，回溯自动退回更早的快照；用 `flask nursery take-snapshot`
+定期补齐，`flask nursery rebuild-snapshots` 全量重建，`flask nursery verify-snapshots` 对账。
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from sqlalchemy import case, event, func
+
+from pear_admin.extensions import db
+from pear_admin.orms.nursery import NurseryPlantORM, NurseryStockSnapshotORM, NurseryTransactionORM
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def signed_quantity():
+    """入库为正、出库为负的变动数量"""
+    return case(
+        (NurseryTransactionORM.type == 'in', NurseryTransactionORM.quantity),
+        (NurseryTransactionORM.type == 'out', -NurseryTransactionORM.quantity),
+        else_=0,
+    )
+
+
+def _day_start(day):
+    return datetime.datetime.combine(day, datetime.time.min)
+
+
+def _to_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+
+def ledger_totals(since=None, until=None, plant_ids=None):
+    """流水中 create_at 位于 [since, until) 的各苗木净变动量 {plant_id: Decimal}"""
+    q = db.select(
+        NurseryTransactionORM.plant_id, func.sum(signed_quantity())
+    ).where(NurseryTransactionORM.plant_id.isnot(None))
+    if since is not None:
+        q = q.where(NurseryTransactionORM.create_at >= since)
+    if until is not None:
+        q = q.where(NurseryTransactionORM.create_at < until)
+    if plant_ids:
+        q = q.where(NurseryTransactionORM.plant_id.in_(plant_ids))
+    rows = db.session.execute(q.group_by(NurseryTransactionORM.plant_id)).all()
+    return {plant_id: Decimal(str(total or 0)) for plant_id, total in rows}
+
+
+def nearest_snapshot_date(day):
+    """不晚于 day 的最近一次快照日期，没有时返回 None"""
+    return db.session.scalar(
+        db.select(func.max(NurseryStockSnapshotORM.snapshot_date))
+        .where(NurseryStockSnapshotORM.snapshot_date <= day)
+    )
+
+
+def stock_as_of(day, plant_ids=None):
+    """
+    day 当日结束时各苗木的库存，返回 ({plant_id: Decimal}, 使用的快照日期)
+    没有可用快照时从头重放流水
+    """
+    base_date = _to_date(nearest_snapshot_date(day))
+    stock = defaultdict(Decimal)
+    since = None
+    if base_date is not None:
+        q = db.select(NurseryStockSnapshotORM.plant_id, NurseryStockSnapshotORM.quantity).where(
+            NurseryStockSnapshotORM.snapshot_date == base_date
+        )
+        if plant_ids:
+            q = q.where(NurseryStockSnapshotORM.plant_id.in_(plant_ids))
+        for plant_id, quantity in db.session.execute(q):
+            stock[plant_id] += Decimal(str(quantity or 0))
+        since = _day_start(base_date + ONE_DAY)
+
+    for plant_id, delta in ledger_totals(since, _day_start(day + ONE_DAY), plant_ids).items():
+        stock[plant_id] += delta
+    return dict(stock), base_date
+
+
+def period_ends(first_day, last_day, period="month"):
+    """[first_day, last_day] 内每个周期的最后一天；按月时最后一个周期截止到 last_day"""
+    if period == "day":
+        day = first_day
+        while day <= last_day:
+            yield day
+            day += ONE_DAY
+        return
+
+    day = first_day
+    while day <= last_day:
+        next_month = (day.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+        end = next_month - ONE_DAY
+        if end > last_day:
+            break
+        yield end
+        day = next_month
+
+
+def _write_snapshot(day, stock):
+    db.session.execute(
+        db.delete(NurseryStockSnapshotORM).where(NurseryStockSnapshotORM.snapshot_date == day)
+    )
+    rows = [
+        {"snapshot_date": day, "plant_id": plant_id, "quantity": quantity, "create_at": datetime.datetime.now()}
+        for plant_id, quantity in sorted(stock.items())
+    ]
+    if rows:
+        db.session.execute(db.insert(NurseryStockSnapshotORM), rows)
+    return len(rows)
+
+
+def rebuild_snapshots(period="month", until=None):
+    """
+    删除全部快照，从头重放一次流水，为每个周期末生成快照
+    until 默认为昨天；返回 (快照日期数, 写入行数)
+    """
+    until = until or datetime.date.today() - ONE_DAY
+    db.session.execute(db.delete(NurseryStockSnapshotORM))
+
+    first = _to_date(db.session.scalar(
+        db.select(func.min(NurseryTransactionORM.create_at))
+        .where(NurseryTransactionORM.plant_id.isnot(None))
+    ))
+    if first is None or first > until:
+        db.session.commit()
+        return 0, 0
+
+    rows = db.session.execute(
+        db.select(NurseryTransactionORM.create_at, NurseryTransactionORM.plant_id, signed_quantity())
+        .where(
+            NurseryTransactionORM.plant_id.isnot(None),
+            NurseryTransactionORM.create_at < _day_start(until + ONE_DAY),
+        )
+        .order_by(NurseryTransactionORM.create_at, NurseryTransactionORM.id)
+    ).all()
+
+    stock = defaultdict(Decimal)
+    index = 0
+    dates = written = 0
+    for end in period_ends(first, until, period):
+        boundary = _day_start(end + ONE_DAY)
+        while index < len(rows) and rows[index][0] < boundary:
+            _, plant_id, delta = rows[index]
+            stock[plant_id] += Decimal(str(delta or 0))
+            index += 1
+        written += _write_snapshot(end, stock)
+        dates += 1
+
+    db.session.commit()
+    return dates, written
+
+
+def take_snapshot(day=None):
+    """
+    生成 day（默认昨天）的快照：最近的快照加上之后的流水增量；返回写入行数
+    只能为已经结束的日期生成快照，今天及以后的流水还会变化，而失效逻辑只覆盖今天以前的日期
+    """
+    day = day or datetime.date.today() - ONE_DAY
+    if day >= datetime.date.today():
+        raise ValueError("只能生成今天以前日期的快照")
+    stock, _ = stock_as_of(day)
+    written = _write_snapshot(day, stock)
+    db.session.commit()
+    return written
+
+
+def verify_snapshots():
+    """
+    对账：每个快照日期与完整重放的结果比较，再把流水合计与当前库存比较
+    返回差异列表 [(说明, plant_id, 记录值, 流水值)]
+    """
+    problems = []
+    dates = db.session.scalars(
+        db.select(NurseryStockSnapshotORM.snapshot_date).distinct().order_by(NurseryStockSnapshotORM.snapshot_date)
+    ).all()
+    for day in dates:
+        day = _to_date(day)
+        expected = ledger_totals(until=_day_start(day + ONE_DAY))
+        recorded = {
+            plant_id: Decimal(str(quantity or 0))
+            for plant_id, quantity in db.session.execute(
+                db.select(NurseryStockSnapshotORM.plant_id, NurseryStockSnapshotORM.quantity)
+                .where(NurseryStockSnapshotORM.snapshot_date == day)
+            )
+        }
+        for plant_id in sorted(set(expected) | set(recorded)):
+            if recorded.get(plant_id, 0) != expected.get(plant_id, 0):
+                problems.append((f"snapshot {day}", plant_id, recorded.get(plant_id, 0), expected.get(plant_id, 0)))
+
+    expected = ledger_totals()
+    for plant_id, quantity in db.session.execute(db.select(NurseryPlantORM.id, NurseryPlantORM.quantity)):
+        current = Decimal(str(quantity or 0))
+        if current != expected.get(plant_id, 0):
+            problems.append(("current stock", plant_id, current, expected.get(plant_id, 0)))
+    return problems
+
+
+# ---------------------------------------------------------------- 历史流水变化时使快照失效
+
+
+def _invalidate_from(connection, create_at):
+    day = _to_date(create_at)
+    if day is None:
+        return
+    table = NurseryStockSnapshotORM.__table__
+    connection.execute(db.delete(table).where(table.c.snapshot_date >= day))
+
+
+@event.listens_for(NurseryTransactionORM, "after_insert")
+def _after_transaction_insert(mapper, connection, target):
+    # 补录的历史流水（日期早于今天）会改变当天及之后的快照；当天的流水还没有快照
+    day = _to_date(target.create_at)
+    if day is not None and day < datetime.date.today():
+        _invalidate_from(connection, day)
+
+
+@event.listens_for(NurseryTransactionORM, "after_update")
+def _after_transaction_update(mapper, connection, target):
+    state = db.inspect(target)
+    if any(
+        state.attrs[key].history.has_changes()
+        for key in ("quantity", "type", "plant_id", "create_at")
+    ):
+        # create_at 可以为空，没有日期的流水不计入任何快照
+        days = [
+            _to_date(value)
+            for value in (target.create_at, *state.attrs.create_at.history.deleted)
+            if value is not None
+        ]
+        if days:
+            _invalidate_from(connection, min(days))
+
+
+@event.listens_for(NurseryTransactionORM, "after_delete")
+def _after_transaction_delete(mapper, connection, target):
+    _invalidate_from(connection, target.create_at)
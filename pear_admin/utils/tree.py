@@ -0,0 +1,77 @@
+"""
+树形结构组装
+
+权限、菜单、部门等自关联数据都以 (id, pid) 的平铺列表查出，再在内存中组装成树。
+build_tree 先建立 id -> 节点的索引，再遍历一次把每个节点挂到父节点的 children 下，
+不复制节点，整体 O(n)（需要排序时为各层排序的开销）。
+
+只需要部分子树时，用 descendants_select 的递归 CTE 一次查出若干根节点的全部后代。
+"""
+from sqlalchemy import select
+
+
+def build_tree(nodes, root=0, id_key="id", pid_key="pid", children_key="children", sort_key=None):
+    """
+    把平铺的节点 (dict) 组装成树，返回顶级节点列表
+    节点会被原地修改：有子节点的节点增加 children_key 列表，叶子节点不增加
+
+    root: 顶级节点的 pid，可以是单个值或元组；
+          为 None 时返回所有父节点不在 nodes 中的节点（包括父节点缺失的孤立子树）
+    sort_key: 各层节点的排序函数，为 None 时保持输入顺序
+    """
+    nodes = list(nodes)
+    index = {node[id_key]: node for node in nodes}
+    if root is None:
+        root_pids = None
+    elif isinstance(root, (tuple, list, set, frozenset)):
+        root_pids = frozenset(root)
+    else:
+        root_pids = frozenset((root,))
+
+    top = []
+    parents = []
+    for node in nodes:
+        pid = node.get(pid_key)
+        parent = index.get(pid)
+        if parent is not None and parent is not node and (root_pids is None or pid not in root_pids):
+            children = parent.get(children_key)
+            if children is None:
+                children = parent[children_key] = []
+                parents.append(parent)
+            children.append(node)
+        elif root_pids is None or pid in root_pids:
+            top.append(node)
+
+    if sort_key is not None:
+        top.sort(key=sort_key)
+        for parent in parents:
+            parent[children_key].sort(key=sort_key)
+    return top
+
+
+def walk(nodes, children_key="children"):
+    """深度优先遍历树中全部节点"""
+    stack = list(reversed(nodes))
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.get(children_key) or ()))
+
+
+def mark_parents(nodes, children_key="children"):
+    """树形表格格式：每个节点都带 children 列表，有子节点的节点标记 isParent"""
+    for node in walk(nodes, children_key):
+        children = node.setdefault(children_key, [])
+        if children:
+            node["isParent"] = True
+    return nodes
+
+
+def descendants_select(model, root_ids):
+    """
+    root_ids 全部后代节点的查询（不含根节点本身，不限层级）
+    使用递归 CTE，UNION 去重，数据中存在环时也能结束
+    """
+    tree = select(model.id).where(model.pid.in_(root_ids)).cte("tree", recursive=True)
+    tree = tree.union(select(model.id).where(model.pid == tree.c.id))
+    return select(model).where(model.id.in_(select(tree.c.id)))
@@ -0,0 +1,118 @@
+"""
+工作单元：合并 BaseORM.save() / delete() 的提交
+
+BaseORM.save() 和 delete() 默认每次都提交一次事务，循环里逐条保存时，
+每一行都要付出一次提交（MySQL 上一次 redo log 刷盘）。在 unit_of_work 中：
+
+- save() / delete() 只把对象加入会话，不 flush 也不提交，需要自增 id 时自行 db.session.flush()；
+- 正常退出最外层时统一提交一次，抛出异常时回滚；
+- 可以嵌套，只有最外层负责提交。
+
+既可以作为上下文管理器，也可以作为装饰器::
+
+    with unit_of_work():
+        for row in rows:
+            SomeORM(**row).save()
+
+    @unit_of_work()
+    def change_something():
+        ...
+
+同时统计每个请求的提交次数：响应头 X-DB-Commits 带上本次请求的提交数，
+commit_stats() 返回当前进程按接口汇总的次数，超过 COMMITS_PER_REQUEST_WARN 时记录警告日志。
+"""
+import logging
+import threading
+from contextlib import ContextDecorator
+
+from flask import Flask, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from pear_admin.extensions import db
+
+logger = logging.getLogger(__name__)
+
+_DEPTH_KEY = "unit_of_work_depth"
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def in_unit_of_work(session=None):
+    return (session or db.session).info.get(_DEPTH_KEY, 0) > 0
+
+
+class UnitOfWork(ContextDecorator):
+    """在同一个会话中合并多次 save() / delete()，退出最外层时提交一次"""
+
+    def __enter__(self):
+        info = db.session.info
+        info[_DEPTH_KEY] = info.get(_DEPTH_KEY, 0) + 1
+        return db.session
+
+    def __exit__(self, exc_type, exc, tb):
+        info = db.session.info
+        info[_DEPTH_KEY] -= 1
+        if info[_DEPTH_KEY] > 0:
+            return False
+        del info[_DEPTH_KEY]
+        if exc_type is None:
+            try:
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        else:
+            db.session.rollback()
+        return False
+
+
+def unit_of_work():
+    """返回一个工作单元，可用作 with 语句或装饰器"""
+    return UnitOfWork()
+
+
+# ---------------------------------------------------------------- 提交次数统计
+
+
+def _after_commit(session):
+    # 释放 SAVEPOINT 也会触发 after_commit，只统计真正的提交
+    if session.in_nested_transaction():
+        return
+    if has_request_context():
+        g.db_commits = g.get("db_commits", 0) + 1
+
+
+def _reset():
+    g.db_commits = 0
+
+
+def _record(response):
+    commits = g.get("db_commits", 0)
+    endpoint = request.endpoint or "<unmatched>"
+    with _stats_lock:
+        stat = _stats.setdefault(endpoint, {"requests": 0, "commits": 0, "max": 0})
+        stat["requests"] += 1
+        stat["commits"] += commits
+        stat["max"] = max(stat["max"], commits)
+
+    threshold = current_app.config.get("COMMITS_PER_REQUEST_WARN")
+    if threshold and commits > threshold:
+        logger.warning("%s %s committed %d times in one request", request.method, request.path, commits)
+    response.headers["X-DB-Commits"] = str(commits)
+    return response
+
+
+def commit_stats():
+    """当前进程按接口汇总的提交次数 {endpoint: {requests, commits, max}}"""
+    with _stats_lock:
+        return {endpoint: dict(stat) for endpoint, stat in _stats.items()}
+
+
+def register_unit_of_work(app: Flask):
+    """注册提交计数的会话事件和响应钩子"""
+    if not event.contains(Session, "after_commit", _after_commit):
+        event.listen(Session, "after_commit", _after_commit)
+    app.before_request(_reset)
+    app.after_request(_record)
@@ -1,9 +1,6 @@
-import os
+from flask import Blueprint, render_template
 
-from flask import Blueprint, render_template, send_from_directory
-from flask_jwt_extended import jwt_required
-
-from configs import config
+from pear_admin.utils.downloads import download_required, send_upload
 
 project_bp = Blueprint("project", __name__)
 
@@ -14,13 +11,8 @@ def project_info():
     return render_template("project/info/project_info.html")
 
 
-# 文件下载路由
-@project_bp.route("/uploads/<filename>")
+# 文件下载路由（需要登录，浏览器打开时通过 ?jwt= 传入 signed_url 签发的下载 token）
+@project_bp.route("/uploads/<path:filename>")
+@download_required
 def download_file(filename):
-    upload_folder = config["dev"].UPLOAD_FOLDER
-    return send_from_directory(upload_folder, filename)
-
-
-
-
-
+    return send_upload(filename)
@@ -0,0 +1,70 @@
+"""
+树形组装性能对比：原 deepcopy 方式 vs pear_admin.utils.tree.build_tree
+
+用法: python scripts/bench_tree.py [节点数，默认 10000] [重复次数，默认 3]
+"""
+import os
+import random
+import sys
+import time
+from copy import deepcopy
+
+sys.path.append(os.getcwd())
+
+from pear_admin.utils.tree import build_tree, walk
+
+
+def make_nodes(count, seed=0):
+    """生成 count 个节点的随机树，每个节点的父节点从已生成的节点中选取"""
+    rng = random.Random(seed)
+    nodes = []
+    for i in range(1, count + 1):
+        pid = 0 if i <= 10 else rng.randint(max(1, i - 200), i - 1)
+        nodes.append({"id": i, "pid": pid, "title": f"node-{i}", "sort": rng.randint(0, 100)})
+    return nodes
+
+
+def legacy_tree(rights_list):
+    """原 rights.get_list_as_tree 的组装方式"""
+    rights_list.sort(key=lambda item: (item["pid"], item["id"]), reverse=True)
+    tree_dict = {}
+    for rights_dict in rights_list:
+        if rights_dict["id"] in tree_dict.keys():
+            rights_dict["children"] = deepcopy(tree_dict[rights_dict["id"]])
+            rights_dict["children"].sort(key=lambda item: item["sort"])
+            del tree_dict[rights_dict["id"]]
+
+        if rights_dict["pid"] not in tree_dict.keys():
+            tree_dict[rights_dict["pid"]] = [rights_dict]
+        else:
+            tree_dict[rights_dict["pid"]].append(rights_dict)
+    return tree_dict.get(0)
+
+
+def linear_tree(rights_list):
+    return build_tree(rights_list, root=0, sort_key=lambda item: item["sort"])
+
+
+def bench(func, nodes, repeat):
+    best = None
+    for _ in range(repeat):
+        data = [dict(node) for node in nodes]
+        start = time.perf_counter()
+        result = func(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    nodes = make_nodes(count)
+
+    legacy_time, legacy_result = bench(legacy_tree, nodes, repeat)
+    linear_time, linear_result = bench(linear_tree, nodes, repeat)
+
+    print(f"nodes: {count}, repeat: {repeat} (best of)")
+    print(f"deepcopy   : {legacy_time * 1000:10.2f} ms, {sum(1 for _ in walk(legacy_result))} nodes in tree")
+    print(f"build_tree : {linear_time * 1000:10.2f} ms, {sum(1 for _ in walk(linear_result))} nodes in tree")
+    print(f"speedup    : {legacy_time / linear_time:10.1f}x")